@@ -2,20 +2,78 @@
 
 import requests
 import streamlit as st
-from typing import Optional, Dict, Any
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
-def fetch_memories_from_api(user_id: int, api_base: str):
-    """Fetches memories from the FastAPI server."""
+PAGE_SIZE = 500
+# Listing pages kept for revalidation, so Streamlit reruns get a 304 instead of the list
+LISTING_CACHE_SIZE = 64
+
+# (url, params) -> (etag, rows, next_created_at, next_id)
+_listing_cache: "OrderedDict[Tuple, Tuple[str, list, Optional[str], Optional[str]]]" = OrderedDict()
+_listing_cache_lock = threading.Lock()
+
+def _get_listing_page(url: str, params: Dict[str, Any]):
+    """
+    GETs one listing page, revalidating the copy from the last call with
+    If-None-Match. Returns (rows, next_created_at, next_id), or None on error.
+    """
+    key = (url, tuple(sorted(params.items())))
+    with _listing_cache_lock:
+        cached = _listing_cache.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
     try:
-        response = requests.get(f"{api_base.rstrip('/')}/api/memories", params={"user_id": user_id})
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"Failed to fetch memories: {response.status_code} - {response.text}")
-            return []
+        response = requests.get(url, params=params, headers=headers)
     except requests.exceptions.RequestException as e:
         st.error(f"Connection error: {e}")
-        return []
+        return None
+    if response.status_code == 304 and cached:
+        with _listing_cache_lock:
+            _listing_cache.move_to_end(key)
+        return cached[1:]
+    if response.status_code != 200:
+        st.error(f"Failed to fetch memories: {response.status_code} - {response.text}")
+        return None
+
+    page = (response.json(), response.headers.get("X-Next-Before-Created-At"), response.headers.get("X-Next-Before-Id"))
+    etag = response.headers.get("ETag")
+    if etag:
+        with _listing_cache_lock:
+            _listing_cache[key] = (etag, *page)
+            _listing_cache.move_to_end(key)
+            while len(_listing_cache) > LISTING_CACHE_SIZE:
+                _listing_cache.popitem(last=False)
+    return page
+
+def iter_memories_from_api(user_id: int, api_base: str, page_size: int = PAGE_SIZE,
+                           fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields memories newest first, fetching one page at a time as needed.
+    Pass `fields` to fetch only those columns (plus id/created_at).
+    """
+    params: Dict[str, Any] = {"user_id": user_id, "limit": page_size}
+    if fields:
+        params["fields"] = ",".join(fields)
+    url = f"{api_base.rstrip('/')}/api/memories"
+    while True:
+        page = _get_listing_page(url, params)
+        if page is None:
+            return
+        rows, next_created_at, next_id = page
+        yield from rows
+
+        if not next_created_at or not next_id:
+            return
+        params["before_created_at"] = next_created_at
+        params["before_id"] = next_id
+
+def fetch_memories_from_api(user_id: int, api_base: str, limit: Optional[int] = None,
+                            fields: Optional[List[str]] = None):
+    """Fetches memories from the FastAPI server, at most `limit` if given."""
+    page_size = min(limit, PAGE_SIZE) if limit else PAGE_SIZE
+    return list(islice(iter_memories_from_api(user_id, api_base, page_size, fields), limit))
 
 def create_memory_via_api(api_base: str, memory_data: Dict[str, Any], file: Optional[bytes] = None, filename: Optional[str] = None):
     files = {}
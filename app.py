@@ -171,7 +171,6 @@ else:
     
     # Ensure api_base is defined for fetching and deleting
     api_base = os.getenv("API_BASE_URL", "http://127.0.0.1:8000/")
-    memories = api_client.fetch_memories_from_api(user["id"], api_base=api_base)
 
     if view == "Enhanced Garden":
         st.subheader("Your 3D Memory Garden")
@@ -181,6 +180,7 @@ else:
         
     elif view == "Garden":
         # The user_id and api_base are passed correctly for deletion to work
+        memories = api_client.fetch_memories_from_api(user["id"], api_base=api_base)
         ui.garden_grid(memories, user['id'], api_base=api_base)
         
     else:  # Home view
@@ -193,11 +193,15 @@ else:
         - **Garden**: A grid of all your memories, where you can select them for deletion.
         - **Enhanced Garden**: Your interactive 3D garden experience.
         """)
+        # Counters need the whole garden, but only the columns that decide bud/bloom/fruit;
+        # full rows are fetched just for the newest three shown below
+        memories = api_client.fetch_memories_from_api(user["id"], api_base=api_base,
+                                                      fields=["unlock_at", "created_at"])
         ui.counters(memories)
         
         if memories:
             st.subheader("🌱 Recent Memories")
-            recent_memories = memories[:3]
+            recent_memories = api_client.fetch_memories_from_api(user["id"], api_base=api_base, limit=3)
             for memory in recent_memories:
                 with st.expander(f"📝 {memory.get('title', 'Untitled')}", expanded=False):
                     # ui.memory_card(memory)
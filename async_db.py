@@ -0,0 +1,96 @@
+# async_db.py
+# Async mirror of db.py for the FastAPI server. Calls are queued onto
+# dedicated DB threads so awaiting them never blocks the event loop. SQLite
+# only allows one writer at a time, so writes go through a single writer
+# thread and reads get their own pool; a write waiting on the lock can't hold
+# up the reads queued behind it.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import db
+import metrics
+
+_readers: Optional[ThreadPoolExecutor] = None
+_writer: Optional[ThreadPoolExecutor] = None
+
+
+def _get_readers() -> ThreadPoolExecutor:
+    global _readers
+    if _readers is None:
+        _readers = ThreadPoolExecutor(max_workers=max(1, db.DB_READ_WORKERS), thread_name_prefix="db-read")
+    return _readers
+
+
+def _get_writer() -> ThreadPoolExecutor:
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+    return _writer
+
+
+async def _read(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_readers(), functools.partial(fn, *args, **kwargs))
+
+
+async def _write(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_writer(), functools.partial(fn, *args, **kwargs))
+
+
+def queue_depths() -> Dict[str, int]:
+    """Calls waiting for a DB thread, per pool."""
+    return {"db-read": metrics.queue_depth(_readers), "db-write": metrics.queue_depth(_writer)}
+
+
+def shutdown():
+    """Waits for queued DB work to finish and stops the DB threads."""
+    global _readers, _writer
+    for executor in (_writer, _readers):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    _readers = _writer = None
+
+
+async def create_user(email: str, name: str, password_hash: bytes) -> Tuple[bool, Optional[str]]:
+    return await _write(db.create_user, email, name, password_hash)
+
+
+async def get_user_by_email(email: str) -> Optional[Tuple]:
+    return await _read(db.get_user_by_email, email)
+
+
+async def insert_memory(user_id: int, title: str, desc: str, emotion: str, unlock_at_iso: Optional[str],
+                        media_path: Optional[str], media_type: Optional[str], model_path: Optional[str],
+                        media_sha256: Optional[str] = None, media_size: Optional[int] = None,
+                        staged_path: Optional[str] = None, classification_status: str = "done") -> int:
+    return await _write(db.insert_memory, user_id, title, desc, emotion, unlock_at_iso,
+                        media_path, media_type, model_path,
+                        media_sha256=media_sha256, media_size=media_size, staged_path=staged_path,
+                        classification_status=classification_status)
+
+
+async def list_memories(user_id: int, limit: Optional[int] = None,
+                        before_created_at: Optional[str] = None, before_id: Optional[int] = None,
+                        fields: Optional[List[str]] = None) -> List[Dict]:
+    return await _read(db.list_memories, user_id, limit=limit,
+                      before_created_at=before_created_at, before_id=before_id, fields=fields)
+
+
+async def get_memory_version(user_id: int) -> int:
+    return await _read(db.get_memory_version, user_id)
+
+
+async def get_memory(memory_id: int, user_id: int) -> Optional[Dict]:
+    return await _read(db.get_memory, memory_id, user_id)
+
+
+async def get_memory_media(memory_id: int) -> Optional[Tuple[str, Optional[str]]]:
+    return await _read(db.get_memory_media, memory_id)
+
+
+async def delete_memories(user_id: int, memory_ids: List[int]) -> List[int]:
+    return await _write(db.delete_memories, user_id, memory_ids)
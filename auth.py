@@ -1,14 +1,18 @@
+import logging
+
 import bcrypt
 import streamlit as st
 from db import init_db, get_user_by_email, create_user
 
+logger = logging.getLogger(__name__)
+
 def ensure_db():
     init_db()
 
 def signup(email: str, name: str, password: str) -> bool:
     pw_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
     ok, err = create_user(email, name, pw_hash)
-    print("SIGNUP DEBUG:", email, name, ok, err)  
+    logger.debug("signup email=%s ok=%s err=%s", email, ok, err)
     if not ok:
         st.error(err)
     return ok
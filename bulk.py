@@ -0,0 +1,196 @@
+# bulk.py
+# Bulk import for POST /api/memories/bulk. Memories arrive as NDJSON, one
+# object per line, optionally with a zip holding the media they reference:
+#
+#   {"title": "Beach day", "desc": "...", "emotion": "calm", "media": "img/beach.jpg"}
+#
+# Lines are parsed as they are read and inserted in chunks, one write
+# transaction (executemany) per chunk; each chunk's media is staged in
+# parallel first. Bad lines are reported back instead of failing the import.
+
+import json
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import db
+from emotions import classify_many, classify_rule_based, uses_model_backend
+from storage import stage_upload, discard_staged, schedule_derivatives
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "5000"))
+BULK_MEDIA_WORKERS = int(os.getenv("BULK_MEDIA_WORKERS", "4"))
+# Failures listed in the response; the count is always exact
+MAX_REPORTED_FAILURES = int(os.getenv("BULK_MAX_REPORTED_FAILURES", "1000"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BulkResult:
+    inserted: int = 0
+    failed: int = 0
+    pending_classification: int = 0
+    failures: List[Dict] = field(default_factory=list)
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.failures) < MAX_REPORTED_FAILURES:
+            self.failures.append({"line": line, "error": error})
+
+
+def _iso_timestamp(key: str, value: str) -> str:
+    """`value` in the naive-UTC isoformat created_at is stored in, so rows sort and page with the rest."""
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"'{key}' must be an ISO 8601 timestamp.")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat()
+
+
+def parse_line(raw: bytes) -> Dict:
+    """Validates one NDJSON line into insert_memory fields; raises ValueError if unusable."""
+    try:
+        item = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(item, dict):
+        raise ValueError("Each line must be a JSON object.")
+    title = item.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("'title' is required.")
+    row = {
+        "title": title,
+        "desc": item.get("desc", item.get("description")) or "",
+        "emotion": item.get("emotion") or None,
+        "unlock_at_iso": item.get("unlock_at") or None,
+        "created_at": item.get("created_at") or None,
+        "model_path": item.get("model_path") or None,
+        "media": item.get("media") or None,
+    }
+    for key in ("desc", "emotion", "unlock_at_iso", "created_at", "model_path", "media"):
+        if row[key] is not None and not isinstance(row[key], str):
+            raise ValueError(f"'{key}' must be a string.")
+    for key, field_name in (("created_at", "created_at"), ("unlock_at_iso", "unlock_at")):
+        if row[key] is not None:
+            row[key] = _iso_timestamp(field_name, row[key])
+    return row
+
+
+def _stage_member(user_id: int, archive: Optional[zipfile.ZipFile], name: str):
+    if archive is None:
+        raise ValueError(f"Media '{name}' referenced but no media zip was uploaded.")
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise ValueError(f"Media '{name}' not found in the zip.")
+    with archive.open(info) as source:
+        return stage_upload(user_id, source, os.path.basename(name))
+
+
+def _stage_media(user_id: int, chunk: List[Tuple[int, Dict]], archive: Optional[zipfile.ZipFile],
+                 executor: ThreadPoolExecutor, result: BulkResult) -> List[Tuple[int, Dict]]:
+    """Stages every referenced media file in parallel; drops (and reports) items whose media failed."""
+    futures = {lineno: executor.submit(_stage_member, user_id, archive, row["media"])
+               for lineno, row in chunk if row["media"]}
+    staged = []
+    for lineno, row in chunk:
+        if lineno in futures:
+            try:
+                saved = futures[lineno].result()
+            except Exception as e:
+                result.fail(lineno, f"Upload failed: {e}")
+                continue
+            row.update(media_path=saved.path, media_type=saved.media_type, media_sha256=saved.sha256,
+                       media_size=saved.size, staged_path=saved.staged_path, saved=saved)
+        staged.append((lineno, row))
+    return staged
+
+
+def _label(chunk: List[Tuple[int, Dict]], result: BulkResult):
+    """Fills in missing emotions: one classify_many pass, or provisional labels for the background worker."""
+    unlabeled = [row for _, row in chunk if not row["emotion"]]
+    if not unlabeled:
+        return
+    texts = [f"{row['title']}\n{row['desc']}" for row in unlabeled]
+    if uses_model_backend():
+        for row, text in zip(unlabeled, texts):
+            row["emotion"] = classify_rule_based(text)
+            row["classification_status"] = "pending"
+        result.pending_classification += len(unlabeled)
+    else:
+        for row, (label, _) in zip(unlabeled, classify_many(texts)):
+            row["emotion"] = label
+
+
+def _insert(user_id: int, chunk: List[Tuple[int, Dict]], result: BulkResult):
+    if not chunk:
+        return
+    try:
+        result.inserted += db.insert_memories(user_id, [row for _, row in chunk])
+        for _, row in chunk:
+            schedule_derivatives(row.get("media_path"), row.get("media_type"))
+        return
+    except Exception as e:
+        logger.warning("bulk chunk insert failed, retrying one by one user_id=%s rows=%d error=%s",
+                       user_id, len(chunk), e)
+
+    # Find the offending rows; the rest still go in
+    for lineno, row in chunk:
+        staged_path = row.get("staged_path")
+        if staged_path and not os.path.exists(staged_path):
+            staged_path = None  # moved into place before the chunk failed
+        try:
+            db.insert_memory(user_id, row["title"], row["desc"], row["emotion"], row["unlock_at_iso"],
+                             row.get("media_path"), row.get("media_type"), row["model_path"],
+                             media_sha256=row.get("media_sha256"), media_size=row.get("media_size"),
+                             staged_path=staged_path,
+                             classification_status=row.get("classification_status", "done"))
+            result.inserted += 1
+            schedule_derivatives(row.get("media_path"), row.get("media_type"))
+        except Exception as e:
+            if row.get("saved"):
+                discard_staged(row["saved"])
+            if row.get("classification_status") == "pending":
+                result.pending_classification -= 1
+            result.fail(lineno, f"Insert failed: {e}")
+
+
+def import_memories(user_id: int, lines: Iterable[bytes], media_zip: Optional[BinaryIO] = None,
+                    chunk_size: Optional[int] = None, workers: Optional[int] = None) -> BulkResult:
+    """
+    Imports NDJSON memories for one user. `lines` is read lazily, so a large
+    upload is never held in memory; `media_zip` must be seekable.
+    """
+    chunk_size = max(1, chunk_size or BULK_CHUNK_SIZE)
+    result = BulkResult()
+    archive = zipfile.ZipFile(media_zip) if media_zip is not None else None
+    try:
+        with ThreadPoolExecutor(max_workers=workers or BULK_MEDIA_WORKERS, thread_name_prefix="bulk-media") as executor:
+            def flush(chunk):
+                chunk = _stage_media(user_id, chunk, archive, executor, result)
+                _label(chunk, result)
+                _insert(user_id, chunk, result)
+
+            chunk: List[Tuple[int, Dict]] = []
+            for lineno, raw in enumerate(lines, start=1):
+                if not raw.strip():
+                    continue
+                try:
+                    chunk.append((lineno, parse_line(raw)))
+                except ValueError as e:
+                    result.fail(lineno, str(e))
+                    continue
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+            flush(chunk)
+    finally:
+        if archive is not None:
+            archive.close()
+    return result
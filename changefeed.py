@@ -0,0 +1,351 @@
+# changefeed.py
+# Per-user change feed behind GET /api/memories/stream (Server-Sent Events).
+# Writers publish insert/delete/update events to a broker, which fans them
+# out to that user's subscribers and keeps a short history so a reconnecting
+# client can resume from the last version it saw (Last-Event-ID). Versions
+# are the memory_versions counters, so they line up with listing ETags.
+#
+# Each subscriber has a bounded queue. A consumer too slow to keep up never
+# blocks publishers or grows without bound: its backlog is dropped and
+# replaced by a single "resync" event, telling it to refetch the listing.
+# The same happens when a resume point is older than the history, or when
+# the watcher sees a write made outside this process (e.g. a Streamlit page).
+# "unlock" events come from the watcher when a memory's unlock time passes.
+#
+# The broker is chosen by CHANGE_FEED_BROKER from the ones registered with
+# register_broker; "local" keeps everything in-process.
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import db
+
+# Events kept per user for resume
+CHANGE_FEED_HISTORY = int(os.getenv("CHANGE_FEED_HISTORY", "256"))
+# Events a subscriber may have queued before it is told to resync instead
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "100"))
+# Users whose version/history is remembered after their last subscriber left
+CHANGE_FEED_MAX_USERS = int(os.getenv("CHANGE_FEED_MAX_USERS", "10000"))
+# Comment line sent on idle streams so proxies don't close them
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))
+# How often the watcher checks for outside writes and due unlocks
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "2"))
+CHANGE_FEED_BROKER = os.getenv("CHANGE_FEED_BROKER", "local").lower()
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Event:
+    type: str
+    data: Dict[str, Any]
+    # None for events that don't change the stored garden (unlocks); they
+    # carry no SSE id, so they don't move the client's resume point
+    version: Optional[int] = None
+    _encoded: Optional[bytes] = field(default=None, repr=False, compare=False)
+
+    def encode(self) -> bytes:
+        """The SSE frame, built once and shared by every subscriber."""
+        if self._encoded is None:
+            head = f"id: {self.version}\n" if self.version is not None else ""
+            self._encoded = f"{head}event: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n".encode()
+        return self._encoded
+
+
+def resync_event(version: int, reason: str) -> Event:
+    return Event("resync", {"version": version, "reason": reason}, version)
+
+
+class Subscription:
+    """One client's stream. Lives on the event loop it was created on; other threads deliver via put_threadsafe."""
+
+    __slots__ = ("user_id", "loop", "version", "_queue", "_maxsize", "_ready")
+
+    def __init__(self, user_id: int, version: int, maxsize: int = CHANGE_FEED_QUEUE_SIZE):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.version = version
+        self._queue: Deque[Event] = deque()
+        self._maxsize = maxsize
+        self._ready = asyncio.Event()
+
+    def put(self, event: Event):
+        if event.version is not None:
+            self.version = max(self.version, event.version)
+        if len(self._queue) >= self._maxsize:
+            # Too far behind: replace the backlog with one resync
+            self._queue.clear()
+            event = resync_event(self.version, "lagged")
+        self._queue.append(event)
+        self._ready.set()
+
+    def put_threadsafe(self, event: Event):
+        try:
+            self.loop.call_soon_threadsafe(self.put, event)
+        except RuntimeError:  # loop already closed; the stream is gone
+            pass
+
+    async def get(self) -> Event:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.popleft()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+
+@dataclass
+class _UserFeed:
+    # Highest version published; history covers (floor, last]
+    last: int
+    floor: int
+    history: Deque[Event] = field(default_factory=lambda: deque(maxlen=CHANGE_FEED_HISTORY))
+    subscribers: Set[Subscription] = field(default_factory=set)
+
+
+class LocalBroker:
+    """
+    In-process pub/sub. A broker for several processes (Redis, NATS...) needs
+    the same methods: publish, resync, observe, subscribe, unsubscribe,
+    subscribed_users and stats.
+    """
+
+    def __init__(self, history: int = CHANGE_FEED_HISTORY, max_users: int = CHANGE_FEED_MAX_USERS):
+        self.history = history
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserFeed]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _feed(self, user_id: int, version: int) -> _UserFeed:
+        feed = self._users.get(user_id)
+        if feed is None:
+            feed = self._users[user_id] = _UserFeed(version, version, deque(maxlen=self.history))
+            if len(self._users) > self.max_users:
+                # Forget the least recently active idle users; live ones are kept
+                excess = len(self._users) - self.max_users
+                for idle in [u for u, f in self._users.items() if not f.subscribers][:excess]:
+                    del self._users[idle]
+        self._users.move_to_end(user_id)
+        return feed
+
+    def _reset(self, feed: _UserFeed, version: int, reason: str):
+        feed.history.clear()
+        feed.last = feed.floor = version
+        event = resync_event(version, reason)
+        for sub in feed.subscribers:
+            sub.put_threadsafe(event)
+
+    def publish(self, user_id: int, event_type: str, data: Dict[str, Any],
+                version: Optional[int] = None, changes: int = 1):
+        """
+        Sends an event to the user's subscribers. `version` is the user's
+        memory version after the write and `changes` the number of rows it
+        touched; a gap before it (a write nobody published) turns the event
+        into a resync. Events without a version are delivered but not kept.
+        Safe to call from any thread.
+        """
+        event = Event(event_type, data, version)
+        with self._lock:
+            if version is None:
+                feed = self._users.get(user_id)
+                for sub in feed.subscribers if feed else ():
+                    sub.put_threadsafe(event)
+                return
+            feed = self._feed(user_id, version - changes)
+            if version - changes > feed.last:
+                self._reset(feed, version, "gap")
+                return
+            if len(feed.history) == feed.history.maxlen:
+                feed.floor = feed.history[0].version
+            feed.history.append(event)
+            feed.last = max(feed.last, version)
+            for sub in feed.subscribers:
+                sub.put_threadsafe(event)
+
+    def resync(self, user_id: int, version: int, reason: str):
+        """Tells the user's subscribers to refetch, e.g. after a bulk import."""
+        with self._lock:
+            self._reset(self._feed(user_id, version), version, reason)
+
+    def observe(self, user_id: int, version: int):
+        """Reports the user's stored version; if it moved past what was published, subscribers resync."""
+        with self._lock:
+            feed = self._users.get(user_id)
+            if feed is not None and version > feed.last:
+                self._reset(feed, version, "external")
+
+    def subscribe(self, user_id: int, current_version: int, since: Optional[int] = None) -> Subscription:
+        """
+        Registers a stream for the user. With `since`, the events after that
+        version are queued first, or a resync if they are no longer all kept.
+        Must be called on the event loop that will consume the stream.
+        """
+        sub = Subscription(user_id, current_version)
+        with self._lock:
+            feed = self._feed(user_id, current_version)
+            if current_version > feed.last:
+                self._reset(feed, current_version, "external")
+            if since is not None and since != feed.last:
+                if feed.floor <= since < feed.last:
+                    for event in feed.history:
+                        if event.version > since:
+                            sub.put(event)
+                else:
+                    sub.put(resync_event(feed.last, "expired"))
+            sub.version = max(sub.version, feed.last)
+            feed.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            feed = self._users.get(sub.user_id)
+            if feed is not None:
+                feed.subscribers.discard(sub)
+
+    def subscribed_users(self) -> List[int]:
+        with self._lock:
+            return [u for u, f in self._users.items() if f.subscribers]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "subscribers": sum(len(f.subscribers) for f in self._users.values()),
+                "queued": sum(s.pending() for f in self._users.values() for s in f.subscribers),
+            }
+
+
+_BROKERS: Dict[str, Callable[[], Any]] = {"local": LocalBroker}
+_broker: Optional[Any] = None
+_broker_lock = threading.Lock()
+
+
+def register_broker(name: str, factory: Callable[[], Any]):
+    """Registers a broker implementation selectable with CHANGE_FEED_BROKER."""
+    global _broker
+    with _broker_lock:
+        _BROKERS[name] = factory
+        _broker = None
+
+
+def get_broker():
+    """The configured broker, created on first use."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = _BROKERS[CHANGE_FEED_BROKER]()
+    return _broker
+
+
+async def stream(user_id: int, current_version: int, since: Optional[int] = None,
+                 heartbeat: float = CHANGE_FEED_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+    """SSE body for one client: subscribes on first read and unsubscribes when the client goes away."""
+    broker = get_broker()
+    sub = broker.subscribe(user_id, current_version, since)
+    try:
+        # Tells the client the version it starts from, so it can resume from there
+        yield Event("ready", {"version": sub.version}, sub.version).encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(sub)
+
+
+def parse_unlock(value: str) -> Optional[float]:
+    """Unlock time as a UTC timestamp; naive values are taken as UTC, like created_at."""
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class ChangeWatcher:
+    """
+    Polls on behalf of subscribed users: resyncs them after writes made
+    outside this process, and publishes "unlock" when a memory's unlock
+    time passes. Costs one query per poll for the versions, plus one per
+    user whose version changed to reload their unlock times.
+    """
+
+    def __init__(self, poll_seconds: float = CHANGE_FEED_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # user_id -> (version the times were loaded at, sorted [(unlock_ts, memory_id)])
+        self._unlocks: Dict[int, Tuple[int, List[Tuple[float, int]]]] = {}
+        self._last_poll = time.time()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._last_poll = time.time()
+        self._thread = threading.Thread(target=self._run, name="change-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """One poll; returns the number of unlock events published."""
+        now = time.time() if now is None else now
+        since, self._last_poll = self._last_poll, now
+        broker = get_broker()
+        users = broker.subscribed_users()
+        for gone in set(self._unlocks) - set(users):
+            del self._unlocks[gone]
+        if not users:
+            return 0
+
+        versions = db.get_memory_versions(users)
+        published = 0
+        for user_id in users:
+            version = versions.get(user_id, 0)
+            broker.observe(user_id, version)
+            loaded = self._unlocks.get(user_id)
+            if loaded is None or loaded[0] != version:
+                # Anything unlocking since the previous poll still gets its event
+                cutoff = since if loaded is not None else now
+                times = sorted((ts, memory_id) for memory_id, unlock_at in db.list_unlock_times(user_id)
+                               if (ts := parse_unlock(unlock_at)) is not None and ts > cutoff)
+                loaded = self._unlocks[user_id] = (version, times)
+            times = loaded[1]
+            due = bisect.bisect_right(times, (now, float("inf")))
+            if due:
+                broker.publish(user_id, "unlock", {"ids": [memory_id for _, memory_id in times[:due]]})
+                del times[:due]
+                published += 1
+        return published
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("change feed poll failed")
+
+
+watcher = ChangeWatcher()
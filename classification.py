@@ -0,0 +1,97 @@
+# classification.py
+# Background emotion classification. create_memory stores a provisional
+# rule-based label with classification_status='pending'; this worker drains
+# those rows in batches through emotions.classify_many and writes the final
+# label back, announcing it on the owner's change feed. The queue is the
+# memories table itself, so pending work survives a restart. Rows the model
+# backend fails on stay pending and are retried with backoff; once out of
+# attempts they keep the rule-based label as classification_status='fallback'.
+
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+import db
+from changefeed import get_broker
+from emotions import model_labels
+
+CLASSIFY_WORKER_BATCH = int(os.getenv("CLASSIFY_WORKER_BATCH", "32"))
+# Fallback poll for rows queued by other processes (e.g. the Streamlit pages)
+CLASSIFY_POLL_SECONDS = float(os.getenv("CLASSIFY_POLL_SECONDS", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class ClassificationWorker:
+    def __init__(self, batch_size: int = CLASSIFY_WORKER_BATCH, poll_seconds: float = CLASSIFY_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="classification", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wakes the worker after new pending memories were inserted."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops after the batch in progress; unfinished rows stay pending for next start."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> int:
+        """Classifies one batch of pending memories; returns how many were processed."""
+        pending = db.list_pending_classifications(self.batch_size)
+        if not pending:
+            return 0
+        labels = model_labels([f"{title}\n{desc or ''}" for _, _, title, desc in pending], self.batch_size)
+        done = {row[0]: label for row, label in zip(pending, labels) if label}
+        failed = [row[0] for row in pending if row[0] not in done]
+        if done:
+            db.update_classifications(list(done.items()))
+        given_up = set(db.defer_classifications(failed)) if failed else set()
+        if failed:
+            logger.warning("classification deferred count=%d gave_up=%d", len(failed) - len(given_up), len(given_up))
+        self._publish([row for row in pending if row[0] in done or row[0] in given_up], done)
+        return len(pending)
+
+    def _publish(self, rows, done: Dict[int, str]):
+        """Pushes final labels (and rows left on their fallback label) to the owners' change feeds."""
+        by_user: Dict[int, List[Dict]] = {}
+        for memory_id, user_id, _, _ in rows:
+            update = {"id": memory_id, "emotion": done[memory_id], "classification_status": "done"} \
+                if memory_id in done else {"id": memory_id, "classification_status": "fallback"}
+            by_user.setdefault(user_id, []).append(update)
+        if not by_user:
+            return
+        broker = get_broker()
+        versions = db.get_memory_versions(list(by_user))
+        for user_id, memories in by_user.items():
+            broker.publish(user_id, "update", {"memories": memories}, versions.get(user_id, 0), len(memories))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception("classification batch failed")
+                processed = 0
+            # A full batch means there is probably more waiting; otherwise sleep until notified
+            if processed < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+
+worker = ClassificationWorker()
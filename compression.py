@@ -0,0 +1,207 @@
+# compression.py
+# Negotiated response compression for the API (zstd, brotli or gzip, by the
+# client's Accept-Encoding and then our preference). Only text-like payloads
+# (JSON, NDJSON, SVG, text/*) are compressed; images and video are already
+# compressed and pass through untouched, as do small bodies and byte ranges.
+# Streaming responses are compressed chunk by chunk, flushed after each
+# chunk so nothing is held back waiting for more data.
+
+import os
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this (by Content-Length) go out uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Levels tuned for per-request compression rather than best ratio
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", "3"))
+# Chunks at least this big are compressed on a worker thread so a large
+# garden listing doesn't stall the event loop
+COMPRESS_OFFLOAD_SIZE = int(os.getenv("COMPRESS_OFFLOAD_SIZE", str(256 * 1024)))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml", "text/")
+# Event streams are latency-sensitive and left alone, as Starlette's GZipMiddleware does
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+class _Gzip:
+    def __init__(self):
+        self._z = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._z.compress(data)
+
+    def flush(self) -> bytes:
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data)
+
+    def flush(self) -> bytes:
+        return self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+# Content-Encoding token -> encoder factory, most preferred first
+ENCODERS: Dict[str, Callable] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = _Zstd
+if brotli is not None:
+    ENCODERS["br"] = _Brotli
+ENCODERS["gzip"] = _Gzip
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Picks the encoding for an Accept-Encoding header: highest q, then our preference."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingSender(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressingSender:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start: Optional[Message] = None
+        self.encoder = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    def _should_compress(self, message: Message) -> Tuple[bool, bool]:
+        """Returns (vary, compress): whether the response depends on Accept-Encoding, and whether to encode it."""
+        headers = Headers(raw=message["headers"])
+        if message["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False, False
+        if not is_compressible(headers.get("content-type", "")):
+            return False, False
+        length = headers.get("content-length")
+        if length is not None and int(length) < self.minimum_size:
+            return True, False
+        return True, True
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            vary, compress = self._should_compress(message)
+            headers = MutableHeaders(raw=message["headers"])
+            if vary:
+                headers.add_vary_header("Accept-Encoding")
+            if not compress:
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+            # The encoded bytes are a different representation; a strong validator would lie
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.encoder is None:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if len(body) >= COMPRESS_OFFLOAD_SIZE:
+            data = await run_in_threadpool(self._encode, body, more_body)
+        else:
+            data = self._encode(body, more_body)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body:
+                # Whole body in one message: send it with an exact Content-Length
+                MutableHeaders(raw=start["headers"])["Content-Length"] = str(len(data))
+            await self.send(start)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _encode(self, body: bytes, more_body: bool) -> bytes:
+        # Flushed after every streamed chunk so the client gets it now, not with the next one
+        data = self.encoder.compress(body)
+        return data + (self.encoder.flush() if more_body else self.encoder.finish())
@@ -1,15 +1,163 @@
 # db.py
 
 import os, sqlite3,tempfile
+import json, logging, queue, threading, time, uuid
+from contextlib import contextmanager
 from datetime import datetime
+from functools import wraps
 from typing import Optional, Tuple, List, Dict
 
+from metrics import DB_CALL_SECONDS, timed
+
 DB_DIR = os.path.join(tempfile.gettempdir(), "data")
 DB_PATH = os.path.join(DB_DIR, "memoryscape.db")
 
+# Connection pool tuning. Every connection runs in WAL mode so readers are
+# never blocked by the single writer. The pool is sized for the threads that
+# hold a connection at once: async_db's readers and writer, the classifier,
+# reaper and change-watcher threads, and callers that borrow one directly
+# (Starlette's threadpool for bulk import, classify and media; Streamlit pages).
+DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "7"))
+DB_BACKGROUND_THREADS = 3
+DB_SHARED_CALLERS = int(os.getenv("DB_SHARED_CALLERS", "16"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_READ_WORKERS + 1 + DB_BACKGROUND_THREADS + DB_SHARED_CALLERS)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "5"))
+DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.05"))
+# Memory ids per delete transaction: bigger chunks amortize commits, smaller
+# ones release the write lock sooner. Ids are bound as one JSON array, so
+# SQLite's bound-variable limit doesn't apply.
+DELETE_CHUNK_SIZE = int(os.getenv("DELETE_CHUNK_SIZE", "5000"))
+# Unreferenced media files are removed by reaper.py; failed removals are retried
+# with exponential backoff and given up (and logged) after this many attempts.
+REAP_MAX_ATTEMPTS = int(os.getenv("REAP_MAX_ATTEMPTS", "8"))
+REAP_RETRY_BACKOFF = float(os.getenv("REAP_RETRY_BACKOFF", "5"))
+# Pending memories the model backend could not label are retried the same
+# way, then keep their rule-based label with classification_status='fallback'.
+CLASSIFY_MAX_ATTEMPTS = int(os.getenv("CLASSIFY_MAX_ATTEMPTS", "6"))
+CLASSIFY_RETRY_BACKOFF = float(os.getenv("CLASSIFY_RETRY_BACKOFF", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class PoolExhausted(sqlite3.OperationalError):
+    """No pooled connection came free within DB_BUSY_TIMEOUT_MS; the API answers 503."""
+
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections shared by all worker threads.
+
+    Connections are handed out one caller at a time; when the pool is empty
+    callers wait until one is returned instead of opening unbounded extras.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _open_connection(self.path)
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        except queue.Empty:
+            raise PoolExhausted("database connection pool exhausted") from None
+
+    def release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide pool, (re)creating it if DB_PATH changed."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.path != DB_PATH or pool._closed:
+        with _pool_lock:
+            if _pool is None or _pool.path != DB_PATH or _pool._closed:
+                if _pool is not None:
+                    _pool.close()
+                _pool = ConnectionPool(DB_PATH)
+            pool = _pool
+    return pool
+
+
+def close_pool():
+    """Closes every pooled connection. Called from the FastAPI shutdown hook."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def retry_on_busy(fn):
+    """Retries a DB function with exponential backoff when SQLite reports busy."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(DB_RETRY_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == DB_RETRY_ATTEMPTS - 1:
+                    raise
+                time.sleep(DB_RETRY_BACKOFF * (2 ** attempt))
+    return wrapper
+
+
 def init_db():
     os.makedirs(DB_DIR, exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_conn() as conn:
         c = conn.cursor()
         c.execute("""
         CREATE TABLE IF NOT EXISTS users (
@@ -36,10 +184,164 @@ def init_db():
         );
         """)
         conn.commit()
+        apply_migrations(conn)
+
+# Versioned schema migrations, tracked with PRAGMA user_version. Append new
+# (version, statements) entries; never edit one that has already shipped.
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_memories_user_created "
+        "ON memories(user_id, created_at DESC, id DESC)",
+    ]),
+    (2, [
+        # Content-addressed media: one row per stored file, shared by every
+        # memory whose media_path points at it.
+        """
+        CREATE TABLE IF NOT EXISTS media_blobs (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            media_type TEXT,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_media_blobs_sha256 ON media_blobs(sha256)",
+    ]),
+    (3, [
+        # 'pending' rows carry a provisional emotion until the background
+        # classifier (classification.py) replaces it; the partial index is its queue.
+        "ALTER TABLE memories ADD COLUMN classification_status TEXT NOT NULL DEFAULT 'done'",
+        "CREATE INDEX IF NOT EXISTS idx_memories_classification_pending "
+        "ON memories(id) WHERE classification_status = 'pending'",
+    ]),
+    (4, [
+        # Persistent tier of emotions.result_cache, namespaced by backend
+        """
+        CREATE TABLE IF NOT EXISTS emotion_cache (
+            text_sha256 TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            label TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (text_sha256, backend)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (5, [
+        # Media files no memory references any more, waiting for the reaper
+        """
+        CREATE TABLE IF NOT EXISTS media_tombstones (
+            path TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_media_tombstones_due ON media_tombstones(next_attempt_at)",
+    ]),
+    (6, [
+        # Per-user change counter behind the listing ETag. Triggers keep it
+        # current for every writer (API, bulk import, classifier, Streamlit pages).
+        """
+        CREATE TABLE IF NOT EXISTS memory_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_memories_version_insert AFTER INSERT ON memories BEGIN
+            INSERT INTO memory_versions(user_id, version) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_memories_version_delete AFTER DELETE ON memories BEGIN
+            INSERT INTO memory_versions(user_id, version) VALUES (OLD.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_memories_version_update AFTER UPDATE ON memories BEGIN
+            INSERT INTO memory_versions(user_id, version) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO memory_versions(user_id, version) SELECT OLD.user_id, 1 WHERE OLD.user_id != NEW.user_id
+            ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+    ]),
+    (7, [
+        # Garden position of each memory's flower, placed once (GardenHybrid)
+        # and read back on every page load. Kept out of `memories` so writing
+        # a position doesn't bump the listing version.
+        """
+        CREATE TABLE IF NOT EXISTS garden_layout (
+            memory_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            emotion TEXT NOT NULL,
+            x REAL NOT NULL,
+            y REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_garden_layout_user ON garden_layout(user_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_memories_layout_delete AFTER DELETE ON memories BEGIN
+            DELETE FROM garden_layout WHERE memory_id = OLD.id;
+        END
+        """,
+    ]),
+    (8, [
+        # Sunflower slot of the flower within its emotion cluster; x/y follow
+        # it when clusters are re-tiled. NULL (rows from before) means unplaced.
+        "ALTER TABLE garden_layout ADD COLUMN slot INTEGER",
+    ]),
+    (9, [
+        # Backoff for pending memories the model backend failed on. Kept out
+        # of `memories` so a retry being scheduled doesn't bump the listing version.
+        """
+        CREATE TABLE IF NOT EXISTS classification_retries (
+            memory_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            next_attempt_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_memories_classification_retry_delete AFTER DELETE ON memories BEGIN
+            DELETE FROM classification_retries WHERE memory_id = OLD.id;
+        END
+        """,
+    ]),
+]
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """Applies every migration newer than the database's user_version."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(f"PRAGMA user_version={version}")
+        conn.commit()
+        current = version
+    return current
 
+@contextmanager
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """Borrows a pooled connection; commits on success, rolls back on error."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.release(conn)
 
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
 def create_user(email: str, name: str, password_hash: bytes) -> Tuple[bool, Optional[str]]:
     try:
         with get_conn() as conn:
@@ -52,76 +354,430 @@ def create_user(email: str, name: str, password_hash: bytes) -> Tuple[bool, Opti
     except sqlite3.IntegrityError as e:
         return False, "Email already registered"
 
+@timed(DB_CALL_SECONDS)
 def get_user_by_email(email: str) -> Optional[Tuple]:
     with get_conn() as conn:
         cur = conn.execute("SELECT id,email,name,password_hash,created_at FROM users WHERE email=?", (email,))
         return cur.fetchone()
 
-def insert_memory(user_id: int, title: str, desc: str, emotion: str,unlock_at_iso: Optional[str], media_path: Optional[str],media_type: Optional[str],model_path: Optional[str]) -> int:
+def _media_root() -> str:
+    return os.getenv("MEDIA_ROOT", "uploads")
+
+def _retain_media(conn: sqlite3.Connection, media_path: str, sha256: str, size: int,
+                  media_type: Optional[str], staged_path: Optional[str]):
+    """
+    Adds a reference to a content-addressed file, moving its staged upload
+    into place. Runs inside the caller's write transaction so it can't
+    interleave with a delete releasing the same file.
+    """
+    conn.execute("""
+        INSERT INTO media_blobs(path, sha256, size, media_type, refcount, created_at)
+        VALUES(?,?,?,?,1,?)
+        ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1
+        """, (media_path, sha256, size, media_type, datetime.utcnow().isoformat()))
+    # Re-referenced before the reaper got to it: keep the file
+    conn.execute("DELETE FROM media_tombstones WHERE path=?", (media_path,))
+    full_path = os.path.join(_media_root(), media_path)
+    if staged_path:
+        if os.path.exists(full_path):
+            try:
+                os.remove(staged_path)
+            except FileNotFoundError:
+                pass  # already moved by an attempt retry_on_busy rolled back
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(staged_path, full_path)
+
+def _release_media(conn: sqlite3.Connection, media_paths: List[str]) -> List[str]:
+    """
+    Drops one reference per entry in media_paths and tombstones files nobody
+    references any more; reaper.py removes them from disk later. Paths that
+    predate the blob table are tombstoned outright, as before. Returns the
+    tombstoned paths.
+    """
+    counts: Dict[str, int] = {}
+    for path in media_paths:
+        counts[path] = counts.get(path, 0) + 1
+
+    conn.executemany("UPDATE media_blobs SET refcount = refcount - ? WHERE path=?",
+                     [(n, path) for path, n in counts.items()])
+    paths = list(counts)
+    refcounts = dict(conn.execute(
+        "SELECT path, refcount FROM media_blobs WHERE path IN (SELECT value FROM json_each(?))",
+        (json.dumps(paths),)).fetchall())
+    tombstoned = [path for path in paths if refcounts.get(path, 0) <= 0]
+
+    now = datetime.utcnow().isoformat()
+    conn.executemany("DELETE FROM media_blobs WHERE path=?", [(path,) for path in tombstoned])
+    conn.executemany("INSERT OR IGNORE INTO media_tombstones(path, created_at) VALUES(?,?)",
+                     [(path, now) for path in tombstoned])
+    return tombstoned
+
+def _trash_dir() -> str:
+    # Under MEDIA_ROOT so claiming is a rename on the same filesystem; media.py never serves dot paths
+    return os.path.join(_media_root(), ".trash")
+
+def _empty_trash() -> int:
+    """Unlinks whatever reap_media moved into the trash dir; files that fail stay for the next run."""
+    removed = 0
+    try:
+        entries = list(os.scandir(_trash_dir()))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("media trash unlink failed path=%s error=%s", entry.name, e)
+    return removed
+
+@retry_on_busy
+def _claim_tombstones(limit: int) -> int:
+    """
+    Settles up to `limit` due tombstones in one short write transaction. A
+    file still unreferenced is claimed by renaming it (and its derivatives)
+    into the trash dir, so an upload of the same content after the commit
+    writes a fresh file instead of re-referencing one about to be unlinked.
+    """
+    from storage import derivative_paths, infer_media_type
+
+    now = time.time()
+    settled, retries = [], []
+    trash = _trash_dir()
+    os.makedirs(trash, exist_ok=True)
     with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("""
+            SELECT t.path, t.attempts, b.refcount FROM media_tombstones t
+            LEFT JOIN media_blobs b ON b.path = t.path
+            WHERE t.next_attempt_at <= ? ORDER BY t.next_attempt_at LIMIT ?
+            """, (now, limit)).fetchall()
+        for path, attempts, refcount in rows:
+            if refcount and refcount > 0:
+                settled.append(path)  # referenced again; keep the file
+                continue
+            files = [path] + (derivative_paths(path) if infer_media_type(path) == "image" else [])
+            try:
+                for name in files:
+                    try:
+                        os.replace(os.path.join(_media_root(), name), os.path.join(trash, uuid.uuid4().hex))
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                attempts += 1
+                if attempts >= REAP_MAX_ATTEMPTS:
+                    logger.error("media reap abandoned path=%s attempts=%d error=%s", path, attempts, e)
+                    settled.append(path)
+                else:
+                    logger.warning("media reap failed path=%s attempts=%d error=%s", path, attempts, e)
+                    retries.append((attempts, now + REAP_RETRY_BACKOFF * 2 ** (attempts - 1), str(e), path))
+                continue
+            settled.append(path)
+        conn.executemany("DELETE FROM media_tombstones WHERE path=?", [(path,) for path in settled])
+        conn.executemany("UPDATE media_tombstones SET attempts=?, next_attempt_at=?, last_error=? WHERE path=?", retries)
+        conn.commit()
+    return len(settled)
+
+@timed(DB_CALL_SECONDS)
+def reap_media(limit: int = 200) -> int:
+    """
+    Removes up to `limit` tombstoned media files (and their derivatives) that
+    are due. The write lock is held only while the files are claimed (renamed
+    into the trash dir); the unlinks happen after the commit. Returns how
+    many tombstones were settled.
+    """
+    settled = _claim_tombstones(limit)
+    removed = _empty_trash()
+    if settled:
+        logger.info("media reaped count=%d files_removed=%d", settled, removed)
+    return settled
+
+@timed(DB_CALL_SECONDS)
+def count_tombstones() -> int:
+    with get_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM media_tombstones").fetchone()[0]
+
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def insert_memory(user_id: int, title: str, desc: str, emotion: str,unlock_at_iso: Optional[str], media_path: Optional[str],media_type: Optional[str],model_path: Optional[str],
+                  media_sha256: Optional[str] = None, media_size: Optional[int] = None, staged_path: Optional[str] = None,
+                  classification_status: str = "done") -> int:
+    """
+    Inserts a memory. Pass media_sha256/media_size (and staged_path for a
+    fresh upload) when media_path is a content-addressed file so its
+    reference count is tracked. classification_status="pending" queues the
+    memory for the background classifier.
+    """
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if media_path and media_sha256:
+            _retain_media(conn, media_path, media_sha256, media_size or 0, media_type, staged_path)
         cur = conn.execute("""
-            INSERT INTO memories(user_id,title,description,emotion,unlock_at,created_at,media_path,media_type, model_path)
-            VALUES(?,?,?,?,?,?,?,?,?)
-            """, (user_id, title, desc, emotion, unlock_at_iso, datetime.utcnow().isoformat(), media_path, media_type, model_path))
+            INSERT INTO memories(user_id,title,description,emotion,unlock_at,created_at,media_path,media_type, model_path, classification_status)
+            VALUES(?,?,?,?,?,?,?,?,?,?)
+            """, (user_id, title, desc, emotion, unlock_at_iso, datetime.utcnow().isoformat(), media_path, media_type, model_path,
+                  classification_status))
         conn.commit()
         return cur.lastrowid
 
-def list_memories(user_id: int) -> List[Dict]:
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def insert_memories(user_id: int, rows: List[Dict]) -> int:
+    """
+    Inserts many memories for one user in a single write transaction with
+    executemany. Each row is a dict with insert_memory's fields ("title",
+    "desc", "emotion", "unlock_at_iso", "media_path", "media_type",
+    "model_path", "media_sha256", "media_size", "staged_path",
+    "classification_status") plus an optional "created_at". Returns the
+    number of rows inserted.
+    """
+    now = datetime.utcnow().isoformat()
     with get_conn() as conn:
-        cur = conn.execute("""
-            SELECT id, user_id, title, description, emotion, unlock_at, created_at, media_path, media_type, model_path
-            FROM memories WHERE user_id=? ORDER BY created_at DESC
-        """, (user_id,))
-        rows = cur.fetchall()
-    
-    data = []
-    for r in rows:
-        data.append({
-            "id": r[0], "user_id": r[1], "title": r[2], "description": r[3], "emotion": r[4],
-            "unlock_at": r[5], "created_at": r[6], "media_path": r[7], "media_type": r[8],
-            "model_path": r[9] 
-        })
-    return data
-
-
-def delete_memories(user_id: int, memory_ids: List[int]) -> bool:
-    """
-    Deletes memories from the database that match the provided IDs AND the user_id.
-    Also removes their associated media files from storage.
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("""
+            INSERT INTO memories(user_id,title,description,emotion,unlock_at,created_at,media_path,media_type, model_path, classification_status)
+            VALUES(?,?,?,?,?,?,?,?,?,?)
+            """, [(user_id, r["title"], r.get("desc") or "", r["emotion"], r.get("unlock_at_iso"), r.get("created_at") or now,
+                   r.get("media_path"), r.get("media_type"), r.get("model_path"), r.get("classification_status", "done"))
+                  for r in rows])
+        # Files move into place only once every row is in, so a failed chunk leaves its uploads staged
+        for r in rows:
+            if r.get("media_path") and r.get("media_sha256"):
+                _retain_media(conn, r["media_path"], r["media_sha256"], r.get("media_size") or 0,
+                              r.get("media_type"), r.get("staged_path"))
+        conn.commit()
+    return len(rows)
+
+# Columns of a memory row, in the order _memory_row_to_dict reads them
+MEMORY_FIELDS = ("id", "user_id", "title", "description", "emotion", "unlock_at", "created_at",
+                 "media_path", "media_type", "model_path", "classification_status")
+
+@timed(DB_CALL_SECONDS)
+def list_memories(user_id: int, limit: Optional[int] = None,
+                  before_created_at: Optional[str] = None, before_id: Optional[int] = None,
+                  fields: Optional[List[str]] = None) -> List[Dict]:
     """
-    if not memory_ids or not user_id:
-        return False
+    Lists a user's memories newest first.
+    Pass `limit` to get one page, and the `created_at`/`id` of the last row
+    of the previous page as `before_created_at`/`before_id` to get the next.
+    Pass `fields` (names from MEMORY_FIELDS) to select only those columns.
+    """
+    columns = MEMORY_FIELDS
+    if fields:
+        unknown = set(fields) - set(MEMORY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown memory fields: {', '.join(sorted(unknown))}")
+        columns = tuple(f for f in MEMORY_FIELDS if f in fields)
+    sql = f"SELECT {', '.join(columns)} FROM memories WHERE user_id=?"
+    params: list = [user_id]
+    if before_created_at is not None:
+        if before_id is None:
+            sql += " AND created_at < ?"
+            params.append(before_created_at)
+        else:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += [before_created_at, before_id]
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
 
-    media_root = os.getenv("MEDIA_ROOT", "uploads")
-    placeholders = ",".join("?" for _ in memory_ids)
-    
-    # Parameters for the SQL query, including the user_id for the WHERE clause
-    params = memory_ids + [user_id]
+    with get_conn() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    return [dict(zip(columns, r)) for r in rows]
 
+@timed(DB_CALL_SECONDS)
+def get_memory_version(user_id: int) -> int:
+    """The user's change counter; it grows whenever one of their memories is added, changed or deleted."""
     with get_conn() as conn:
-        # First, find the media paths for the memories that belong to the user
-        cursor = conn.execute(
-            f"SELECT media_path FROM memories WHERE id IN ({placeholders}) AND user_id = ?",
-            params
-        )
-        paths_to_delete = [row[0] for row in cursor.fetchall() if row[0]]
+        row = conn.execute("SELECT version FROM memory_versions WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
 
-        # Now, execute the delete operation, ensuring it's for the correct user
-        cursor = conn.execute(
-            f"DELETE FROM memories WHERE id IN ({placeholders}) AND user_id = ?",
-            params
-        )
+@timed(DB_CALL_SECONDS)
+def get_memory_versions(user_ids: List[int]) -> Dict[int, int]:
+    """Change counters for many users at once, as {user_id: version}; users without writes are omitted."""
+    with get_conn() as conn:
+        rows = conn.execute("""
+            SELECT user_id, version FROM memory_versions
+            WHERE user_id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(user_ids)),)).fetchall()
+    return dict(rows)
+
+@timed(DB_CALL_SECONDS)
+def list_unlock_times(user_id: int) -> List[Tuple[int, str]]:
+    """(id, unlock_at) of the user's memories that have an unlock date, past or future."""
+    with get_conn() as conn:
+        return conn.execute(
+            "SELECT id, unlock_at FROM memories WHERE user_id=? AND unlock_at IS NOT NULL", (user_id,)
+        ).fetchall()
+
+@timed(DB_CALL_SECONDS)
+def get_garden_positions(user_id: int) -> Dict[int, Tuple[str, Optional[int], float, float]]:
+    """Stored flower placements of the user's memories, as {memory_id: (emotion, slot, x, y)}."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT memory_id, emotion, slot, x, y FROM garden_layout WHERE user_id=?", (user_id,)
+        ).fetchall()
+    return {r[0]: (r[1], r[2], r[3], r[4]) for r in rows}
+
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def put_garden_positions(user_id: int, positions: List[Tuple[int, str, int, float, float]]) -> int:
+    """Stores (memory_id, emotion, slot, x, y) flower placements, replacing earlier ones for those memories."""
+    if not positions:
+        return 0
+    with get_conn() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO garden_layout(memory_id, user_id, emotion, slot, x, y) VALUES(?,?,?,?,?,?)",
+            [(memory_id, user_id, emotion, slot, x, y) for memory_id, emotion, slot, x, y in positions])
+    return len(positions)
+
+@timed(DB_CALL_SECONDS)
+def get_memory(memory_id: int, user_id: int) -> Optional[Dict]:
+    """Fetches a single memory by id, scoped to its owner."""
+    with get_conn() as conn:
+        row = conn.execute("""
+            SELECT id, user_id, title, description, emotion, unlock_at, created_at, media_path, media_type, model_path,
+                   classification_status
+            FROM memories WHERE id=? AND user_id=?
+        """, (memory_id, user_id)).fetchone()
+    return _memory_row_to_dict(row) if row else None
+
+@timed(DB_CALL_SECONDS)
+def get_memory_media(memory_id: int) -> Optional[Tuple[str, Optional[str]]]:
+    """Returns (media_path, media_type) for a memory that has media attached."""
+    with get_conn() as conn:
+        row = conn.execute("SELECT media_path, media_type FROM memories WHERE id=?", (memory_id,)).fetchone()
+    return (row[0], row[1]) if row and row[0] else None
+
+@timed(DB_CALL_SECONDS)
+def list_pending_classifications(limit: int) -> List[Tuple[int, int, str, Optional[str]]]:
+    """
+    Oldest memories waiting for the background classifier and not backing
+    off after a failure, as (id, user_id, title, description).
+    """
+    with get_conn() as conn:
+        return conn.execute("""
+            SELECT id, user_id, title, description FROM memories
+            WHERE classification_status = 'pending'
+              AND id NOT IN (SELECT memory_id FROM classification_retries WHERE next_attempt_at > ?)
+            ORDER BY id LIMIT ?
+        """, (time.time(), limit)).fetchall()
+
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def update_classifications(labels: List[Tuple[int, str]]) -> int:
+    """Stores (memory_id, emotion) results and marks those memories classified."""
+    with get_conn() as conn:
+        cur = conn.executemany("""
+            UPDATE memories SET emotion = ?, classification_status = 'done'
+            WHERE id = ? AND classification_status = 'pending'
+        """, [(emotion, memory_id) for memory_id, emotion in labels])
+        updated = cur.rowcount
+        conn.executemany("DELETE FROM classification_retries WHERE memory_id = ?", [(m,) for m, _ in labels])
+        return updated
+
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def defer_classifications(memory_ids: List[int]) -> List[int]:
+    """
+    Schedules another try, with exponential backoff, for pending memories
+    the model backend could not label. Those out of attempts keep their
+    provisional label as classification_status='fallback'; returns their ids.
+    """
+    now = time.time()
+    given_up, retries = [], []
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        attempts = dict(conn.execute(
+            "SELECT memory_id, attempts FROM classification_retries "
+            "WHERE memory_id IN (SELECT value FROM json_each(?))", (json.dumps(memory_ids),)).fetchall())
+        for memory_id in memory_ids:
+            tried = attempts.get(memory_id, 0) + 1
+            if tried >= CLASSIFY_MAX_ATTEMPTS:
+                given_up.append(memory_id)
+            else:
+                retries.append((memory_id, tried, now + CLASSIFY_RETRY_BACKOFF * 2 ** (tried - 1)))
+        conn.executemany("INSERT OR REPLACE INTO classification_retries(memory_id, attempts, next_attempt_at) "
+                         "VALUES(?,?,?)", retries)
+        conn.executemany("DELETE FROM classification_retries WHERE memory_id = ?", [(m,) for m in given_up])
+        conn.executemany("UPDATE memories SET classification_status = 'fallback' "
+                         "WHERE id = ? AND classification_status = 'pending'", [(m,) for m in given_up])
         conn.commit()
+    return given_up
 
-        # If rows were deleted, proceed to remove the associated files
-        if cursor.rowcount > 0:
-            for path in paths_to_delete:
-                full_path = os.path.join(media_root, path)
-                if os.path.exists(full_path):
-                    try:
-                        os.remove(full_path)
-                    except OSError as e:
-                        print(f"Error deleting file {full_path}: {e}")
-            return True
-            
-    return False
\ No newline at end of file
+@timed(DB_CALL_SECONDS)
+def get_cached_emotions(backend: str, text_sha256s: List[str]) -> Dict[str, str]:
+    """Cached labels for the given text hashes under one backend, as {sha256: label}."""
+    found: Dict[str, str] = {}
+    with get_conn() as conn:
+        # Chunked to stay under SQLite's bound-parameter limit
+        for start in range(0, len(text_sha256s), 500):
+            chunk = text_sha256s[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(conn.execute(
+                f"SELECT text_sha256, label FROM emotion_cache WHERE backend = ? AND text_sha256 IN ({placeholders})",
+                [backend, *chunk]).fetchall())
+    return found
+
+@timed(DB_CALL_SECONDS)
+@retry_on_busy
+def put_cached_emotions(backend: str, labels: Dict[str, str]):
+    """Stores {text_sha256: label} results for a backend."""
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO emotion_cache(text_sha256, backend, label, created_at) VALUES(?,?,?,?)",
+            [(sha, backend, label, now) for sha, label in labels.items()])
+
+def _memory_row_to_dict(r) -> Dict:
+    return {
+        "id": r[0], "user_id": r[1], "title": r[2], "description": r[3], "emotion": r[4],
+        "unlock_at": r[5], "created_at": r[6], "media_path": r[7], "media_type": r[8],
+        "model_path": r[9], "classification_status": r[10]
+    }
+
+
+@retry_on_busy
+def _delete_memory_chunk(user_id: int, memory_ids: List[int]) -> Tuple[List[int], int]:
+    params = (json.dumps(memory_ids), user_id)
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        # Read under the write lock, so these are exactly the rows the DELETE removes
+        rows = conn.execute(
+            # "+user_id" keeps the planner on the primary key instead of scanning the user's index
+            "SELECT id, media_path FROM memories WHERE id IN (SELECT value FROM json_each(?)) AND +user_id = ?", params
+        ).fetchall()
+        if rows:
+            conn.execute("DELETE FROM memories WHERE id IN (SELECT value FROM json_each(?)) AND +user_id = ?", params)
+        # Released inside the write transaction so a concurrent upload of the
+        # same content can't re-reference a file as it is tombstoned
+        tombstoned = _release_media(conn, [path for _, path in rows if path]) if rows else []
+        conn.commit()
+    return [memory_id for memory_id, _ in rows], len(tombstoned)
+
+@timed(DB_CALL_SECONDS)
+def delete_memories(user_id: int, memory_ids: List[int]) -> List[int]:
+    """
+    Deletes memories from the database that match the provided IDs AND the
+    user_id, DELETE_CHUNK_SIZE ids per transaction. Media nobody references
+    any more is tombstoned for reaper.py rather than removed here, so this
+    returns without touching the disk. Returns the ids of the memories deleted.
+    """
+    if not memory_ids or not user_id:
+        return []
+
+    ids = list(dict.fromkeys(memory_ids))
+    deleted: List[int] = []
+    tombstoned = 0
+    for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+        chunk_deleted, chunk_tombstoned = _delete_memory_chunk(user_id, ids[start:start + DELETE_CHUNK_SIZE])
+        deleted += chunk_deleted
+        tombstoned += chunk_tombstoned
+    logger.info("memories deleted user_id=%s requested=%d deleted=%d media_tombstoned=%d",
+                user_id, len(ids), len(deleted), tombstoned)
+    return deleted
@@ -1,5 +1,10 @@
-import os, re
-from typing import Literal, Tuple
+import hashlib, logging, os, re, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from metrics import CLASSIFIER_SECONDS, CLASSIFIER_TEXTS
+
+logger = logging.getLogger(__name__)
 
 # Plant mapping
 PLANT_BY_EMOTION = {
@@ -15,60 +20,306 @@ PLANT_BY_EMOTION = {
 
 DEFAULT_EMOTION = "nostalgic"
 
-def classify_rule_based(text: str) -> str:
+# super simple keyword buckets, in priority order (earlier wins ties)
+RULES = [
+    ("happy", ["happy", "joy", "glad", "smile", "delight", "celebrate"]),
+    ("romantic", ["love", "romance", "date", "anniversary", "kiss", "valentine"]),
+    ("sad", ["sad", "cry", "loss", "hurt", "miss", "lonely"]),
+    ("calm", ["calm", "peace", "relax", "serene", "quiet", "beach"]),
+    ("angry", ["angry", "mad", "rage", "furious", "annoyed"]),
+    ("nostalgic", ["old times", "nostalgia", "remember", "childhood", "school"]),
+    ("excited", ["excited", "thrill", "hype", "can’t wait", "win"]),
+    ("proud", ["proud", "achievement", "award", "rank", "milestone"]),
+]
+
+# Compiled once at import. Single-word keywords are a dict lookup per token;
+# the few multi-word phrases get one small regex, only tried when the text
+# contains a phrase's first word.
+_WORD = re.compile(r"\w+")
+_KEYWORD_LABELS = {k: label for label, keywords in RULES for k in keywords if _WORD.fullmatch(k)}
+_PHRASES = [(k, label) for label, keywords in RULES for k in keywords if not _WORD.fullmatch(k)]
+_PHRASE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(f"(?P<p{i}>{re.escape(k)})" for i, (k, _) in enumerate(_PHRASES)) + r")\b"
+)
+_PHRASE_LABELS = {f"p{i}": label for i, (_, label) in enumerate(_PHRASES)}
+_PHRASE_FIRST_WORDS = {_WORD.match(k).group() for k, _ in _PHRASES}
+_RULE_ORDER = {label: i for i, (label, _) in enumerate(RULES)}
+
+def score_rule_based(text: str) -> Dict[str, int]:
+    """Returns the number of keyword hits per label (labels without hits are omitted)."""
     t = text.lower()
-    # super simple keyword buckets
-    rules = [
-        (r"\b(happy|joy|glad|smile|delight|celebrate)\b", "happy"),
-        (r"\b(love|romance|date|anniversary|kiss|valentine)\b", "romantic"),
-        (r"\b(sad|cry|loss|hurt|miss|lonely)\b", "sad"),
-        (r"\b(calm|peace|relax|serene|quiet|beach)\b", "calm"),
-        (r"\b(angry|mad|rage|furious|annoyed)\b", "angry"),
-        (r"\b(old times|nostalgia|remember|childhood|school)\b", "nostalgic"),
-        (r"\b(excited|thrill|hype|can’t wait|win)\b", "excited"),
-        (r"\b(proud|achievement|award|rank|milestone)\b", "proud"),
-    ]
-    for pattern, label in rules:
-        if re.search(pattern, t):
-            return label
-    return DEFAULT_EMOTION
+    words = _WORD.findall(t)
+    scores: Dict[str, int] = {}
+    for label in filter(None, map(_KEYWORD_LABELS.get, words)):
+        scores[label] = scores.get(label, 0) + 1
+    if not _PHRASE_FIRST_WORDS.isdisjoint(words):
+        for m in _PHRASE_PATTERN.finditer(t):
+            label = _PHRASE_LABELS[m.lastgroup]
+            scores[label] = scores.get(label, 0) + 1
+    return scores
+
+def classify_rule_based(text: str) -> str:
+    scores = score_rule_based(text)
+    if not scores:
+        return DEFAULT_EMOTION
+    return min(scores, key=lambda label: (-scores[label], _RULE_ORDER[label]))
+
+# ---------- Model backends ----------
+# Each backend is a (loader, predict, predict_many) triple. The loader builds
+# the expensive model/client and runs at most once per process;
+# predict(model, text) maps its output onto our labels and
+# predict_many(model, texts) does the same for one batch in a single call.
+_BACKENDS: Dict[str, Tuple[Callable[[], Any], Callable[[Any, str], str], Callable[[Any, List[str]], List[str]]]] = {}
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+# Texts per model call in classify_many
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "32"))
+
+def register_backend(name: str, loader: Callable[[], Any], predict: Callable[[Any, str], str],
+                     predict_many: Optional[Callable[[Any, List[str]], List[str]]] = None):
+    """Registers a model backend; without predict_many, batches call predict per text."""
+    if predict_many is None:
+        predict_many = lambda model, texts: [predict(model, t) for t in texts]
+    with _models_lock:
+        _BACKENDS[name] = (loader, predict, predict_many)
+        _models.pop(name, None)
+
+def get_model(name: str) -> Optional[Any]:
+    """
+    Returns the backend's model, loading it on first use. Concurrent callers
+    wait for the single load; a failed load is remembered (None) so it is not
+    retried on every request.
+    """
+    try:
+        return _models[name]
+    except KeyError:
+        pass
+    with _models_lock:
+        if name not in _models:
+            loader = _BACKENDS[name][0]
+            try:
+                _models[name] = loader()
+            except Exception:
+                logger.exception("emotion backend load failed backend=%s, using the rule engine", name)
+                _models[name] = None
+        return _models[name]
+
+def uses_model_backend() -> bool:
+    """True when EMOTION_BACKEND is a model (slow) rather than the rule engine."""
+    return os.getenv("EMOTION_BACKEND", "rule").lower() in _BACKENDS
+
+def warm_up(backend: Optional[str] = None):
+    """Loads the configured backend's model ahead of the first request."""
+    backend = (backend or os.getenv("EMOTION_BACKEND", "rule")).lower()
+    if backend in _BACKENDS:
+        get_model(backend)
+
+def _load_hf():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis")
+
+def _predict_hf(nlpp, text: str) -> str:
+    out = nlpp(text)[0]["label"].lower()
+    # Map common outputs to our labels
+    return "happy" if "pos" in out else "sad"
+
+def _predict_many_hf(nlpp, texts: List[str]) -> List[str]:
+    outs = nlpp(texts, batch_size=len(texts), truncation=True)
+    return ["happy" if "pos" in o["label"].lower() else "sad" for o in outs]
+
+def _load_openai():
+    from openai import OpenAI
+    return OpenAI()
+
+def _predict_openai(client, text: str) -> str:
+    prompt = ("Classify the dominant emotion of this memory text into exactly one of: "
+              "happy, romantic, sad, calm, angry, nostalgic, excited, proud.\nText:\n" + text)
+    resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role":"user","content":prompt}],
+        temperature=0
+    )
+    label = (resp.choices[0].message.content or "").strip().lower()
+    return label if label in PLANT_BY_EMOTION else DEFAULT_EMOTION
+
+def _predict_many_openai(client, texts: List[str]) -> List[str]:
+    # One request per batch: numbered texts in, one label per line out
+    numbered = "\n".join(f"{i + 1}. {' '.join(t.split())}" for i, t in enumerate(texts))
+    prompt = ("Classify the dominant emotion of each numbered memory text into exactly one of: "
+              "happy, romantic, sad, calm, angry, nostalgic, excited, proud.\n"
+              f"Answer with {len(texts)} lines, one label per line, in the same order, and nothing else.\n"
+              "Texts:\n" + numbered)
+    resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role":"user","content":prompt}],
+        temperature=0
+    )
+    lines = [line.strip().lower() for line in (resp.choices[0].message.content or "").splitlines() if line.strip()]
+    if len(lines) != len(texts):
+        raise ValueError(f"expected {len(texts)} labels, got {len(lines)}")
+    labels = [line.split(".", 1)[-1].strip() for line in lines]
+    return [label if label in PLANT_BY_EMOTION else DEFAULT_EMOTION for label in labels]
+
+register_backend("hf", _load_hf, _predict_hf, _predict_many_hf)
+register_backend("openai", _load_openai, _predict_openai, _predict_many_openai)
+
+# ---------- Result cache ----------
+# Model labels keyed by (backend, sha256 of the normalized text): an
+# in-process LRU in front of the emotion_cache table, so duplicate texts and
+# re-imports skip inference even across restarts. The rule engine is cheaper
+# than a lookup and is never cached.
+EMOTION_CACHE_SIZE = int(os.getenv("EMOTION_CACHE_SIZE", "4096"))
+EMOTION_CACHE_PERSIST = os.getenv("EMOTION_CACHE_PERSIST", "1").lower() in ("1", "true", "yes")
+
+def text_key(text: str) -> str:
+    """sha256 of the text lower-cased with whitespace collapsed."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+class ClassificationCache:
+    def __init__(self, maxsize: int = EMOTION_CACHE_SIZE, persist: bool = EMOTION_CACHE_PERSIST):
+        self.maxsize = maxsize
+        self.persist = persist
+        self._entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.db_hits = self.misses = 0
+
+    def get_many(self, backend: str, keys: List[str]) -> Dict[str, str]:
+        """Cached labels for whichever of `keys` are known, checking memory then SQLite."""
+        found: Dict[str, str] = {}
+        with self._lock:
+            for key in keys:
+                label = self._entries.get((backend, key))
+                if label is not None:
+                    self._entries.move_to_end((backend, key))
+                    found[key] = label
+            self.memory_hits += len(found)
+        missing = [k for k in keys if k not in found]
+        if missing and self.persist:
+            try:
+                import db
+                stored = db.get_cached_emotions(backend, missing)
+            except Exception as e:
+                logger.warning("emotion cache read failed backend=%s error=%s", backend, e)
+                stored = {}
+            if stored:
+                self._remember(backend, stored)
+                found.update(stored)
+            with self._lock:
+                self.db_hits += len(stored)
+        with self._lock:
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, backend: str, labels: Dict[str, str]):
+        self._remember(backend, labels)
+        if self.persist and labels:
+            try:
+                import db
+                db.put_cached_emotions(backend, labels)
+            except Exception as e:
+                logger.warning("emotion cache write failed backend=%s error=%s", backend, e)
+
+    def _remember(self, backend: str, labels: Dict[str, str]):
+        with self._lock:
+            for key, label in labels.items():
+                self._entries[(backend, key)] = label
+                self._entries.move_to_end((backend, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"memory_hits": self.memory_hits, "db_hits": self.db_hits,
+                    "misses": self.misses, "size": len(self._entries)}
+
+    def clear(self):
+        """Empties the in-process tier and resets the counters (the table is kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+result_cache = ClassificationCache()
+
+def _model_labels(backend: str, texts: List[str], batch_size: int) -> List[Optional[str]]:
+    """
+    Labels from a model backend, served from the cache where possible. Each
+    distinct uncached text is sent once; None marks texts the model could not
+    label (the caller falls back to the rule engine).
+    """
+    keys = [text_key(t) for t in texts]
+    labels = result_cache.get_many(backend, list(dict.fromkeys(keys)))
+    todo = {k: t for k, t in zip(keys, texts) if k not in labels}
+    if todo:
+        model = get_model(backend)
+        if model is not None:
+            _, predict, predict_many = _BACKENDS[backend]
+            pending = list(todo.items())
+            fresh: Dict[str, str] = {}
+            seconds, counted = CLASSIFIER_SECONDS.labels(backend), CLASSIFIER_TEXTS.labels(backend)
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                began = time.perf_counter()
+                try:
+                    if len(batch) == 1:
+                        out = [predict(model, batch[0][1])]
+                    else:
+                        out = predict_many(model, [t for _, t in batch])
+                except Exception:
+                    logger.exception("emotion batch failed backend=%s size=%d", backend, len(batch))
+                    continue
+                finally:
+                    seconds.observe(time.perf_counter() - began)
+                counted.inc(len(batch))
+                fresh.update((k, label) for (k, _), label in zip(batch, out))
+            result_cache.put_many(backend, fresh)
+            labels.update(fresh)
+    return [labels.get(k) for k in keys]
 
 def classify(text: str) -> Tuple[str, str]:
     """
     Returns (emotion_label, plant_label)
     Uses RULE-BASED by default. Switch to HF or OpenAI by setting env flags:
     - EMOTION_BACKEND=hf or openai
-    - For HF, model downloads at runtime; for OpenAI, set OPENAI_API_KEY.
+    - For HF, model downloads on first use; for OpenAI, set OPENAI_API_KEY.
+    Models are loaded once per process (see get_model), their labels are
+    cached (see result_cache) and any backend failure falls back to the
+    rule-based classifier.
+    """
+    return classify_many([text])[0]
+
+def _rule_labels(texts: List[str]) -> List[str]:
+    began = time.perf_counter()
+    labels = [classify_rule_based(t) for t in texts]
+    CLASSIFIER_SECONDS.labels("rule").observe(time.perf_counter() - began)
+    CLASSIFIER_TEXTS.labels("rule").inc(len(texts))
+    return labels
+
+def model_labels(texts: List[str], batch_size: Optional[int] = None) -> List[Optional[str]]:
+    """
+    Labels from EMOTION_BACKEND without the rule-based fallback: None marks
+    texts a model backend could not label (it failed to load, or its batch
+    failed). With the rule backend every text gets its rule label.
     """
+    texts = [t or "" for t in texts]
+    batch_size = max(1, batch_size or CLASSIFY_BATCH_SIZE)
     backend = os.getenv("EMOTION_BACKEND", "rule").lower()
-    if backend == "rule":
-        label = classify_rule_based(text or "")
-    elif backend == "hf":
-        try:
-            from transformers import pipeline
-            nlpp = pipeline("sentiment-analysis")
-            out = nlpp(text or "")[0]["label"].lower()
-            # Map common outputs to our labels
-            label = "happy" if "pos" in out else "sad"
-        except Exception:
-            label = classify_rule_based(text or "")
-    elif backend == "openai":
-        try:
-            from openai import OpenAI
-            client = OpenAI()
-            prompt = ("Classify the dominant emotion of this memory text into exactly one of: " ,"happy, romantic, sad, calm, angry, nostalgic, excited, proud.\nText:\n" + (text or ""))
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role":"user","content":prompt}],
-                temperature=0
-            )
-            label = (resp.choices[0].message.content or "").strip().lower()
-            if label not in PLANT_BY_EMOTION:
-                label = DEFAULT_EMOTION
-        except Exception:
-            label = classify_rule_based(text or "")
-    else:
-        label = classify_rule_based(text or "")
-
-    return label, PLANT_BY_EMOTION.get(label, "🌼 Daisy")
+    if backend in _BACKENDS:
+        return _model_labels(backend, texts, batch_size)
+    return _rule_labels(texts) if texts else []
+
+def classify_many(texts: List[str], batch_size: Optional[int] = None) -> List[Tuple[str, str]]:
+    """
+    Batched classify(): returns one (emotion_label, plant_label) per text, in
+    order. Model backends get `batch_size` uncached texts per call (HF
+    batches them natively, OpenAI gets them in one request); a batch that
+    fails falls back to the rule-based classifier.
+    """
+    texts = [t or "" for t in texts]
+    labels = model_labels(texts, batch_size)
+    fallback = [i for i, label in enumerate(labels) if not label]
+    if fallback:
+        for i, label in zip(fallback, _rule_labels([texts[i] for i in fallback])):
+            labels[i] = label
 
+    return [(label, PLANT_BY_EMOTION.get(label, "🌼 Daisy")) for label in labels]
@@ -2,7 +2,7 @@ import streamlit as st
 import os
 from garden_hybrid import GardenHybrid
 from db import list_memories, insert_memory
-from storage import save_upload
+from storage import stage_upload, discard_staged
 from emotions import classify
 from datetime import datetime
 from ui import counters
@@ -60,7 +60,7 @@ st.subheader("📊 Your Memory Garden Overview")
 counters(existing_memories)
 
 # Generate garden layout
-flowers, empty_buds = garden.generate_garden_layout(existing_memories)
+flowers, empty_buds = garden.load_garden_layout(user["id"], existing_memories)
 
 # Display garden statistics
 garden.display_garden_stats(flowers, empty_buds)
@@ -87,9 +87,9 @@ if st.session_state.garden_new_memory_data and st.button("💾 Save Planted Memo
     
     try:
         # Save media file if provided
-        media_path, media_type = None, None
+        saved = None
         if memory_data.get("media_file"):
-            media_path, media_type = save_upload(user["id"], memory_data["media_file"])
+            saved = stage_upload(user["id"], memory_data["media_file"], memory_data["media_file"].name)
         
         # Convert unlock date to ISO format
         unlock_iso = None
@@ -101,15 +101,24 @@ if st.session_state.garden_new_memory_data and st.button("💾 Save Planted Memo
             ).isoformat()
         
         # Insert memory into database
-        mem_id = insert_memory(
-            user_id=user["id"],
-            title=memory_data["title"],
-            desc=memory_data["description"],
-            emotion=memory_data["emotion"],
-            unlock_at_iso=unlock_iso,
-            media_path=media_path,
-            media_type=media_type
-        )
+        try:
+            mem_id = insert_memory(
+                user_id=user["id"],
+                title=memory_data["title"],
+                desc=memory_data["description"],
+                emotion=memory_data["emotion"],
+                unlock_at_iso=unlock_iso,
+                media_path=saved.path if saved else None,
+                media_type=saved.media_type if saved else None,
+                model_path=None,
+                media_sha256=saved.sha256 if saved else None,
+                media_size=saved.size if saved else None,
+                staged_path=saved.staged_path if saved else None
+            )
+        except Exception:
+            if saved:
+                discard_staged(saved)
+            raise
         
         st.success(f"🌱 Memory '{memory_data['title']}' successfully planted in your garden!")
         
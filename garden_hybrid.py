@@ -1,18 +1,27 @@
 import streamlit as st
 import plotly.graph_objects as go
+import numpy as np
 from typing import List, Dict, Tuple, Optional
-import random
 import math
-import os
+import itertools
 from datetime import datetime
-import json
+
+import db
+import garden_spatial
 
 class GardenHybrid:
     def __init__(self):
-        # Garden dimensions for 2D view
-        self.garden_width = 100
-        self.garden_height = 80
+        # Garden dimensions for 2D view; generate_garden_layout multiplies them
+        # (and the cluster centers) by layout_scale as clusters grow
+        self.base_width = 100
+        self.base_height = 80
+        self.garden_width = self.base_width
+        self.garden_height = self.base_height
+        self.layout_scale = 1.0
         self.flower_spacing = 15
+        self.bud_spacing = 3
+        # Sunflower spacing within a cluster; neighbours end up ~1.7x this apart
+        self.flower_pitch = 1.5
         
         # Navigation state
         self.selected_flower_id = None
@@ -119,6 +128,10 @@ class GardenHybrid:
             }
         }
         
+        # Current (x, y, radius) of each emotion cluster
+        self.clusters = {emotion: (*info["cluster_center"], info["cluster_radius"])
+                         for emotion, info in self.flower_types.items()}
+        
         # Initialize session state for garden interactions
         if 'garden_selected_flower' not in st.session_state:
             st.session_state.garden_selected_flower = None
@@ -131,48 +144,105 @@ class GardenHybrid:
         if 'garden_new_memory_data' not in st.session_state:
             st.session_state.garden_new_memory_data = {}
     
-    def generate_garden_layout(self, memories: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
-        """Generate clustered garden layout with flowers and empty buds"""
+    def load_garden_layout(self, user_id: int, memories: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        The user's garden layout, computed once per change to their memories.
+        Reruns with an unchanged memory version reuse the layout kept in
+        session state; otherwise each memory keeps the cluster slot stored in
+        the garden_layout table, only new (or re-classified) memories take
+        new slots, and rows whose slot or position changed are saved.
+        Deleted memories drop out of the table by trigger.
+        """
+        key = (user_id, db.get_memory_version(user_id))
+        cached = st.session_state.get("garden_layout")
+        if cached and cached[0] == key:
+            self._set_geometry(cached[3])
+            return cached[1], cached[2]
+
+        stored = db.get_garden_positions(user_id)
+        flowers, empty_buds = self.generate_garden_layout(memories, stored)
+        db.put_garden_positions(user_id, [
+            (f["memory_id"], f["emotion"], f["slot"], f["x"], f["y"]) for f in flowers
+            if f["memory_id"] is not None and stored.get(f["memory_id"]) != (f["emotion"], f["slot"], f["x"], f["y"])
+        ])
+        st.session_state.garden_layout = (key, flowers, empty_buds, self._geometry())
+        return flowers, empty_buds
+
+    def layout_index(self, flowers: List[Dict], empty_buds: List[Dict]) -> garden_spatial.GardenIndex:
+        """Spatial and id index of a layout, built once per layout and kept in session state"""
+        cached = st.session_state.get("garden_index")
+        if cached and cached[0] is flowers and cached[1] is empty_buds:
+            return cached[2]
+        index = garden_spatial.GardenIndex(flowers, empty_buds)
+        st.session_state.garden_index = (flowers, empty_buds, index)
+        return index
+
+    def generate_garden_layout(self, memories: List[Dict],
+                               positions: Optional[Dict[int, Tuple[str, Optional[int], float, float]]] = None
+                               ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Generate clustered garden layout with flowers and empty buds.
+        Each emotion cluster is a sunflower spiral: a memory's flower takes a
+        numbered slot, and the spiral (so the cluster) grows with the count.
+        Clusters, and the garden with them, are spread apart once they would
+        overlap (see _tile_clusters).
+        `positions` maps memory ids to a stored (emotion, slot, x, y); a
+        memory keeps its slot unless it has none or its emotion changed, and
+        the others take the lowest free slots, oldest memory first.
+        """
+        positions = positions or {}
         flowers = []
-        empty_buds = []
         
-        # Group memories by emotion for clustering
+        # Group memories by emotion for clustering; unknown emotions grow in the happy cluster
         emotion_groups = {}
         for memory in memories:
             emotion = memory.get("emotion", "happy")
-            if emotion not in emotion_groups:
-                emotion_groups[emotion] = []
-            emotion_groups[emotion].append(memory)
+            cluster = emotion if emotion in self.flower_types else "happy"
+            if cluster not in emotion_groups:
+                emotion_groups[cluster] = []
+            emotion_groups[cluster].append(memory)
+        
+        # Sunflower slot of every memory, per cluster
+        cluster_slots = {}
+        for cluster, emotion_memories in emotion_groups.items():
+            slots = [None] * len(emotion_memories)
+            taken = set()
+            for i, memory in enumerate(emotion_memories):
+                stored = positions.get(memory.get("id"))
+                if stored and stored[0] == memory.get("emotion", "happy") and stored[1] is not None \
+                        and stored[1] not in taken:
+                    slots[i] = stored[1]
+                    taken.add(stored[1])
+            fresh = sorted((i for i, slot in enumerate(slots) if slot is None),
+                           key=lambda i: emotion_memories[i].get("id") or 0)
+            free_slots = (slot for slot in itertools.count() if slot not in taken)
+            for i, slot in zip(fresh, free_slots):
+                slots[i] = slot
+            cluster_slots[cluster] = np.array(slots, dtype=np.int64)
+        
+        self._tile_clusters({cluster: int(slots.max()) + 1 for cluster, slots in cluster_slots.items()})
         
         # Place flowers in emotion-based clusters
-        for emotion, emotion_memories in emotion_groups.items():
-            flower_info = self.flower_types.get(emotion, self.flower_types["happy"])
-            cluster_center = flower_info["cluster_center"]
-            cluster_radius = flower_info["cluster_radius"]
+        for cluster, emotion_memories in emotion_groups.items():
+            flower_info = self.flower_types[cluster]
+            center_x, center_y, _ = self.clusters[cluster]
+            slots = cluster_slots[cluster]
+            offsets = garden_spatial.phyllotaxis(slots, self.flower_pitch)
+            xs, ys = (center_x + offsets[:, 0]).tolist(), (center_y + offsets[:, 1]).tolist()
             
             for i, memory in enumerate(emotion_memories):
-                # Calculate position within cluster
-                angle = (i / len(emotion_memories)) * 2 * math.pi
-                distance = random.uniform(0, cluster_radius * 0.8)
-                
-                x = cluster_center[0] + math.cos(angle) * distance + random.uniform(-3, 3)
-                y = cluster_center[1] + math.sin(angle) * distance + random.uniform(-3, 3)
-                
-                # Ensure flowers stay within garden bounds
-                x = max(10, min(self.garden_width - 10, x))
-                y = max(10, min(self.garden_height - 10, y))
-                
                 flowers.append({
                     "id": f"flower_{memory.get('id', i)}",
                     "memory_id": memory.get("id"),
-                    "emotion": emotion,
+                    "emotion": memory.get("emotion", "happy"),
                     "title": memory.get("title", "Untitled"),
                     "description": memory.get("description", ""),
                     "media_path": memory.get("media_path"),
                     "media_type": memory.get("media_type"),
                     "unlock_at": memory.get("unlock_at"),
-                    "x": x,
-                    "y": y,
+                    "x": xs[i],
+                    "y": ys[i],
+                    "slot": int(slots[i]),
                     "emoji": flower_info["emoji"],
                     "color": flower_info["color"],
                     "name": flower_info["name"],
@@ -184,59 +254,79 @@ class GardenHybrid:
                     "bloomed": False,
                     "has_memory": True,
                     "interaction_count": 0,
-                    "cluster": emotion
+                    "cluster": cluster
                 })
         
         # Generate empty flower buds for planting new memories
         num_empty_buds = max(20, len(memories) // 2)  # At least 20 empty buds
-        
-        for i in range(num_empty_buds):
-            # Find a spot away from existing flowers and clusters
-            attempts = 0
-            while attempts < 100:
-                x = random.uniform(10, self.garden_width - 10)
-                y = random.uniform(10, self.garden_height - 10)
-                
-                # Check distance from existing flowers
-                too_close = False
-                for flower in flowers:
-                    distance = math.sqrt((x - flower["x"])**2 + (y - flower["y"])**2)
-                    if distance < self.flower_spacing:
-                        too_close = True
-                        break
-                
-                # Check distance from cluster centers
-                for emotion, flower_info in self.flower_types.items():
-                    cluster_center = flower_info["cluster_center"]
-                    cluster_radius = flower_info["cluster_radius"]
-                    distance = math.sqrt((x - cluster_center[0])**2 + (y - cluster_center[1])**2)
-                    if distance < cluster_radius:
-                        too_close = True
-                        break
-                
-                if not too_close:
-                    break
-                attempts += 1
-            
-            if attempts < 100:
-                empty_buds.append({
-                    "id": f"empty_bud_{i}", 
-                    "x": x,
-                    "y": y,
-                    "emoji": "🌱",  # Seed/bud emoji
-                    "color": "#8B4513",  # Brown color
-                    "height": 0.5,
-                    "bloom_size": 0.8,
-                    "has_memory": False,
-                    "bloomed": False,
-                    "ready_to_plant": True,
-                    "cluster": "empty"
-                })
+        empty_buds = self._place_empty_buds(flowers, num_empty_buds)
         
         return flowers, empty_buds
     
-    def create_hybrid_garden_visualization(self, flowers: List[Dict], empty_buds: List[Dict]) -> go.Figure:
-        """Create an interactive hybrid garden: 2D layout with 3D flowers"""
+    def _tile_clusters(self, slot_counts: Dict[str, int]):
+        """
+        Sizes each cluster for its number of sunflower slots and spreads the
+        configured cluster centers, and the garden, by the smallest
+        layout_scale step that keeps the grown clusters apart and inside.
+        Small gardens keep layout_scale 1 and the configured geometry.
+        """
+        names = list(self.flower_types)
+        centers = np.array([self.flower_types[name]["cluster_center"] for name in names], dtype=float)
+        grown = np.array([garden_spatial.phyllotaxis_radius(slot_counts.get(name, 0), self.flower_pitch)
+                          for name in names])
+        scale = garden_spatial.tile_scale(centers, grown, (self.base_width, self.base_height), self.flower_pitch)
+        self._set_geometry((scale, {
+            name: (float(cx * scale), float(cy * scale),
+                   max(float(self.flower_types[name]["cluster_radius"]), float(radius + self.flower_pitch)))
+            for name, (cx, cy), radius in zip(names, centers, grown)
+        }))
+
+    def _geometry(self) -> Tuple[float, Dict[str, Tuple[float, float, float]]]:
+        return self.layout_scale, self.clusters
+
+    def _set_geometry(self, geometry: Tuple[float, Dict[str, Tuple[float, float, float]]]):
+        self.layout_scale, self.clusters = geometry
+        self.garden_width = self.base_width * self.layout_scale
+        self.garden_height = self.base_height * self.layout_scale
+
+    def _place_empty_buds(self, flowers: List[Dict], count: int) -> List[Dict]:
+        """
+        Up to `count` buds, each at least flower_spacing from every flower,
+        outside every emotion cluster and bud_spacing from the other buds.
+        Fewer are returned when the garden has no more room.
+        """
+        obstacles = np.array([(f["x"], f["y"]) for f in flowers], dtype=float).reshape(-1, 2)
+        zones = list(self.clusters.values())
+        bounds = (10, 10, self.garden_width - 10, self.garden_height - 10)
+        # Cells grow with the garden so the raster stays the same size
+        cell = garden_spatial.FREE_CELL_SIZE * self.layout_scale
+        cells = garden_spatial.free_cells(bounds, obstacles, self.flower_spacing, zones, cell)
+        rng = np.random.default_rng(count)  # same garden, same buds
+        spots = garden_spatial.poisson_disk_sample(cells, count, self.bud_spacing, rng, cell)
+        
+        return [{
+            "id": f"empty_bud_{i}", 
+            "x": x,
+            "y": y,
+            "emoji": "🌱",  # Seed/bud emoji
+            "color": "#8B4513",  # Brown color
+            "height": 0.5,
+            "bloom_size": 0.8,
+            "has_memory": False,
+            "bloomed": False,
+            "ready_to_plant": True,
+            "cluster": "empty"
+        } for i, (x, y) in enumerate(spots)]
+    
+    def create_hybrid_garden_visualization(self, flowers: List[Dict], empty_buds: List[Dict],
+                                           batched: bool = True) -> go.Figure:
+        """Create an interactive hybrid garden: 2D layout with 3D flowers.
+
+        With batched=True (the default) each visual layer (stems, blooms,
+        petals, shadows, buds) is one trace covering every flower, so large
+        gardens stay a handful of traces; batched=False draws each flower
+        and bud as its own group of traces.
+        """
         
         fig = go.Figure()
         
@@ -269,8 +359,7 @@ class GardenHybrid:
         
         # 2. Add cluster boundaries (visual guides)
         for emotion, flower_info in self.flower_types.items():
-            cluster_center = flower_info["cluster_center"]
-            cluster_radius = flower_info["cluster_radius"]
+            cluster_center, cluster_radius = self.clusters[emotion][:2], self.clusters[emotion][2]
             
             # Create cluster boundary circle
             angles = [i * 0.1 for i in range(63)]  # 6.3 radians = 360 degrees
@@ -290,17 +379,19 @@ class GardenHybrid:
                 hoverinfo='skip'
             ))
         
-        # 3. Add 3D flowers with memories
-        for flower in flowers:
-            flower_traces = self._create_3d_flower(flower)
-            for trace in flower_traces:
-                fig.add_trace(trace)
-        
-        # 4. Add 3D empty buds
-        for bud in empty_buds:
-            bud_traces = self._create_3d_bud(bud)
-            for trace in bud_traces:
-                fig.add_trace(trace)
+        # 3. Add 3D flowers with memories, then 4. 3D empty buds
+        if batched:
+            fig.add_traces(self._create_garden_layers(flowers, empty_buds))
+        else:
+            for flower in flowers:
+                flower_traces = self._create_3d_flower(flower)
+                for trace in flower_traces:
+                    fig.add_trace(trace)
+
+            for bud in empty_buds:
+                bud_traces = self._create_3d_bud(bud)
+                for trace in bud_traces:
+                    fig.add_trace(trace)
         ######################################################
         # 5. Add navigation grid for better orientation
         grid_spacing = 10
@@ -454,7 +545,7 @@ class GardenHybrid:
                     f"Emotion: {flower_data.get('emotion', 'Unknown').title()}<br>" +
                     "Click to view memory<br>" +
                     "<extra></extra>",
-            customdata=[flower_data["id"]],
+            customdata=[[flower_data["id"]]],
         )
         traces.append(bloom_trace)
 
@@ -543,7 +634,7 @@ class GardenHybrid:
             textfont=dict(size=18 if bud_data.get("bloomed") else 14),
             name="Bud",
             hovertemplate="Click to plant a memory<br><extra></extra>",
-            customdata=[bud_data["id"]],
+            customdata=[[bud_data["id"]]],
         )
         traces.append(bud_trace)
 
@@ -583,6 +674,189 @@ class GardenHybrid:
 
         return traces
     
+    def _create_garden_layers(self, flowers: List[Dict], empty_buds: List[Dict]) -> List[go.Scatter3d]:
+        """Batched _create_3d_flower/_create_3d_bud: one trace per visual layer for the whole garden.
+
+        Looks the same as the per-flower traces. Stems are a single line trace
+        with NaN gaps between stems; blooms and bud heads are split only by
+        bloomed state, because Scatter3d can't vary opacity or outline width
+        per point. Every clickable point keeps its hover text and [id] customdata.
+        Per-point values go in as NumPy arrays, which plotly takes without
+        checking element by element.
+        """
+        traces = []
+        shadow_x, shadow_y, shadow_size = [], [], []
+
+        if flowers:
+            keys = [f.get("emotion", "happy") if f.get("emotion", "happy") in self.flower_types else "happy"
+                    for f in flowers]
+            types = [self.flower_types[k] for k in keys]
+            x = np.array([f["x"] for f in flowers], dtype=float)
+            y = np.array([f["y"] for f in flowers], dtype=float)
+            height = np.array([t["height"] for t in types], dtype=float)
+            bloomed = np.array([bool(f.get("bloomed")) for f in flowers])
+            bloom_size = np.array([t["bloom_size"] for t in types], dtype=float) * np.where(bloomed, 1.5, 1.0)
+            gap = np.full(len(flowers), np.nan)
+
+            # 1. Stems
+            traces.append(go.Scatter3d(
+                x=np.column_stack([x, x, gap]).ravel(),
+                y=np.column_stack([y, y, gap]).ravel(),
+                z=np.column_stack([np.zeros_like(height), height, gap]).ravel(),
+                mode='lines',
+                line=dict(width=6, **self._point_colors([t["stem_color"] for t in types for _ in range(3)])),
+                name="Stems",
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+
+            # 2. Petals, vectorized per flower type (each type has its own petal count)
+            keys = np.array(keys)
+            petal_x, petal_y, petal_z, petal_size, petal_color = [], [], [], [], []
+            for key in np.unique(keys):
+                flower_type = self.flower_types[key]
+                petals = flower_type["petals"]
+                if petals <= 0:
+                    continue
+                idx = np.flatnonzero(keys == key)
+                angles = np.arange(petals) / petals * 2 * np.pi
+                radius = bloom_size[idx, None] * 0.4
+                petal_x.append((x[idx, None] + np.cos(angles) * radius).ravel())
+                petal_y.append((y[idx, None] + np.sin(angles) * radius).ravel())
+                petal_z.append(np.repeat(height[idx] + 0.15, petals))
+                petal_size.append(np.repeat(bloom_size[idx] * 12, petals))
+                colors = flower_type["petal_colors"]
+                petal_color.extend([colors[i % len(colors)] for i in range(petals)] * len(idx))
+            if petal_x:
+                traces.append(go.Scatter3d(
+                    x=np.concatenate(petal_x),
+                    y=np.concatenate(petal_y),
+                    z=np.concatenate(petal_z),
+                    mode='markers',
+                    marker=dict(size=np.concatenate(petal_size), symbol='circle', opacity=0.8,
+                                **self._point_colors(petal_color)),
+                    name="Petals",
+                    showlegend=False,
+                    hoverinfo='skip'
+                ))
+
+            # 3. Blooms (clickable)
+            for is_bloomed in (False, True):
+                idx = np.flatnonzero(bloomed == is_bloomed)
+                if not len(idx):
+                    continue
+                emojis = [flowers[i].get("emoji", types[i]["emoji"]) for i in idx]
+                traces.append(go.Scatter3d(
+                    x=x[idx],
+                    y=y[idx],
+                    z=height[idx],
+                    mode='markers+text',
+                    marker=dict(
+                        size=bloom_size[idx] * 25,
+                        **self._point_colors([types[i]["color"] if is_bloomed else "#888" for i in idx]),
+                        symbol='circle',
+                        opacity=1.0 if is_bloomed else 0.7,
+                        line=dict(width=5 if is_bloomed else 3, color='white')
+                    ),
+                    text=np.array(emojis),
+                    textposition="middle center",
+                    textfont=dict(size=22 if is_bloomed else 16),
+                    name="Bloomed memories" if is_bloomed else "Memories",
+                    hovertext=np.array([f"<b>{emoji} {flowers[i].get('title', 'Memory')}</b><br>"
+                                        f"Emotion: {flowers[i].get('emotion', 'Unknown').title()}<br>"
+                                        "Click to view memory<br>" for emoji, i in zip(emojis, idx)]),
+                    hovertemplate="%{hovertext}<extra></extra>",
+                    customdata=np.array([flowers[i]["id"] for i in idx], dtype=object)[:, None],
+                ))
+
+            shadow_x.append(x)
+            shadow_y.append(y)
+            shadow_size.append(bloom_size * 30)
+
+        if empty_buds:
+            x = np.array([b["x"] for b in empty_buds], dtype=float)
+            y = np.array([b["y"] for b in empty_buds], dtype=float)
+            bloomed = np.array([bool(b.get("bloomed")) for b in empty_buds])
+            gap = np.full(len(empty_buds), np.nan)
+
+            # 4. Bud stems
+            traces.append(go.Scatter3d(
+                x=np.column_stack([x, x, gap]).ravel(),
+                y=np.column_stack([y, y, gap]).ravel(),
+                z=np.column_stack([np.zeros(len(empty_buds)), np.full(len(empty_buds), 0.6), gap]).ravel(),
+                mode='lines',
+                line=dict(color="#654321", width=4),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+
+            # 5. Bud heads (clickable)
+            for is_bloomed in (False, True):
+                idx = np.flatnonzero(bloomed == is_bloomed)
+                if not len(idx):
+                    continue
+                traces.append(go.Scatter3d(
+                    x=x[idx],
+                    y=y[idx],
+                    z=np.full(len(idx), 0.6),
+                    mode='markers+text',
+                    marker=dict(
+                        size=15 if is_bloomed else 10,
+                        color="#FFD700" if is_bloomed else "#8B4513",
+                        symbol='diamond',
+                        opacity=1.0 if is_bloomed else 0.7,
+                        line=dict(width=3, color='white')
+                    ),
+                    text=np.full(len(idx), "🌸" if is_bloomed else "🌱"),
+                    textposition="middle center",
+                    textfont=dict(size=18 if is_bloomed else 14),
+                    name="Bud",
+                    hovertemplate="Click to plant a memory<br><extra></extra>",
+                    customdata=np.array([empty_buds[i]["id"] for i in idx], dtype=object)[:, None],
+                ))
+
+            # 6. Pulse effect
+            traces.append(go.Scatter3d(
+                x=x,
+                y=y,
+                z=np.full(len(empty_buds), 0.8),
+                mode='markers',
+                marker=dict(size=25, color='rgba(139, 69, 19, 0.2)', symbol='circle', opacity=0.6),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+
+            shadow_x.append(x)
+            shadow_y.append(y)
+            shadow_size.append(np.full(len(empty_buds), 22.0))
+
+        # 7. Shadows of flowers and buds alike, drawn first so they sit under everything
+        if shadow_x:
+            traces.insert(0, go.Scatter3d(
+                x=np.concatenate(shadow_x),
+                y=np.concatenate(shadow_y),
+                z=np.zeros(sum(len(a) for a in shadow_x)),
+                mode='markers',
+                marker=dict(size=np.concatenate(shadow_size), color='rgba(0,0,0,0.4)', symbol='circle', opacity=0.5),
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+
+        return traces
+
+    @staticmethod
+    def _point_colors(colors: List[str]) -> Dict:
+        """Per-point colors as numeric codes into a stepped colorscale.
+
+        Plotly validates a list of color strings one by one, which dominates
+        building a large garden; a numeric array is checked in one go.
+        """
+        palette, codes = np.unique(colors, return_inverse=True)
+        if len(palette) == 1:
+            return dict(color=palette[0])
+        step = len(palette) - 1
+        return dict(color=codes, colorscale=[[i / step, c] for i, c in enumerate(palette)], cmin=0, cmax=step)
+
     def handle_garden_interactions(self, flowers: List[Dict], empty_buds: List[Dict]):
         """Handle garden interactions: navigation, planting, viewing"""
         
@@ -648,15 +922,13 @@ class GardenHybrid:
         # Add click event handling for flowers and buds
         st.markdown("**💡 Click on any flower or bud in the 3D garden above to interact!**")
         
+        index = self.layout_index(flowers, empty_buds)
+        
         # Show selected flower details
         if st.session_state.garden_selected_flower:
-            selected_flower = None
-            for flower in flowers:
-                if flower["id"] == st.session_state.garden_selected_flower:
-                    selected_flower = flower
-                    break
+            selected_flower = index.get(st.session_state.garden_selected_flower)
             
-            if selected_flower:
+            if selected_flower and selected_flower["has_memory"]:
                 with st.expander(f"🌺 {selected_flower['title']} Details", expanded=True):
                     st.markdown(f"**Emotion:** {selected_flower['emotion'].title()}")
                     st.markdown(f"**Description:** {selected_flower['description']}")
@@ -687,19 +959,10 @@ class GardenHybrid:
         st.markdown("### 🔍 Nearby Objects")
         player_x, player_y = st.session_state.garden_player_x, st.session_state.garden_player_y
         
-        # Find nearby flowers
-        nearby_flowers = []
-        for flower in flowers:
-            distance = math.sqrt((flower["x"] - player_x)**2 + (flower["y"] - player_y)**2)
-            if distance <= 15:  # Within 15 units
-                nearby_flowers.append((flower, distance))
-        
-        # Find nearby buds
-        nearby_buds = []
-        for bud in empty_buds:
-            distance = math.sqrt((bud["x"] - player_x)**2 + (bud["y"] - player_y)**2)
-            if distance <= 15:  # Within 15 units
-                nearby_buds.append((bud, distance))
+        # Find nearby flowers and buds, within 15 units
+        nearby = index.within(player_x, player_y, 15)
+        nearby_flowers = [(obj, distance) for obj, distance in nearby if obj["has_memory"]]
+        nearby_buds = [(obj, distance) for obj, distance in nearby if not obj["has_memory"]]
         
         if nearby_flowers or nearby_buds:
             col1, col2 = st.columns(2)
@@ -707,7 +970,7 @@ class GardenHybrid:
             with col1:
                 if nearby_flowers:
                     st.markdown("**🌸 Nearby Flowers:**")
-                    for flower, distance in sorted(nearby_flowers, key=lambda x: x[1]):
+                    for flower, distance in nearby_flowers:
                         if st.button(f"{flower['emoji']} {flower['title']} ({distance:.1f} units)", 
                                 key=f"nearby_flower_{flower['id']}"):
                             st.session_state.garden_selected_flower = flower["id"]
@@ -716,7 +979,7 @@ class GardenHybrid:
             with col2:
                 if nearby_buds:
                     st.markdown("**🌱 Nearby Buds:**")
-                    for bud, distance in sorted(nearby_buds, key=lambda x: x[1]):
+                    for bud, distance in nearby_buds:
                         if st.button(f"🌱 Empty Bud ({distance:.1f} units)", 
                                 key=f"nearby_bud_{bud['id']}"):
                             st.session_state.garden_planting_mode = True
@@ -765,10 +1028,11 @@ class GardenHybrid:
         
         for emotion in self.flower_types.keys():
             cluster_flowers = [f for f in flowers if f.get("cluster") == emotion]
+            cluster_x, cluster_y, cluster_radius = self.clusters[emotion]
             cluster_stats[emotion] = {
                 "count": len(cluster_flowers),
-                "center": self.flower_types[emotion]["cluster_center"],
-                "radius": self.flower_types[emotion]["cluster_radius"],
+                "center": (cluster_x, cluster_y),
+                "radius": cluster_radius,
                 "name": self.flower_types[emotion]["name"]
             }
         
@@ -802,5 +1066,5 @@ class GardenHybrid:
                 st.markdown(f"**{flower_info['emoji']} {emotion.title()}**")
                 st.markdown(f"Flowers: {stats['count']}")
                 st.markdown(f"Center: ({stats['center'][0]:.0f}, {stats['center'][1]:.0f})")
-                st.markdown(f"Radius: {stats['radius']}")
+                st.markdown(f"Radius: {stats['radius']:.0f}")
 
@@ -0,0 +1,194 @@
+# garden_spatial.py
+# Grid-based spatial helpers for the garden layout (NumPy only). Empty buds
+# are placed by rasterizing where they may not go, then dart-throwing into
+# the free cells with a Poisson-disk grid, so the cost grows with the
+# garden's area rather than with flowers x buds x attempts. GardenIndex
+# answers "what is near the player" and "which object was clicked" without
+# scanning the whole layout. Flowers are packed in sunflower (phyllotaxis)
+# spirals whose clusters are spread apart as they grow.
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Raster cell size, in garden units. Exclusions are widened by a cell's
+# diagonal so a point anywhere in a free cell keeps its spacing exactly.
+FREE_CELL_SIZE = 0.5
+# GardenIndex bucket size, in garden units; about the usual query radius
+INDEX_CELL_SIZE = 5.0
+# Angle between consecutive sunflower (phyllotaxis) slots
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+# Cluster spreading grows in steps of this factor, so a growing garden is
+# re-tiled (and its stored positions rewritten) only now and then
+TILE_SCALE_STEP = 1.25
+
+
+def phyllotaxis(slots: np.ndarray, pitch: float) -> np.ndarray:
+    """
+    (n, 2) offsets from a cluster's center for sunflower slots 0, 1, 2...
+    Slot k sits at pitch * sqrt(k + 0.5), turned k golden angles, so the
+    first n slots evenly fill a disk of phyllotaxis_radius(n, pitch) with
+    neighbours about 1.7 pitches apart.
+    """
+    slots = np.asarray(slots, dtype=float)
+    radius = pitch * np.sqrt(slots + 0.5)
+    angle = slots * GOLDEN_ANGLE
+    return np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+
+
+def phyllotaxis_radius(slot_count: int, pitch: float) -> float:
+    """Radius of the disk holding the first `slot_count` sunflower slots."""
+    return pitch * math.sqrt(slot_count - 0.5) if slot_count > 0 else 0.0
+
+
+def tile_scale(centers: np.ndarray, radii: np.ndarray, size: Tuple[float, float], margin: float,
+               step: float = TILE_SCALE_STEP) -> float:
+    """
+    Smallest power of `step` (1 at least) by which to spread `centers`, and
+    the `size` (width, height) garden around them, so that disks of `radii`
+    around the spread centers stay `margin` apart and `margin` inside the
+    garden. Centers that coincide can't be separated and are ignored.
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radii = np.asarray(radii, dtype=float)
+    needed = 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Edges: c * s - r >= margin and (size - c) * s - r >= margin, on both axes
+        for gap in (centers, np.asarray(size, dtype=float) - centers):
+            ratio = (radii[:, None] + margin) / gap
+            needed = max(needed, float(np.nanmax(np.where(gap > 0, ratio, 0), initial=0)))
+        if len(centers) > 1:
+            distance = np.linalg.norm(centers[:, None] - centers[None], axis=2)
+            ratio = (radii[:, None] + radii[None] + margin) / distance
+            needed = max(needed, float(np.nanmax(np.where(distance > 0, ratio, 0), initial=0)))
+    if needed <= 1:
+        return 1.0
+    return step ** math.ceil(math.log(needed) / math.log(step) - 1e-9)
+
+
+def _dilate(occupied: np.ndarray, radius: int) -> np.ndarray:
+    """Cells within `radius` cells (center to center) of an occupied cell; row-wise prefix sums per disk row."""
+    height, width = occupied.shape
+    padded = np.zeros((height + 2 * radius, width + 2 * radius + 1), dtype=np.int32)
+    padded[radius:radius + height, radius + 1:radius + 1 + width] = occupied
+    prefix = np.cumsum(padded, axis=1)
+    blocked = np.zeros_like(occupied, dtype=bool)
+    columns = np.arange(width) + radius
+    for dy in range(-radius, radius + 1):
+        half = int(math.isqrt(radius * radius - dy * dy))
+        rows = prefix[radius + dy:radius + dy + height]
+        blocked |= (rows[:, columns + half + 1] - rows[:, columns - half]) > 0
+    return blocked
+
+
+def free_cells(bounds: Tuple[float, float, float, float], obstacles: np.ndarray, clearance: float,
+               zones: Sequence[Tuple[float, float, float]], cell: float = FREE_CELL_SIZE) -> np.ndarray:
+    """
+    Lower-left corners, as an (n, 2) array, of the raster cells inside
+    `bounds` (x0, y0, x1, y1) where every point is at least `clearance` from
+    each obstacle point and outside each (cx, cy, radius) zone.
+    """
+    x0, y0, x1, y1 = bounds
+    width, height = int((x1 - x0) // cell), int((y1 - y0) // cell)
+    if width <= 0 or height <= 0:
+        return np.empty((0, 2))
+    xs = x0 + (np.arange(width) + 0.5) * cell
+    ys = y0 + (np.arange(height) + 0.5) * cell
+    half_diagonal = cell * math.sqrt(0.5)
+
+    free = np.ones((height, width), dtype=bool)
+    for cx, cy, radius in zones:
+        free &= (xs[None, :] - cx) ** 2 + (ys[:, None] - cy) ** 2 >= (radius + half_diagonal) ** 2
+
+    obstacles = np.asarray(obstacles, dtype=float).reshape(-1, 2)
+    if len(obstacles) and clearance > 0:
+        # Obstacles snap to cell centers (off by up to half a diagonal), and so
+        # do the points tested against them, hence a full diagonal of margin.
+        reach = int(math.ceil((clearance + 2 * half_diagonal) / cell))
+        col = np.floor((obstacles[:, 0] - x0) / cell).astype(np.int64) + reach
+        row = np.floor((obstacles[:, 1] - y0) / cell).astype(np.int64) + reach
+        inside = (col >= 0) & (col < width + 2 * reach) & (row >= 0) & (row < height + 2 * reach)
+        occupied = np.zeros((height + 2 * reach, width + 2 * reach), dtype=bool)
+        occupied[row[inside], col[inside]] = True
+        free &= ~_dilate(occupied, reach)[reach:reach + height, reach:reach + width]
+
+    rows, cols = np.nonzero(free)
+    return np.column_stack((x0 + cols * cell, y0 + rows * cell))
+
+
+def poisson_disk_sample(cells: np.ndarray, count: int, min_distance: float, rng: np.random.Generator,
+                        cell: float = FREE_CELL_SIZE) -> List[Tuple[float, float]]:
+    """
+    Up to `count` points, each inside one of the free `cells` (from
+    free_cells) and at least `min_distance` from one another. Fewer are
+    returned when no more fit.
+    """
+    if count <= 0 or not len(cells):
+        return []
+    # One dart per cell, or more when the cells are too few (coarse raster of a large garden)
+    draws = max(len(cells), 2 * count)
+    picks = rng.permutation(len(cells)) if draws == len(cells) else rng.integers(len(cells), size=draws)
+    points = cells[picks] + rng.uniform(0, cell, size=(draws, 2))
+    # Background grid of Bridson's sampler: cells small enough to hold at most one point
+    grid_size = min_distance / math.sqrt(2)
+    if grid_size <= 0:
+        return [tuple(p) for p in points[:count].tolist()]
+    grid = {}
+    min_sq = min_distance * min_distance
+    accepted: List[Tuple[float, float]] = []
+    for x, y in points.tolist():
+        gx, gy = int(x // grid_size), int(y // grid_size)
+        neighbours = (grid.get((nx, ny)) for nx in range(gx - 2, gx + 3) for ny in range(gy - 2, gy + 3))
+        if any(p is not None and (x - p[0]) ** 2 + (y - p[1]) ** 2 < min_sq for p in neighbours):
+            continue
+        grid[(gx, gy)] = (x, y)
+        accepted.append((x, y))
+        if len(accepted) == count:
+            break
+    return accepted
+
+
+class GardenIndex:
+    """
+    Flowers and buds of one layout bucketed on a uniform grid, plus an
+    id -> object dict. Buckets are stored CSR-style (objects sorted by cell,
+    with each cell's start offset) so a row of cells is one contiguous slice.
+    """
+
+    def __init__(self, flowers: List[Dict], empty_buds: List[Dict], cell: float = INDEX_CELL_SIZE):
+        self.objects = list(flowers) + list(empty_buds)
+        self.by_id = {obj["id"]: obj for obj in self.objects}
+        self.cell = cell
+        points = np.array([(obj["x"], obj["y"]) for obj in self.objects], dtype=float).reshape(-1, 2)
+        self.origin = points.min(axis=0) if len(points) else np.zeros(2)
+        cols, rows = np.floor((points - self.origin) / cell).astype(np.int64).T
+        self.width = int(cols.max()) + 1 if len(points) else 1
+        self.height = int(rows.max()) + 1 if len(points) else 1
+        keys = rows * self.width + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.points = points[self.order]
+        self.starts = np.searchsorted(keys[self.order], np.arange(self.width * self.height + 1))
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def get(self, object_id) -> Optional[Dict]:
+        """The flower or bud with this id, or None."""
+        return self.by_id.get(object_id)
+
+    def within(self, x: float, y: float, radius: float) -> List[Tuple[Dict, float]]:
+        """(object, distance) pairs for every object within `radius` of (x, y), nearest first."""
+        col0, row0 = np.floor((np.array([x, y]) - radius - self.origin) / self.cell).astype(np.int64)
+        col1, row1 = np.floor((np.array([x, y]) + radius - self.origin) / self.cell).astype(np.int64)
+        col0, col1 = max(col0, 0), min(col1, self.width - 1)
+        row0, row1 = max(row0, 0), min(row1, self.height - 1)
+        if col0 > col1 or row0 > row1:
+            return []
+        slices = [np.arange(self.starts[row * self.width + col0], self.starts[row * self.width + col1 + 1])
+                  for row in range(row0, row1 + 1)]
+        candidates = np.concatenate(slices)
+        distances = np.hypot(self.points[candidates, 0] - x, self.points[candidates, 1] - y)
+        hits = np.flatnonzero(distances <= radius)
+        hits = hits[np.argsort(distances[hits], kind="stable")]
+        return [(self.objects[self.order[candidates[i]]], float(distances[i])) for i in hits]
@@ -0,0 +1,127 @@
+# media.py
+# HTTP caching for uploaded media: strong content-hash ETags, long-lived
+# Cache-Control for content-addressed files, conditional GET (304) and byte
+# ranges (handled by Starlette's FileResponse) so video scrubbing and
+# Streamlit reruns don't re-download the same bytes.
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+# Number of files whose ETag is remembered, so hot files are hashed once.
+ETAG_CACHE_SIZE = int(os.getenv("MEDIA_ETAG_CACHE_SIZE", "1024"))
+
+# Content-addressed names are the file's sha256 plus one extension (see
+# storage.content_path); derivatives like <sha>.thumb.webp are regenerated, so they don't match
+_CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+
+class _ETagCache:
+    """LRU of file path -> (mtime_ns, size, etag); entries go stale when the file changes."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[:2] != (stat_result.st_mtime_ns, stat_result.st_size):
+                return None
+            self._entries.move_to_end(path)
+            return entry[2]
+
+    def put(self, path: str, stat_result: os.stat_result, etag: str):
+        with self._lock:
+            self._entries[path] = (stat_result.st_mtime_ns, stat_result.st_size, etag)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+etag_cache = _ETagCache(ETAG_CACHE_SIZE)
+
+
+def is_content_addressed(path: str) -> bool:
+    return _CONTENT_ADDRESSED.match(os.path.basename(path)) is not None
+
+
+def strong_etag(full_path: str, stat_result: Optional[os.stat_result] = None) -> str:
+    """
+    Strong ETag for a media file. Content-addressed files already carry
+    their hash in the name; anything else is hashed once and cached.
+    """
+    name = os.path.basename(full_path)
+    if is_content_addressed(name):
+        return f'"{name}"'
+
+    stat_result = stat_result or os.stat(full_path)
+    etag = etag_cache.get(full_path, stat_result)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(full_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+        etag_cache.put(full_path, stat_result, etag)
+    return etag
+
+
+def not_modified(etag: str, request_headers: Headers) -> bool:
+    """Whether If-None-Match matches `etag` (weak comparison, as RFC 9110 asks for GET)."""
+    if_none_match = request_headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def media_response(full_path: str, request_headers: Headers, immutable: bool,
+                   stat_result: Optional[os.stat_result] = None, extra_headers: Optional[dict] = None) -> Response:
+    """FileResponse with a strong ETag and cache headers, or a 304 if the client's copy is current."""
+    stat_result = stat_result or os.stat(full_path)
+    headers = {
+        "ETag": strong_etag(full_path, stat_result),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        **(extra_headers or {}),
+    }
+    response = FileResponse(full_path, stat_result=stat_result, headers=headers)
+    if not_modified(headers["ETag"], request_headers):
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles for /media with strong ETags and immutable caching of content-addressed files."""
+
+    def lookup_path(self, path: str):
+        # Hidden paths hold in-progress uploads (.staging, .part files); never serve them
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/")):
+            return "", None
+        # Runs on a worker thread, so hash uncached files here rather than on the event loop
+        full_path, stat_result = super().lookup_path(path)
+        if stat_result is not None and os.path.isfile(full_path):
+            strong_etag(full_path, stat_result)
+        return full_path, stat_result
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        if status_code != 200:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        full_path = str(full_path)
+        return media_response(full_path, Headers(scope=scope), is_content_addressed(full_path), stat_result)
@@ -0,0 +1,255 @@
+# metrics.py
+# In-process metrics rendered in the Prometheus text format at GET /metrics.
+# Deliberately small: counters, histograms with fixed buckets, and gauges
+# read from a callback at scrape time. Recording is a bisect and one locked
+# increment (well under a microsecond; see test/bench_metrics.py), so it can
+# sit on every DB call.
+
+import bisect
+import functools
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; DB calls and rule-based classification are often sub-millisecond
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes, 1 KiB to 1 GiB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values: str):
+        """The series for these label values, created on first use; keep the returned child for hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh series for one set of label values."""
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines for every series, without the HELP/TYPE header."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}"
+
+
+class CallbackGauge(_Metric):
+    """A gauge computed at scrape time: `collect` returns (label_values, value) pairs."""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Sequence[str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _new_child(self):
+        raise TypeError(f"{self.name} is computed by its collect callback; it has no series to update")
+
+    def samples(self):
+        for values, value in self.collect():
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(value)}"
+
+
+def timed(histogram: Histogram, label: Optional[str] = None):
+    """Decorator recording each call's duration under the function name (or `label`), errors included."""
+    def decorator(fn):
+        child = histogram.labels(label or fn.__name__)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def queue_depth(executor) -> int:
+    """Tasks waiting in a ThreadPoolExecutor's queue (0 if it was never started)."""
+    queue = getattr(executor, "_work_queue", None)
+    return queue.qsize() if queue is not None else 0
+
+
+class MetricsMiddleware:
+    """
+    Records HTTP_REQUEST_SECONDS per request, labelled with the route
+    template (/api/memories/{id}, not the concrete path) to keep the series
+    bounded. Latency is measured to the start of the response, so
+    long-lived streams are counted by how fast they answered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                self._record(scope, status, start)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if status is None:  # failed before responding
+                self._record(scope, 500, start)
+
+    @staticmethod
+    def _record(scope, status: int, start: float):
+        route = scope.get("route")
+        # Routes carry their template; mounts (e.g. /media) leave their prefix in root_path
+        template = getattr(route, "path", None) or scope.get("root_path") or "unmatched"
+        HTTP_REQUEST_SECONDS.labels(scope["method"], template, str(status)).observe(time.perf_counter() - start)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# ---------- Shared metrics ----------
+HTTP_REQUEST_SECONDS = Histogram(
+    "memoryscape_http_request_duration_seconds",
+    "Time until the response starts, by method, route template and status.",
+    ("method", "route", "status"))
+DB_CALL_SECONDS = Histogram(
+    "memoryscape_db_call_duration_seconds",
+    "Duration of db.py calls, including waits for a pooled connection and busy retries.",
+    ("function",))
+UPLOAD_SECONDS = Histogram(
+    "memoryscape_upload_duration_seconds",
+    "Time to stream, hash and validate one uploaded file.")
+UPLOAD_BYTES = Histogram(
+    "memoryscape_upload_size_bytes",
+    "Size of uploaded files.", buckets=SIZE_BUCKETS)
+CLASSIFIER_SECONDS = Histogram(
+    "memoryscape_classifier_duration_seconds",
+    "Duration of one classifier call (a model batch, or a rule-based pass), by backend.",
+    ("backend",))
+CLASSIFIER_TEXTS = Counter(
+    "memoryscape_classifier_texts_total",
+    "Texts labelled by each backend (model results served from the cache not included).",
+    ("backend",))
@@ -1,5 +1,9 @@
 import os
+import sys
+import shutil
 import sqlite3
+import hashlib
+from datetime import datetime
 
 def run_migration():
     """
@@ -53,5 +57,95 @@ def run_migration():
         if conn:
             conn.close()
 
+def _file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def dedup_media(dry_run=False):
+    """
+    Moves every legacy uuid-named upload into the content-addressed store,
+    pointing memories at the shared file and counting references in
+    media_blobs. Duplicate copies are removed. Each file is hard-linked into
+    place and every memory using it repointed before the legacy file is
+    removed, so an interrupted run never leaves a memory without its media.
+    Returns the number of bytes reclaimed.
+    """
+    import db
+    import storage
+
+    media_root = os.getenv("MEDIA_ROOT", "uploads")
+    db.init_db()
+
+    with db.get_conn() as conn:
+        rows = conn.execute("""
+            SELECT id, user_id, media_path, media_type FROM memories
+            WHERE media_path IS NOT NULL AND media_path != ''
+              AND media_path NOT IN (SELECT path FROM media_blobs)
+            ORDER BY id
+        """).fetchall()
+
+    # Several memories may share one legacy file; each file is handled once
+    by_path = {}
+    for mem_id, user_id, media_path, media_type in rows:
+        by_path.setdefault(media_path, []).append((mem_id, user_id, media_type))
+
+    scanned = duplicates = missing = 0
+    reclaimed = 0
+    seen = set()
+    for media_path, refs in by_path.items():
+        # Paths stored on Windows use backslashes
+        local_path = media_path.replace("\\", os.sep)
+        old_path = os.path.join(media_root, local_path)
+        if not os.path.exists(old_path):
+            missing += 1
+            continue
+        scanned += 1
+        size = os.path.getsize(old_path)
+        sha256 = _file_sha256(old_path)
+
+        # new path -> memories moving to it (more than one only under MEDIA_DEDUP_SCOPE=user)
+        targets = {}
+        for mem_id, user_id, media_type in refs:
+            targets.setdefault(storage.content_path(user_id, sha256, local_path), []).append((mem_id, media_type))
+
+        for new_rel, mem_refs in targets.items():
+            new_path = os.path.join(media_root, new_rel)
+            is_duplicate = new_rel in seen or os.path.exists(new_path)
+            seen.add(new_rel)
+            if is_duplicate:
+                duplicates += 1
+                reclaimed += size
+            if dry_run:
+                continue
+
+            if not is_duplicate:
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                try:
+                    os.link(old_path, new_path)
+                except OSError:
+                    shutil.copy2(old_path, new_path)
+
+            with db.get_conn() as conn:
+                conn.execute("""
+                    INSERT INTO media_blobs(path, sha256, size, media_type, refcount, created_at)
+                    VALUES(?,?,?,?,?,?)
+                    ON CONFLICT(path) DO UPDATE SET refcount = refcount + excluded.refcount
+                    """, (new_rel, sha256, size, mem_refs[0][1], len(mem_refs), datetime.utcnow().isoformat()))
+                conn.executemany("UPDATE memories SET media_path=? WHERE id=?",
+                                 [(new_rel, mem_id) for mem_id, _ in mem_refs])
+        if not dry_run:
+            os.remove(old_path)
+
+    action = "Would reclaim" if dry_run else "Reclaimed"
+    print(f"Scanned {scanned} files: {duplicates} duplicates, {missing} missing on disk.")
+    print(f"{action} {reclaimed} bytes ({reclaimed / 2**20:.1f} MiB).")
+    return reclaimed
+
 if __name__ == "__main__":
-    run_migration()
+    if len(sys.argv) > 1 and sys.argv[1] == "dedup":
+        dedup_media(dry_run="--dry-run" in sys.argv)
+    else:
+        run_migration()
@@ -40,7 +40,8 @@ st.markdown(
 st.title("🌌 Galaxy View")
 user = st.session_state.get("user")
 if user:
-    memories = list_memories(user["id"])
+    # Only what the counters and the 3D scatter read
+    memories = list_memories(user["id"], fields=["id", "title", "emotion", "unlock_at", "created_at"])
     counters(memories)
     galaxy_view(memories)
 else:
@@ -2,7 +2,7 @@ import streamlit as st
 import os
 from ui import counters
 from db import list_memories, insert_memory
-from storage import save_upload
+from storage import stage_upload, discard_staged
 from emotions import classify
 from datetime import datetime
 from garden_hybrid import GardenHybrid
@@ -57,7 +57,7 @@ if user:
     garden = GardenHybrid()
     
     # Generate garden layout
-    flowers, empty_buds = garden.generate_garden_layout(existing_memories)
+    flowers, empty_buds = garden.load_garden_layout(user["id"], existing_memories)
     
     # Show garden status
     if not existing_memories:
@@ -83,18 +83,15 @@ if user:
             for point in selected_point['points']:
                 if 'customdata' in point and point['customdata']:
                     clicked_id = point['customdata'][0]
+                    clicked = garden.layout_index(flowers, empty_buds).get(clicked_id)
                     
-                    # Check if it's a flower
-                    for flower in flowers:
-                        if flower["id"] == clicked_id:
-                            st.session_state.garden_selected_flower = clicked_id
-                            st.rerun()
-                    
-                    # Check if it's a bud
-                    for bud in empty_buds:
-                        if bud["id"] == clicked_id:
-                            st.session_state.garden_planting_mode = True
-                            st.rerun()
+                    # Check if it's a flower or a bud
+                    if clicked and clicked["has_memory"]:
+                        st.session_state.garden_selected_flower = clicked_id
+                        st.rerun()
+                    elif clicked:
+                        st.session_state.garden_planting_mode = True
+                        st.rerun()
     
     
     # Handle garden interactions
@@ -109,9 +106,9 @@ if user:
         
         try:
             # Save media file if provided
-            media_path, media_type = None, None
+            saved = None
             if memory_data.get("media_file"):
-                media_path, media_type = save_upload(user["id"], memory_data["media_file"])
+                saved = stage_upload(user["id"], memory_data["media_file"], memory_data["media_file"].name)
             
             # Convert unlock date to ISO format
             unlock_iso = None
@@ -123,15 +120,24 @@ if user:
                 ).isoformat()
             
             # Insert memory into database
-            mem_id = insert_memory(
-                user_id=user["id"],
-                title=memory_data["title"],
-                desc=memory_data["description"],
-                emotion=memory_data["emotion"],
-                unlock_at_iso=unlock_iso,
-                media_path=media_path,
-                media_type=media_type
-            )
+            try:
+                mem_id = insert_memory(
+                    user_id=user["id"],
+                    title=memory_data["title"],
+                    desc=memory_data["description"],
+                    emotion=memory_data["emotion"],
+                    unlock_at_iso=unlock_iso,
+                    media_path=saved.path if saved else None,
+                    media_type=saved.media_type if saved else None,
+                    model_path=None,
+                    media_sha256=saved.sha256 if saved else None,
+                    media_size=saved.size if saved else None,
+                    staged_path=saved.staged_path if saved else None
+                )
+            except Exception:
+                if saved:
+                    discard_staged(saved)
+                raise
             
             st.success(f"🌱 Memory '{memory_data['title']}' successfully planted in your garden!")
             
@@ -0,0 +1,64 @@
+# reaper.py
+# Background removal of media files nobody references any more.
+# db.delete_memories only tombstones them (media_tombstones), so deletes
+# return without waiting on the disk; this worker removes the files in
+# batches and retries failures with backoff (see db.reap_media).
+
+import logging
+import os
+import threading
+from typing import Optional
+
+import db
+
+REAPER_BATCH = int(os.getenv("REAPER_BATCH", "200"))
+# Also the retry check interval for files whose removal failed
+REAPER_POLL_SECONDS = float(os.getenv("REAPER_POLL_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class MediaReaper:
+    def __init__(self, batch_size: int = REAPER_BATCH, poll_seconds: float = REAPER_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="media-reaper", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wakes the reaper after memories with media were deleted."""
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops after the batch in progress; remaining tombstones are reaped after the next start."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> int:
+        return db.reap_media(self.batch_size)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                reaped = self.run_once()
+            except Exception:
+                logger.exception("media reaper batch failed")
+                reaped = 0
+            if reaped < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+
+reaper = MediaReaper()
@@ -1,31 +1,84 @@
 # backend/server.py
 
+import hashlib
+import logging
 import os
-from datetime import datetime
+import zipfile
 from typing import List, Optional
 from concurrent.futures import ThreadPoolExecutor 
-import asyncio
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Request
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from fastapi.routing import APIRouter
 
-from db import list_memories, insert_memory, delete_memories
-from storage import save_upload_sync
-from emotions import classify
+import async_db
+from db import init_db, close_pool, PoolExhausted
+from storage import (save_upload, discard_staged, UploadTooLarge, DERIVATIVE_SIZES,
+                     schedule_derivatives, shutdown_derivatives, find_derivative)
+from emotions import (classify, classify_many, classify_rule_based, uses_model_backend, warm_up,
+                      result_cache, CLASSIFY_BATCH_SIZE)
+from classification import worker as classification_worker
+from bulk import import_memories
+from reaper import reaper
+from changefeed import get_broker, stream as change_stream, watcher as change_watcher
+from media import MediaFiles, media_response, not_modified
+from compression import CompressionMiddleware
+import metrics
+
+try:
+    import orjson  # noqa: F401  (ORJSONResponse needs it)
+    FastJSONResponse = ORJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
 
 # ---------- Config ----------
 API_TITLE = "MemoryScape API"
 API_VERSION = "0.1.0"
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 MEDIA_ROOT = os.getenv("MEDIA_ROOT", "uploads")
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+# Listings may be cached but must be revalidated (cheaply, via ETag) before reuse
+LISTING_CACHE_CONTROL = "private, no-cache"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "5"))
+MAX_CLASSIFY_TEXTS = int(os.getenv("MAX_CLASSIFY_TEXTS", "1000"))
+# Load the EMOTION_BACKEND model at startup instead of on the first upload
+EMOTION_WARMUP = os.getenv("EMOTION_WARMUP", "0").lower() in ("1", "true", "yes")
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s")
+# Only our own loggers follow LOG_LEVEL; libraries stay at the WARNING default
+for _name in ("server", "db", "reaper", "changefeed", "classification", "storage", "emotions", "bulk"):
+    logging.getLogger(_name).setLevel(LOG_LEVEL)
+logger = logging.getLogger("server")
 
 # ---------- App ----------
-app = FastAPI(title=API_TITLE, version=API_VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global executor
+    init_db()
+    if executor._shutdown:  # restarted in the same process (e.g. a second TestClient)
+        executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    if EMOTION_WARMUP:
+        await run_in_threadpool(warm_up)
+    classification_worker.start()
+    reaper.start()
+    change_watcher.start()
+    yield
+    change_watcher.stop()
+    classification_worker.stop()
+    reaper.stop()
+    executor.shutdown(wait=True)
+    shutdown_derivatives()
+    async_db.shutdown()
+    close_pool()
+
+app = FastAPI(title=API_TITLE, version=API_VERSION, lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
-executor = ThreadPoolExecutor(max_workers=5)
+executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,11 +86,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Before-Created-At", "X-Next-Before-Id", "ETag"],
 )
+# zstd/brotli/gzip for JSON and other text bodies; media passes through
+app.add_middleware(CompressionMiddleware)
+# Outermost, so route latency includes the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request: Request, exc: PoolExhausted):
+    logger.warning("db pool exhausted method=%s path=%s", request.method, request.url.path)
+    return JSONResponse({"detail": "Database busy, please retry."}, status_code=503, headers={"Retry-After": "1"})
+
+def _executor_queue_depths():
+    yield ("uploads",), metrics.queue_depth(executor)
+    for name, depth in async_db.queue_depths().items():
+        yield (name,), depth
+
+metrics.CallbackGauge("memoryscape_executor_queue_depth", "Tasks waiting for a worker thread, per executor.",
+                      ("executor",), _executor_queue_depths)
+metrics.CallbackGauge("memoryscape_emotion_cache_lookups", "Emotion result cache lookups since start, by outcome.",
+                      ("outcome",), lambda: [((k,), v) for k, v in result_cache.stats().items() if k != "size"])
+metrics.CallbackGauge("memoryscape_change_feed_subscribers", "Open /api/memories/stream connections.",
+                      (), lambda: [((), get_broker().stats()["subscribers"])])
 
-# Mount media folder for serving files
 os.makedirs(MEDIA_ROOT, exist_ok=True)
-app.mount("/media", StaticFiles(directory=MEDIA_ROOT), name="media")
 
 # def to_out(row: dict, request: Request) -> dict:
 #     if row.get("media_path"):
@@ -47,6 +120,8 @@ app.mount("/media", StaticFiles(directory=MEDIA_ROOT), name="media")
 #     return row
 
 def to_out(row: dict, request: Request) -> dict:
+    if "media_path" not in row:  # projected out with ?fields=
+        return row
     media_path = row.get("media_path")
 # Only format the path if it's a non-empty string.
     # This prevents issues with None or other falsey values.
@@ -71,17 +146,91 @@ class MemoryResponse(BaseModel):
     media_path: Optional[str]
     media_type: Optional[str]
     model_path: Optional[str]
+    classification_status: str = "done"
 
 class DeleteRequest(BaseModel):
     user_id: int
     memory_ids: List[int]
 
+class ClassifyBatchRequest(BaseModel):
+    texts: List[str]
+    batch_size: Optional[int] = None
+
+class ClassifyResult(BaseModel):
+    emotion: str
+    plant: str
+
 # ---------- API Routes ----------
 @api_router.get("/memories", response_model=List[MemoryResponse])
-def get_user_memories(user_id: int, request: Request):
-    """Lists all memories for a given user."""
-    rows = list_memories(user_id)
-    return [to_out(r, request) for r in rows]
+async def get_user_memories(
+    user_id: int,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    before_created_at: Optional[str] = None,
+    before_id: Optional[int] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,title,emotion,unlock_at"),
+):
+    """
+    Lists memories for a given user, newest first.
+    Without `limit` the whole garden is returned. With `limit`, a full page
+    carries X-Next-Before-Created-At / X-Next-Before-Id headers to pass back
+    as `before_created_at` / `before_id` for the next page.
+    `fields` selects only those columns in SQL; `id` is always included, and
+    `created_at` too when paging.
+    The ETag comes from the user's change version, so If-None-Match is
+    answered with a 304 without reading the memories table.
+    """
+    version = await async_db.get_memory_version(user_id)
+    query_hash = hashlib.sha1(str(request.query_params).encode()).hexdigest()[:12]
+    etag = f'"{user_id}.{version}.{query_hash}"'
+    cache_headers = {"ETag": etag, "Cache-Control": LISTING_CACHE_CONTROL}
+    if not_modified(etag, request.headers):
+        return Response(status_code=304, headers=cache_headers)
+
+    projection = None
+    if fields:
+        projection = {f.strip() for f in fields.split(",") if f.strip()} | {"id"}
+        if limit is not None:
+            projection.add("created_at")
+    try:
+        rows = await async_db.list_memories(user_id, limit=limit, before_created_at=before_created_at,
+                                            before_id=before_id, fields=sorted(projection) if projection else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Rows come straight from our own schema, so they are encoded as-is
+    # rather than re-validated through MemoryResponse
+    response = FastJSONResponse([to_out(r, request) for r in rows], headers=cache_headers)
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Before-Created-At"] = rows[-1]["created_at"]
+        response.headers["X-Next-Before-Id"] = str(rows[-1]["id"])
+    return response
+
+@api_router.get("/memories/stream")
+async def stream_memory_changes(user_id: int, request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events feed of the user's memory changes: insert, delete,
+    update (final emotion labels) and unlock, plus resync when the client
+    should refetch the listing instead. Event ids are the user's memory
+    version; reconnecting with Last-Event-ID (or `since`) replays what was
+    missed.
+    """
+    if since is None:
+        try:
+            since = int(request.headers["last-event-id"])
+        except (KeyError, ValueError):
+            pass
+    version = await async_db.get_memory_version(user_id)
+    return StreamingResponse(change_stream(user_id, version, since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.get("/memories/{memory_id:int}", response_model=MemoryResponse)
+async def get_single_memory(memory_id: int, user_id: int, request: Request):
+    """One memory, scoped to its owner; another user's memory is a 404 like a missing one."""
+    memory = await async_db.get_memory(memory_id, user_id)
+    if not memory:
+        raise HTTPException(status_code=404, detail="Memory not found.")
+    return to_out(memory, request)
 
 @api_router.post("/memories", status_code=201, response_model=MemoryResponse)
 async def create_memory(
@@ -94,57 +243,174 @@ async def create_memory(
     model_path: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None)
 ):
-    """Creates a new memory, with optional media upload."""
+    """
+    Creates a new memory, with optional media upload. Without an explicit
+    emotion, a model-backed EMOTION_BACKEND runs in the background: the
+    memory gets a provisional rule-based label and classification_status
+    "pending" until the worker stores the model's label.
+    """
+    classification_status = "done"
     if not emotion:
-        label, _ = classify(f"{title}\n{desc or ''}")
-        emotion = label
+        if uses_model_backend():
+            emotion = classify_rule_based(f"{title}\n{desc or ''}")
+            classification_status = "pending"
+        else:
+            emotion, _ = classify(f"{title}\n{desc or ''}")
 
-    media_path, media_type = None, None
+    saved = None
     if file:
         try:
-            content = await file.read()
-            # Run the synchronous file-saving operation in a thread pool
-            media_path, media_type = await asyncio.get_event_loop().run_in_executor(
-                executor, save_upload_sync, user_id, content, file.filename
-            )
+            # Streamed to disk in chunks on the thread pool, never read whole into memory
+            saved = await save_upload(user_id, file, executor)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Upload failed: {e}")
 
-    mem_id = insert_memory(
-        user_id=user_id,
-        title=title,
-        desc=desc or "",
-        emotion=emotion,
-        unlock_at_iso=unlock_at_iso or None, # Ensure None is passed if string is empty
-        media_path=media_path,
-        media_type=media_type,
-        model_path=model_path
-    )
+    try:
+        mem_id = await async_db.insert_memory(
+            user_id=user_id,
+            title=title,
+            desc=desc or "",
+            emotion=emotion,
+            unlock_at_iso=unlock_at_iso or None, # Ensure None is passed if string is empty
+            media_path=saved.path if saved else None,
+            media_type=saved.media_type if saved else None,
+            model_path=model_path,
+            media_sha256=saved.sha256 if saved else None,
+            media_size=saved.size if saved else None,
+            staged_path=saved.staged_path if saved else None,
+            classification_status=classification_status,
+        )
+    except Exception:
+        if saved:
+            discard_staged(saved)
+        raise
     
-    rows = list_memories(user_id)
-    created = next((r for r in rows if r["id"] == mem_id), None)
+    if classification_status == "pending":
+        classification_worker.notify()
+    # Thumbnails are built off the request path; /media/{id}/{size} serves the original until they exist
+    schedule_derivatives(saved.path if saved else None, saved.media_type if saved else None)
+
+    created = await async_db.get_memory(mem_id, user_id)
     if not created:
         raise HTTPException(status_code=500, detail="Memory created but could not be found.")
-        
-    return to_out(created, request)
+
+    created = to_out(created, request)
+    get_broker().publish(user_id, "insert", {"memory": created}, await async_db.get_memory_version(user_id))
+    return created
+
+@api_router.post("/memories/bulk")
+async def bulk_import_memories(
+    user_id: int = Form(...),
+    items: UploadFile = File(...),
+    media: Optional[UploadFile] = File(None),
+):
+    """
+    Imports many memories at once. `items` is NDJSON, one memory per line
+    (title, desc, emotion, unlock_at, created_at, model_path, media); `media`
+    is an optional zip whose entries the `media` fields name. Returns the
+    number inserted and the lines that failed, with why.
+    """
+    await items.seek(0)
+    if media:
+        await media.seek(0)
+    try:
+        result = await run_in_threadpool(import_memories, user_id, items.file, media.file if media else None)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="`media` is not a valid zip file.")
+    if result.pending_classification:
+        classification_worker.notify()
+    if result.inserted:
+        # Too many rows to push one by one; subscribers refetch the listing instead
+        get_broker().resync(user_id, await async_db.get_memory_version(user_id), "bulk")
+    return {
+        "inserted": result.inserted,
+        "failed": result.failed,
+        "pending_classification": result.pending_classification,
+        "failures": result.failures,
+    }
 
 @api_router.post("/memories/delete", status_code=204)
-def delete_multiple_memories(request_data: DeleteRequest = Body(...)):
-    """Deletes one or more memories for a specific user."""
+async def delete_multiple_memories(request_data: DeleteRequest = Body(...)):
+    """
+    Deletes one or more memories for a specific user. Returns once the rows
+    are gone; their media files are removed in the background by the reaper.
+    """
     if not request_data.memory_ids:
         return
 
     try:
         # Pass user_id to the database function for secure deletion
-        deleted = delete_memories(
+        deleted = await async_db.delete_memories(
             user_id=request_data.user_id, 
             memory_ids=request_data.memory_ids
         )
         if not deleted:
-            print(f"Deletion attempt for user {request_data.user_id}, IDs {request_data.memory_ids} found nothing to delete.")
+            logger.info("delete found nothing user_id=%s requested=%d",
+                        request_data.user_id, len(request_data.memory_ids))
     except Exception as e:
+        logger.exception("delete failed user_id=%s requested=%d", request_data.user_id, len(request_data.memory_ids))
         raise HTTPException(status_code=400, detail=f"Could not delete memories: {e}")
-    
+
+    if deleted:
+        # Only the ids that were removed: not missing ones, nor another user's
+        get_broker().publish(request_data.user_id, "delete", {"ids": deleted},
+                             await async_db.get_memory_version(request_data.user_id), len(deleted))
+    reaper.notify()
     return
 
-app.include_router(api_router)
\ No newline at end of file
+@api_router.post("/classify/batch", response_model=List[ClassifyResult])
+async def classify_batch(request_data: ClassifyBatchRequest = Body(...)):
+    """
+    Classifies many texts in one call, in order. `batch_size` (default
+    CLASSIFY_BATCH_SIZE) is the number of texts sent to the model at a time.
+    """
+    if len(request_data.texts) > MAX_CLASSIFY_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_CLASSIFY_TEXTS} texts per request.")
+    batch_size = request_data.batch_size or CLASSIFY_BATCH_SIZE
+    if not 1 <= batch_size <= MAX_CLASSIFY_TEXTS:
+        raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {MAX_CLASSIFY_TEXTS}.")
+
+    # Model calls block, so keep them off the event loop
+    results = await run_in_threadpool(classify_many, request_data.texts, batch_size)
+    return [{"emotion": emotion, "plant": plant} for emotion, plant in results]
+
+@api_router.get("/classify/cache")
+async def classify_cache_stats():
+    """Hit/miss counters of the emotion result cache."""
+    return result_cache.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: request, DB, upload and classifier timings, queue depths."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ---------- Media Routes ----------
+@app.get("/media/{memory_id:int}/{size}")
+async def get_memory_media(memory_id: int, size: str, request: Request):
+    """
+    Serves a memory's media at the requested size ("thumb", "medium" or
+    "original"), as AVIF or WebP depending on the Accept header.
+    """
+    if size != "original" and size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=404, detail=f"Unknown size '{size}'.")
+    media = await async_db.get_memory_media(memory_id)
+    if not media:
+        raise HTTPException(status_code=404, detail="Memory has no media.")
+
+    media_path, media_type = media
+    path = media_path
+    if size != "original" and media_type == "image":
+        path = find_derivative(media_path, size, request.headers.get("accept", "")) or media_path
+    full_path = os.path.join(MEDIA_ROOT, path)
+    if not os.path.exists(full_path):
+        raise HTTPException(status_code=404, detail="Media file not found.")
+    # Not immutable: the URL switches from the original to its thumbnail once that is generated
+    return await run_in_threadpool(media_response, full_path, request.headers, False,
+                                   extra_headers={"Vary": "Accept"})
+
+app.include_router(api_router)
+
+# Mounted last so the /media/{id}/{size} route above takes precedence
+app.mount("/media", MediaFiles(directory=MEDIA_ROOT), name="media")
\ No newline at end of file
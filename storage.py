@@ -1,62 +1,50 @@
-# storage.py
+# backend/storage.py
 
+import asyncio
+import hashlib
+import logging
 import os
+import threading
+import time
 import uuid
-from typing import Tuple, IO
-from PIL import Image
-from io import BytesIO
-from typing import AsyncGenerator
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from PIL import Image, ImageOps, features
 from fastapi import UploadFile
-import aiofiles
 
-def ensure_user_dir(user_id: int):
-    media_root = "uploads"
-    user_dir = os.path.join(media_root, f"user_{user_id}")
-    os.makedirs(user_dir, exist_ok=True)
-    return user_dir
+from metrics import UPLOAD_BYTES, UPLOAD_SECONDS
 
-def infer_media_type(filename: str) -> str:
-    if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-        return "image"
-    if filename.lower().endswith(('.mp4', '.mov', '.avi')):
-        return "video"
-    return "other"
+# Uploads are copied to disk in chunks of this size, never held whole in memory.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Uploads larger than this are rejected mid-stream. 0 disables the limit.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+# "user" shares identical files within one user's uploads, "global" across all users.
+MEDIA_DEDUP_SCOPE = os.getenv("MEDIA_DEDUP_SCOPE", "user").lower()
 
-async def save_upload(user_id: int, file: UploadFile) -> Tuple[str, str]:
-    user_dir = ensure_user_dir(user_id)
-    uid = str(uuid.uuid4())
-    safe_name = f"{uid}_{file.filename.replace(' ','_')}"
-    disk_path = os.path.join(user_dir, safe_name)
-    
-    await file.seek(0)  
-    # NEW: We will stream the file content to disk.
-    async with aiofiles.open(disk_path, "wb") as f:
-        while True:
-            chunk = await file.read(1024)  # Read 1KB chunks
-            if not chunk:
-                break
-            await f.write(chunk)
-            
-    media_type = infer_media_type(file.filename)
-    
-    if media_type == "image":
-        try:
-            with Image.open(disk_path)as img:
-                img.load()
-        except Exception:
-            os.remove(disk_path)
-            raise ValueError("Invalid image file.")
-            
-    relative_path = os.path.join(f"user_{user_id}", safe_name)
-    return relative_path, media_type
+# Downscaled copies generated for every image upload: size name -> longest edge in px.
+DERIVATIVE_SIZES = {"thumb": 256, "medium": 1024}
+# Preferred first; AVIF only when this Pillow build can encode it.
+DERIVATIVE_FORMATS = (["avif"] if features.check("avif") else []) + ["webp"]
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
 
-# backend/storage.py
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class SavedUpload:
+    path: str        # relative to MEDIA_ROOT, e.g. "user_1/ab/ab12...ef.jpg"
+    media_type: str
+    sha256: str
+    size: int
+    # Set while the upload still sits in the staging dir; db.insert_memory moves it to `path`
+    staged_path: Optional[str] = None
 
-import os
-import uuid
-from typing import Tuple, IO
-from PIL import Image
-from io import BytesIO
 
 def ensure_user_dir(user_id: int):
     media_root = os.getenv("MEDIA_ROOT", "uploads")
@@ -71,24 +59,159 @@ def infer_media_type(filename: str) -> str:
         return "video"
     return "other"
 
-def save_upload_sync(user_id: int, content: bytes, filename: str) -> Tuple[str, str]:
-    """Saves a file from its content and returns its path and type."""
-    user_dir = ensure_user_dir(user_id)
-    uid = str(uuid.uuid4())
-    safe_name = f"{uid}_{filename.replace(' ','_')}"
-    disk_path = os.path.join(user_dir, safe_name)
-    
-    with open(disk_path, "wb") as f:
-        f.write(content)
-
-    media_type = infer_media_type(filename)
-    
-    if media_type == "image":
-        try:
-            Image.open(disk_path).verify()
-        except Exception:
-            os.remove(disk_path)
-            raise ValueError("Invalid image file.")
-            
-    relative_path = os.path.join(f"user_{user_id}", safe_name)
-    return relative_path, media_type
\ No newline at end of file
+def _stream_to_file(source: BinaryIO, tmp_path: str, filename: str,
+                    chunk_size: Optional[int], max_bytes: Optional[int]) -> Tuple[str, int, str]:
+    """Copies source to tmp_path chunk by chunk; returns (sha256, size, media_type)."""
+    start = time.perf_counter()
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte upload limit.")
+                digest.update(chunk)
+                f.write(chunk)
+
+        media_type = infer_media_type(filename)
+        if media_type == "image":
+            try:
+                with Image.open(tmp_path) as img:
+                    img.verify()
+            except Exception:
+                raise ValueError("Invalid image file.")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    UPLOAD_SECONDS.observe(time.perf_counter() - start)
+    UPLOAD_BYTES.observe(size)
+    return digest.hexdigest(), size, media_type
+
+def content_path(user_id: int, sha256: str, filename: str) -> str:
+    """Relative path a file with this content is stored under."""
+    ext = os.path.splitext(filename)[1].lower()
+    scope = "shared" if MEDIA_DEDUP_SCOPE == "global" else f"user_{user_id}"
+    return os.path.join(scope, sha256[:2], f"{sha256}{ext}")
+
+def stage_upload(user_id: int, source: BinaryIO, filename: str,
+                 chunk_size: Optional[int] = None, max_bytes: Optional[int] = None) -> SavedUpload:
+    """
+    Streams `source` into the staging dir and works out its content-addressed
+    path. The file only moves into place when db.insert_memory records the
+    reference, which also drops it if identical content is already stored.
+    """
+    staging_dir = os.path.join(os.getenv("MEDIA_ROOT", "uploads"), ".staging")
+    os.makedirs(staging_dir, exist_ok=True)
+    tmp_path = os.path.join(staging_dir, f"{uuid.uuid4()}.part")
+
+    sha256, size, media_type = _stream_to_file(source, tmp_path, filename, chunk_size, max_bytes)
+    return SavedUpload(content_path(user_id, sha256, filename), media_type, sha256, size, staged_path=tmp_path)
+
+def discard_staged(saved: SavedUpload):
+    """Removes a staged upload that will not be inserted."""
+    if saved.staged_path and os.path.exists(saved.staged_path):
+        os.remove(saved.staged_path)
+
+async def save_upload(user_id: int, file: UploadFile, executor: Optional[Executor] = None) -> SavedUpload:
+    """Streams a FastAPI upload into staging on a worker thread without buffering it in memory."""
+    await file.seek(0)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, stage_upload, user_id, file.file, file.filename or "upload")
+
+# ---------- Image derivatives ----------
+_derivative_executor: Optional[ThreadPoolExecutor] = None
+# Queued or running jobs by media path; identical uploads share one path, and so one job
+_derivative_jobs: Dict[str, Future] = {}
+_derivative_lock = threading.Lock()
+
+def derivative_path(media_path: str, size: str, fmt: str) -> str:
+    """Relative path of one derivative, stored next to its original."""
+    base, _ = os.path.splitext(media_path)
+    return f"{base}.{size}.{fmt}"
+
+def generate_derivatives(media_path: str) -> List[str]:
+    """Writes every missing size/format derivative of an image; returns the new paths."""
+    media_root = os.getenv("MEDIA_ROOT", "uploads")
+    wanted = [(size, edge, fmt) for size, edge in DERIVATIVE_SIZES.items() for fmt in DERIVATIVE_FORMATS
+              if not os.path.exists(os.path.join(media_root, derivative_path(media_path, size, fmt)))]
+    if not wanted:
+        return []
+
+    created = []
+    with Image.open(os.path.join(media_root, media_path)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        for size, edge, fmt in wanted:
+            variant = img.copy()
+            variant.thumbnail((edge, edge))
+            rel = derivative_path(media_path, size, fmt)
+            out = os.path.join(media_root, rel)
+            tmp_path = f"{out}.{uuid.uuid4().hex}.part"
+            try:
+                variant.save(tmp_path, format=fmt.upper(), quality=DERIVATIVE_QUALITY)
+                os.replace(tmp_path, out)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            created.append(rel)
+    return created
+
+def _generate_quietly(media_path: str):
+    try:
+        generate_derivatives(media_path)
+    except Exception:
+        logger.exception("derivative generation failed path=%s", media_path)
+
+def _forget_job(media_path: str, job: Future):
+    with _derivative_lock:
+        if _derivative_jobs.get(media_path) is job:
+            del _derivative_jobs[media_path]
+
+def schedule_derivatives(media_path: Optional[str], media_type: Optional[str]):
+    """
+    Queues derivative generation on the background worker pool. A path that
+    is already queued or running gets that job back instead of a second one.
+    """
+    global _derivative_executor
+    if not media_path or media_type != "image":
+        return None
+    with _derivative_lock:
+        job = _derivative_jobs.get(media_path)
+        if job is not None:
+            return job
+        if _derivative_executor is None:
+            _derivative_executor = ThreadPoolExecutor(max_workers=DERIVATIVE_WORKERS, thread_name_prefix="derivatives")
+        job = _derivative_executor.submit(_generate_quietly, media_path)
+        _derivative_jobs[media_path] = job
+    job.add_done_callback(lambda done: _forget_job(media_path, done))
+    return job
+
+def shutdown_derivatives():
+    global _derivative_executor
+    if _derivative_executor is not None:
+        _derivative_executor.shutdown(wait=True)
+        _derivative_executor = None
+
+def find_derivative(media_path: str, size: str, accept: str = "") -> Optional[str]:
+    """Best existing derivative for the client's Accept header, or None if not generated yet."""
+    media_root = os.getenv("MEDIA_ROOT", "uploads")
+    for fmt in DERIVATIVE_FORMATS:
+        if fmt != "webp" and f"image/{fmt}" not in accept:
+            continue
+        rel = derivative_path(media_path, size, fmt)
+        if os.path.exists(os.path.join(media_root, rel)):
+            return rel
+    return None
+
+def derivative_paths(media_path: str) -> List[str]:
+    """Relative paths of every size/format derivative an image may have, existing or not."""
+    return [derivative_path(media_path, size, fmt) for size in DERIVATIVE_SIZES for fmt in DERIVATIVE_FORMATS]
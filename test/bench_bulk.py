@@ -0,0 +1,42 @@
+# test/bench_bulk.py
+# Importing text-only memories: one POST /api/memories per item (timed on a
+# sample and extrapolated) versus a single NDJSON POST /api/memories/bulk.
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from bench_emotions import synthetic_texts
+
+ITEMS = int(os.getenv("BENCH_ITEMS", "100000"))
+SAMPLE = int(os.getenv("BENCH_SAMPLE", "500"))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        os.environ["MEDIA_ROOT"] = os.path.join(tmp, "uploads")
+        os.environ["EMOTION_BACKEND"] = "rule"
+
+        from fastapi.testclient import TestClient
+        import server
+
+        texts = synthetic_texts(ITEMS)
+        with TestClient(server.app) as client:
+            start = time.perf_counter()
+            for i, text in enumerate(texts[:SAMPLE]):
+                client.post("/api/memories", data={"user_id": 1, "title": f"memory {i}", "desc": text})
+            per_item = (time.perf_counter() - start) / SAMPLE
+            print(f"one POST per item: {per_item * 1000:6.2f} ms/item -> {per_item * ITEMS:8.1f} s for {ITEMS} (extrapolated from {SAMPLE})")
+
+            body = "\n".join(json.dumps({"title": f"memory {i}", "desc": text}) for i, text in enumerate(texts)).encode()
+            start = time.perf_counter()
+            r = client.post("/api/memories/bulk", data={"user_id": 2}, files={"items": ("items.ndjson", body)})
+            elapsed = time.perf_counter() - start
+            result = r.json()
+            print(f"   bulk NDJSON POST: {elapsed * 1000 / ITEMS:6.3f} ms/item -> {elapsed:8.1f} s for {result['inserted']} "
+                  f"({len(body) / 2**20:.1f} MiB, {result['failed']} failed)")
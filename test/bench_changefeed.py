@@ -0,0 +1,104 @@
+# test/bench_changefeed.py
+# Thousands of idle /api/memories/stream subscribers against a real uvicorn
+# server: server memory per open stream, and how long one new memory takes
+# to reach every subscriber.
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SUBSCRIBERS = int(os.getenv("BENCH_SUBSCRIBERS", "5000"))
+USERS = int(os.getenv("BENCH_USERS", "100"))
+
+
+def serve(tmp, port):
+    import uvicorn
+    import db
+    db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+    os.environ["MEDIA_ROOT"] = os.path.join(tmp, "media")
+    import server
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def rss_kib(pid):
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    return reader, writer
+
+
+async def subscribe(port, user_id):
+    reader, writer = await request(port, f"GET /api/memories/stream?user_id={user_id} HTTP/1.1\r\n"
+                                          f"Host: bench\r\n\r\n".encode())
+    await reader.readuntil(b"event: ready")
+    await reader.readuntil(b"\n\n")
+    return reader, writer
+
+
+async def create_memory(port, user_id):
+    body = f"user_id={user_id}&title=new+flower&emotion=happy".encode()
+    reader, writer = await request(port, b"POST /api/memories HTTP/1.1\r\nHost: bench\r\n"
+                                         b"Content-Type: application/x-www-form-urlencoded\r\n"
+                                         b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(body), body))
+    await reader.read()
+    writer.close()
+
+
+async def main(port, pid):
+    baseline = rss_kib(pid)
+    start = time.perf_counter()
+    streams = []
+    for i in range(0, SUBSCRIBERS, 500):
+        streams += await asyncio.gather(*(subscribe(port, n % USERS + 1) for n in range(i, min(i + 500, SUBSCRIBERS))))
+    connect = time.perf_counter() - start
+    await asyncio.sleep(1)
+    loaded = rss_kib(pid)
+    print(f"{SUBSCRIBERS} streams over {USERS} users connected in {connect:.1f} s")
+    print(f"server RSS {baseline / 1024:.1f} MiB -> {loaded / 1024:.1f} MiB: "
+          f"{(loaded - baseline) / SUBSCRIBERS:.1f} KiB per idle stream")
+
+    # One insert for user 1 fans out to its share of the subscribers
+    targets = [s for n, s in enumerate(streams) if n % USERS == 0]
+    start = time.perf_counter()
+    await create_memory(port, 1)
+    await asyncio.gather(*(reader.readuntil(b"event: insert") for reader, _ in targets))
+    print(f"insert reached {len(targets)} subscribers in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for _, writer in streams:
+        writer.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+        sys.exit()
+    import resource
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, SUBSCRIBERS * 2 + 100)), hard))
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = subprocess.Popen([sys.executable, __file__, "serve", tmp, str(port)])
+        try:
+            for _ in range(100):
+                try:
+                    socket.create_connection(("127.0.0.1", port)).close()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            asyncio.run(main(port, proc.pid))
+        finally:
+            proc.terminate()
+            proc.wait()
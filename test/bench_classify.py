@@ -0,0 +1,55 @@
+# test/bench_classify.py
+# Classification throughput, one text per call versus classify_many batches:
+# the rule engine, a stub model backend with a fixed per-call overhead (the
+# cost of a pipeline forward pass or an API round trip), and the HTTP
+# endpoint with one text per request versus one batch request.
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import emotions
+from bench_emotions import synthetic_texts
+
+TEXTS = int(os.getenv("BENCH_TEXTS", "2000"))
+CALL_OVERHEAD_MS = float(os.getenv("BENCH_CALL_OVERHEAD_MS", "5"))
+BATCH_SIZE = int(os.getenv("BENCH_BATCH_SIZE", "32"))
+
+
+class StubModel:
+    def predict_many(self, texts):
+        time.sleep(CALL_OVERHEAD_MS / 1000)
+        return [emotions.classify_rule_based(t) for t in texts]
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>26}: {elapsed:7.2f} s  {TEXTS / elapsed:9.0f} texts/s")
+
+
+if __name__ == "__main__":
+    texts = synthetic_texts(TEXTS)
+
+    os.environ["EMOTION_BACKEND"] = "rule"
+    timed("rule, per item", lambda: [emotions.classify(t) for t in texts])
+    timed("rule, classify_many", lambda: emotions.classify_many(texts, BATCH_SIZE))
+
+    emotions.register_backend("stub", StubModel, lambda m, t: m.predict_many([t])[0],
+                              lambda m, batch: m.predict_many(batch))
+    os.environ["EMOTION_BACKEND"] = "stub"
+    timed("stub model, per item", lambda: [emotions.classify(t) for t in texts])
+    timed(f"stub model, batch {BATCH_SIZE}", lambda: emotions.classify_many(texts, BATCH_SIZE))
+
+    os.environ["EMOTION_BACKEND"] = "rule"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MEDIA_ROOT"] = tmp
+        from fastapi.testclient import TestClient
+        import server
+        client = TestClient(server.app)
+        step = server.MAX_CLASSIFY_TEXTS
+        timed("HTTP, one text per request", lambda: [client.post("/api/classify/batch", json={"texts": [t]}) for t in texts])
+        timed("HTTP, batch requests", lambda: [client.post("/api/classify/batch", json={"texts": texts[i:i + step]})
+                                              for i in range(0, len(texts), step)])
@@ -0,0 +1,46 @@
+# test/bench_compression.py
+# Wire bytes and compression CPU per GET /api/memories at several garden
+# sizes, for each encoding the middleware can negotiate.
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import compression
+from bench_serialize import seed
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "100,1000,10000,100000").split(",")]
+REPEAT = int(os.getenv("BENCH_REPEAT", "5"))
+
+
+def cpu_ms(encoding, body):
+    start = time.process_time()
+    for _ in range(REPEAT):
+        encoder = compression.ENCODERS[encoding]()
+        encoder.compress(body)
+        encoder.finish()
+    return (time.process_time() - start) * 1000 / REPEAT
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+        os.environ["MEDIA_ROOT"] = os.path.join(tmp, "media")
+
+        from fastapi.testclient import TestClient
+        import server
+
+        with TestClient(server.app) as client:
+            for size in SIZES:
+                seed(1, size)
+                plain = client.get("/api/memories", params={"user_id": 1}, headers={"Accept-Encoding": "identity"})
+                line = f"{size:>7} rows: identity {len(plain.content) / 1024:9.1f} KiB"
+                for encoding in compression.ENCODERS:
+                    r = client.get("/api/memories", params={"user_id": 1}, headers={"Accept-Encoding": encoding})
+                    assert r.headers.get("content-encoding") == encoding
+                    wire = int(r.headers["content-length"])
+                    line += f" | {encoding} {wire / 1024:8.1f} KiB ({len(plain.content) / wire:4.1f}x) {cpu_ms(encoding, plain.content):7.2f} ms"
+                print(line)
+        db.close_pool()
@@ -0,0 +1,133 @@
+# test/bench_concurrency.py
+# 200 concurrent clients mixing list/create/delete against a uvicorn server
+# while a background job keeps taking the SQLite write lock for short bursts.
+# "blocking" runs the server with async_db swapped for direct db.py calls on
+# the event loop (the old behaviour), so a create waiting on the lock stalls
+# every other request; "async" uses the DB thread pool. Latency is also
+# broken down per operation. BENCH_LOCK_HOLD=0.0001 is the control run with
+# (almost) no lock contention: if its tail matches, the clients and server are
+# short of CPU rather than waiting on the database.
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import db
+
+CLIENTS = int(os.getenv("BENCH_CLIENTS", "200"))
+REQUESTS_PER_CLIENT = int(os.getenv("BENCH_REQUESTS", "10"))
+SEED_ROWS = int(os.getenv("BENCH_SEED_ROWS", "5000"))
+LOCK_HOLD = float(os.getenv("BENCH_LOCK_HOLD", "0.05"))
+PORT = int(os.getenv("BENCH_PORT", "8765"))
+
+SERVER = """
+import sys, uvicorn, db, async_db, server
+db.DB_DIR, db.DB_PATH = sys.argv[1], sys.argv[2]
+if sys.argv[3] == "blocking":
+    def blocking(fn):
+        async def wrapper(*args, **kwargs):
+            return fn(*args, **kwargs)
+        return wrapper
+    for name in ("list_memories", "get_memory", "insert_memory", "delete_memories"):
+        setattr(async_db, name, blocking(getattr(db, name)))
+uvicorn.run(server.app, port=int(sys.argv[4]), log_level="warning")
+"""
+
+
+async def client_loop(client, user_id, latencies, errors):
+    import httpx
+    created = []
+    for _ in range(REQUESTS_PER_CLIENT):
+        op = random.random()
+        kind = "list" if op < 0.6 else "create" if op < 0.9 else "delete"
+        start = time.perf_counter()
+        try:
+            if op < 0.6:
+                await client.get("/api/memories", params={"user_id": user_id, "limit": 50})
+            elif op < 0.9:
+                r = await client.post("/api/memories", data={"user_id": user_id, "title": "load", "emotion": "calm"})
+                created.append(r.json()["id"])
+            elif created:
+                await client.post("/api/memories/delete", json={"user_id": user_id, "memory_ids": [created.pop()]})
+        except (httpx.HTTPError, ValueError, KeyError):
+            errors.append(op)
+            continue
+        latencies.append((kind, (time.perf_counter() - start) * 1000))
+
+
+async def run(label):
+    import httpx
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=CLIENTS)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, 1 + i % 20, latencies, errors) for i in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+    def pct(kind, p):
+        times = sorted(ms for k, ms in latencies if kind in (None, k))
+        return times[min(len(times) - 1, int(len(times) * p))] if times else float("nan")
+    print(f"{label:>9}: {len(latencies) / elapsed:7.0f} req/s  p50 {pct(None, 0.5):7.1f} ms  "
+          f"p99 {pct(None, 0.99):7.1f} ms  {len(errors)} failed")
+    for kind in ("list", "create", "delete"):
+        print(f"{kind:>19}: p50 {pct(kind, 0.5):7.1f} ms  p99 {pct(kind, 0.99):7.1f} ms")
+
+
+def lock_holder(stop):
+    conn = sqlite3.connect(db.DB_PATH, timeout=30)
+    while not stop.is_set():
+        conn.execute("BEGIN IMMEDIATE")
+        time.sleep(LOCK_HOLD)
+        conn.commit()
+        time.sleep(LOCK_HOLD)
+    conn.close()
+
+
+def wait_for_server():
+    import httpx
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{PORT}/api/memories", params={"user_id": 0, "limit": 1})
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def bench(mode, tmp):
+    proc = subprocess.Popen([sys.executable, "-c", SERVER, db.DB_DIR, db.DB_PATH, mode, str(PORT)],
+                            cwd=ROOT, env={**os.environ, "MEDIA_ROOT": os.path.join(tmp, "uploads")})
+    stop = threading.Event()
+    writer = threading.Thread(target=lock_holder, args=(stop,))
+    try:
+        wait_for_server()
+        writer.start()
+        asyncio.run(run(mode))
+    finally:
+        stop.set()
+        if writer.is_alive():
+            writer.join()
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        with db.get_conn() as conn:
+            conn.executemany(
+                "INSERT INTO memories(user_id,title,description,emotion,created_at) VALUES(?,?,?,?,?)",
+                ((1 + i % 20, f"seed {i}", "", "happy", f"2024-{i:012d}") for i in range(SEED_ROWS)),
+            )
+        db.close_pool()
+
+        bench("blocking", tmp)
+        bench("async", tmp)
@@ -0,0 +1,45 @@
+# test/bench_create.py
+# POST /api/memories latency as one user's garden grows. With the single-row
+# fetch in create_memory the latency should stay flat from 10 to 100k rows.
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "10,1000,10000,100000").split(",")]
+POSTS = int(os.getenv("BENCH_POSTS", "50"))
+
+
+def seed(user_id, count):
+    with db.get_conn() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM memories WHERE user_id=?", (user_id,)).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO memories(user_id,title,description,emotion,created_at) VALUES(?,?,?,?,?)",
+            ((user_id, f"seed {i}", "", "calm", f"2024-01-01T{i:012d}") for i in range(existing, count)),
+        )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        os.environ["MEDIA_ROOT"] = os.path.join(tmp, "uploads")
+
+        from fastapi.testclient import TestClient
+        import server
+
+        with TestClient(server.app) as client:
+            for size in SIZES:
+                seed(1, size)
+                timings = []
+                for i in range(POSTS):
+                    start = time.perf_counter()
+                    r = client.post("/api/memories", data={"user_id": 1, "title": f"bench {i}", "emotion": "happy"})
+                    timings.append((time.perf_counter() - start) * 1000)
+                    assert r.status_code == 201, r.text
+                timings.sort()
+                print(f"{size:>7} memories: median {statistics.median(timings):6.2f} ms  p95 {timings[int(len(timings) * 0.95) - 1]:6.2f} ms")
@@ -0,0 +1,95 @@
+# test/bench_db.py
+# Reads/sec while writers are active: a fresh rollback-journal connection per
+# call (the old get_conn) versus the pooled WAL connections in db.py.
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+DURATION = float(os.getenv("BENCH_SECONDS", "3"))
+READERS = int(os.getenv("BENCH_READERS", "4"))
+WRITERS = int(os.getenv("BENCH_WRITERS", "2"))
+SEED_ROWS = int(os.getenv("BENCH_SEED_ROWS", "2000"))
+
+
+def legacy_insert(user_id):
+    with sqlite3.connect(db.DB_PATH, timeout=5) as conn:
+        conn.execute(
+            "INSERT INTO memories(user_id,title,description,emotion,created_at) VALUES(?,?,?,?,?)",
+            (user_id, "bench", "", "happy", time.time()),
+        )
+        conn.commit()
+
+
+def legacy_list(user_id):
+    with sqlite3.connect(db.DB_PATH, timeout=5) as conn:
+        return conn.execute(
+            "SELECT id, title FROM memories WHERE user_id=? ORDER BY created_at DESC LIMIT 50", (user_id,)
+        ).fetchall()
+
+
+def pooled_insert(user_id):
+    db.insert_memory(user_id, "bench", "", "happy", None, None, None, None)
+
+
+def pooled_list(user_id):
+    with db.get_conn() as conn:
+        return conn.execute(
+            "SELECT id, title FROM memories WHERE user_id=? ORDER BY created_at DESC LIMIT 50", (user_id,)
+        ).fetchall()
+
+
+def run(label, insert, read):
+    stop = time.perf_counter() + DURATION
+    reads, writes, errors = [0], [0], [0]
+    lock = threading.Lock()
+
+    def loop(fn, counter):
+        n = 0
+        while time.perf_counter() < stop:
+            try:
+                fn(1)
+                n += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            counter[0] += n
+
+    threads = [threading.Thread(target=loop, args=(insert, writes)) for _ in range(WRITERS)]
+    threads += [threading.Thread(target=loop, args=(read, reads)) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"{label:>8}: {reads[0] / DURATION:9.0f} reads/s  {writes[0] / DURATION:7.0f} writes/s  {errors[0]} lock errors")
+
+
+def fresh_db(tmp, name):
+    db.close_pool()
+    db.DB_DIR = tmp
+    db.DB_PATH = os.path.join(tmp, name)
+    db.init_db()
+    with db.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO memories(user_id,title,description,emotion,created_at) VALUES(?,?,?,?,?)",
+            [(1, f"m{i}", "", "happy", str(i)) for i in range(SEED_ROWS)],
+        )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh_db(tmp, "before.db")
+        db.close_pool()
+        with sqlite3.connect(db.DB_PATH) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        run("before", legacy_insert, legacy_list)
+
+        fresh_db(tmp, "after.db")
+        run("after", pooled_insert, pooled_list)
+        db.close_pool()
@@ -0,0 +1,78 @@
+# test/bench_delete.py
+# Deleting 50k memories that each have their own media file. Old path: one
+# IN (...) over every id and a serial os.remove per file inside the request.
+# New path: chunked deletes that tombstone the files, then the reaper.
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from reaper import MediaReaper
+
+MEMORIES = int(os.getenv("BENCH_MEMORIES", "50000"))
+
+
+def seed(user_id, media_root):
+    rows, blobs = [], []
+    for i in range(MEMORIES):
+        path = os.path.join(f"user_{user_id}", f"{i % 256:02x}", f"{i:064x}.mp4")
+        full = os.path.join(media_root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(b"x" * 1024)
+        rows.append((user_id, f"m{i}", "", "calm", f"2024-01-01T{i:012d}", path, "video"))
+        blobs.append((path, f"{i:064x}", 1024, "video", "2024-01-01"))
+    with db.get_conn() as conn:
+        conn.executemany("INSERT INTO memories(user_id,title,description,emotion,created_at,media_path,media_type) "
+                         "VALUES(?,?,?,?,?,?,?)", rows)
+        conn.executemany("INSERT INTO media_blobs(path,sha256,size,media_type,refcount,created_at) VALUES(?,?,?,?,1,?)", blobs)
+        return [r[0] for r in conn.execute("SELECT id FROM memories WHERE user_id=?", (user_id,))]
+
+
+def legacy_delete(user_id, memory_ids, media_root):
+    placeholders = ",".join("?" for _ in memory_ids)
+    params = memory_ids + [user_id]
+    with db.get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        paths = [r[0] for r in conn.execute(
+            f"SELECT media_path FROM memories WHERE id IN ({placeholders}) AND user_id = ?", params) if r[0]]
+        conn.execute(f"DELETE FROM memories WHERE id IN ({placeholders}) AND user_id = ?", params)
+        for path in paths:
+            conn.execute("DELETE FROM media_blobs WHERE path=?", (path,))
+            os.remove(os.path.join(media_root, path))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+        media_root = os.path.join(tmp, "media")
+        os.environ["MEDIA_ROOT"] = media_root
+        db.init_db()
+
+        ids = seed(1, media_root)
+        start = time.perf_counter()
+        try:
+            legacy_delete(1, ids, media_root)
+            print(f"legacy, one IN clause: {time.perf_counter() - start:6.2f} s with the request held")
+        except sqlite3.OperationalError as e:
+            print(f"legacy, one IN clause: failed after {time.perf_counter() - start:.2f} s ({e})")
+            with db.get_conn() as conn:
+                conn.execute("DELETE FROM memories")
+                conn.execute("DELETE FROM media_blobs")
+
+        ids = seed(2, media_root)
+        start = time.perf_counter()
+        deleted = db.delete_memories(2, ids)
+        print(f"chunked + tombstones:  {time.perf_counter() - start:6.2f} s with the request held ({len(deleted)} rows)")
+        start = time.perf_counter()
+        reaper, reaped = MediaReaper(), 0
+        while True:
+            n = reaper.run_once()
+            if not n:
+                break
+            reaped += n
+        print(f"reaper (background):   {time.perf_counter() - start:6.2f} s for {reaped} files")
+        db.close_pool()
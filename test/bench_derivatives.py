@@ -0,0 +1,51 @@
+# test/bench_derivatives.py
+# Bytes transferred and decode time for one 40-card garden page: original
+# uploads versus the thumb derivatives the grid now requests. Decode time is
+# a stand-in for the browser's image render cost.
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from PIL import Image
+import storage
+
+CARDS = int(os.getenv("BENCH_CARDS", "40"))
+SOURCE_DIR = os.path.join(ROOT, "uploads", "user_1")
+
+
+def page_cost(paths, media_root):
+    total_bytes, start = 0, time.perf_counter()
+    for rel in paths:
+        full = os.path.join(media_root, rel)
+        total_bytes += os.path.getsize(full)
+        with Image.open(full) as img:
+            img.load()
+    return total_bytes, (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["MEDIA_ROOT"] = tmp
+        images = []
+        for name in sorted(os.listdir(SOURCE_DIR)):
+            if storage.infer_media_type(name) == "image":
+                shutil.copy(os.path.join(SOURCE_DIR, name), os.path.join(tmp, name))
+                images.append(name)
+
+        start = time.perf_counter()
+        for name in images:
+            storage.generate_derivatives(name)
+        per_image = (time.perf_counter() - start) * 1000 / len(images)
+        print(f"derivative generation: {per_image:.1f} ms/image ({len(storage.DERIVATIVE_SIZES) * len(storage.DERIVATIVE_FORMATS)} files each)")
+
+        page = [images[i % len(images)] for i in range(CARDS)]
+        variants = {"original": page}
+        for fmt in storage.DERIVATIVE_FORMATS:
+            variants[f"thumb.{fmt}"] = [storage.derivative_path(p, "thumb", fmt) for p in page]
+        for label, paths in variants.items():
+            size, ms = page_cost(paths, tmp)
+            print(f"{label:>12}: {size / 2**20:8.2f} MiB per page, decode {ms:8.1f} ms")
@@ -0,0 +1,70 @@
+# test/bench_emotion_cache.py
+# Model-backed classification of a re-import with realistic duplication:
+# memory texts drawn from a Zipf-like distribution over distinct texts (a
+# few very common ones, a long tail), with case/whitespace variants. Compares
+# sending every text to the model, a cold cache, and a warm restart served from the SQLite tier.
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import emotions
+from bench_emotions import synthetic_texts
+
+TEXTS = int(os.getenv("BENCH_TEXTS", "5000"))
+DISTINCT = int(os.getenv("BENCH_DISTINCT", "1000"))
+CALL_OVERHEAD_MS = float(os.getenv("BENCH_CALL_OVERHEAD_MS", "5"))
+PER_TEXT_MS = float(os.getenv("BENCH_PER_TEXT_MS", "1"))
+
+
+class StubModel:
+    def predict_many(self, texts):
+        time.sleep((CALL_OVERHEAD_MS + PER_TEXT_MS * len(texts)) / 1000)
+        return [emotions.classify_rule_based(t) for t in texts]
+
+
+def corpus(seed=11):
+    rng = random.Random(seed)
+    distinct = synthetic_texts(DISTINCT, seed)
+    weights = [1 / (rank + 1) for rank in range(DISTINCT)]
+    texts = rng.choices(distinct, weights=weights, k=TEXTS)
+    return [t.upper() if rng.random() < 0.1 else t.replace(" ", "  ") if rng.random() < 0.1 else t for t in texts]
+
+
+def timed(label, texts):
+    emotions.result_cache.memory_hits = emotions.result_cache.db_hits = emotions.result_cache.misses = 0
+    start = time.perf_counter()
+    emotions.classify_many(texts)
+    elapsed = time.perf_counter() - start
+    s = emotions.result_cache.stats()
+    print(f"{label:>14}: {elapsed:6.2f} s  {len(texts) / elapsed:8.0f} texts/s  "
+          f"memory hits {s['memory_hits']:5d}  db hits {s['db_hits']:5d}  misses {s['misses']:5d}")
+
+
+if __name__ == "__main__":
+    texts = corpus()
+    print(f"{len(texts)} texts, {len({emotions.text_key(t) for t in texts})} distinct after normalization")
+    emotions.register_backend("stub", StubModel, lambda m, t: m.predict_many([t])[0],
+                              lambda m, batch: m.predict_many(batch))
+    os.environ["EMOTION_BACKEND"] = "stub"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        start = time.perf_counter()
+        model = StubModel()
+        for i in range(0, len(texts), emotions.CLASSIFY_BATCH_SIZE):
+            model.predict_many(texts[i:i + emotions.CLASSIFY_BATCH_SIZE])
+        elapsed = time.perf_counter() - start
+        print(f"{'no cache':>14}: {elapsed:6.2f} s  {len(texts) / elapsed:8.0f} texts/s  (every text sent to the model)")
+
+        emotions.result_cache = emotions.ClassificationCache()
+        timed("cold cache", texts)
+        timed("warm (LRU)", texts)
+        emotions.result_cache.clear()  # a restart: only the SQLite tier survives
+        timed("restart (db)", texts)
+        db.close_pool()
@@ -0,0 +1,61 @@
+# test/bench_emotions.py
+# Rule-based classification throughput over synthetic memory texts: the old
+# eight-regexes-per-call implementation versus the precompiled single pass.
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import emotions
+
+TEXTS = int(os.getenv("BENCH_TEXTS", "1000000"))
+
+FILLER = ("we went to the park with friends and family after work on a sunny afternoon "
+          "then walked home talking about the week and what comes next").split()
+KEYWORDS = [k for _, keywords in emotions.RULES for k in keywords]
+
+
+def legacy_classify(text):
+    t = text.lower()
+    rules = [
+        (r"\b(happy|joy|glad|smile|delight|celebrate)\b", "happy"),
+        (r"\b(love|romance|date|anniversary|kiss|valentine)\b", "romantic"),
+        (r"\b(sad|cry|loss|hurt|miss|lonely)\b", "sad"),
+        (r"\b(calm|peace|relax|serene|quiet|beach)\b", "calm"),
+        (r"\b(angry|mad|rage|furious|annoyed)\b", "angry"),
+        (r"\b(old times|nostalgia|remember|childhood|school)\b", "nostalgic"),
+        (r"\b(excited|thrill|hype|can’t wait|win)\b", "excited"),
+        (r"\b(proud|achievement|award|rank|milestone)\b", "proud"),
+    ]
+    for pattern, label in rules:
+        if re.search(pattern, t):
+            return label
+    return emotions.DEFAULT_EMOTION
+
+
+def synthetic_texts(n, seed=7):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(8, 40))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(KEYWORDS))
+        texts.append(" ".join(words).capitalize())
+    return texts
+
+
+def timed(label, fn, texts):
+    start = time.perf_counter()
+    for t in texts:
+        fn(t)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>12}: {elapsed:6.2f} s  {len(texts) / elapsed:9.0f} texts/s")
+
+
+if __name__ == "__main__":
+    texts = synthetic_texts(TEXTS)
+    timed("legacy", legacy_classify, texts)
+    timed("single-pass", emotions.classify_rule_based, texts)
+    timed("scores", emotions.score_rule_based, texts)
@@ -0,0 +1,57 @@
+# test/bench_garden.py
+# Trace count, figure build time and to_json time of the GardenHybrid 3D
+# garden at several sizes: one trace group per flower/bud versus one trace
+# per visual layer (batched=True).
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from garden_hybrid import GardenHybrid
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "100,1000,10000").split(",")]
+# The per-flower figure takes minutes beyond this
+UNBATCHED_MAX = int(os.getenv("BENCH_UNBATCHED_MAX", "1000"))
+
+
+def synthetic_garden(garden, n, seed=7):
+    """Flower and bud dicts shaped like generate_garden_layout's, at random spots."""
+    rng = random.Random(seed)
+    emotions = list(garden.flower_types)
+    flowers = []
+    for i in range(n):
+        emotion = rng.choice(emotions)
+        info = garden.flower_types[emotion]
+        flowers.append({
+            "id": f"flower_{i}", "memory_id": i, "emotion": emotion, "title": f"Memory {i}",
+            "x": rng.uniform(10, garden.garden_width - 10), "y": rng.uniform(10, garden.garden_height - 10),
+            "emoji": info["emoji"], "bloomed": rng.random() < 0.2, "cluster": emotion,
+        })
+    buds = [{"id": f"empty_bud_{i}", "x": rng.uniform(10, garden.garden_width - 10),
+             "y": rng.uniform(10, garden.garden_height - 10), "bloomed": False}
+            for i in range(max(20, n // 2))]
+    return flowers, buds
+
+
+def measure(garden, flowers, buds, batched):
+    start = time.perf_counter()
+    fig = garden.create_hybrid_garden_visualization(flowers, buds, batched=batched)
+    built = time.perf_counter()
+    payload = fig.to_json()
+    done = time.perf_counter()
+    return len(fig.data), built - start, done - built, len(payload)
+
+
+if __name__ == "__main__":
+    garden = GardenHybrid()
+    for n in SIZES:
+        flowers, buds = synthetic_garden(garden, n)
+        for batched in (False, True):
+            if not batched and n > UNBATCHED_MAX:
+                print(f"{n:>6} memories  per-flower: skipped (BENCH_UNBATCHED_MAX={UNBATCHED_MAX})")
+                continue
+            traces, build, encode, size = measure(garden, flowers, buds, batched)
+            label = "batched" if batched else "per-flower"
+            print(f"{n:>6} memories {label:>11}: {traces:>6} traces, build {build * 1000:8.1f} ms, "
+                  f"to_json {encode * 1000:8.1f} ms, {size / 1024:8.1f} KiB")
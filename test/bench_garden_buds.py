@@ -0,0 +1,42 @@
+# test/bench_garden_buds.py
+# Empty-bud placement time as the garden grows: the raster of free cells,
+# the Poisson-disk sampling, and generate_garden_layout as a whole.
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import garden_spatial
+from garden_hybrid import GardenHybrid
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "0,1000,5000,10000,50000").split(",")]
+# flower_spacing used for the run (the garden default is 15)
+FLOWER_SPACING = float(os.getenv("BENCH_FLOWER_SPACING", "4"))
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+if __name__ == "__main__":
+    garden = GardenHybrid()
+    garden.flower_spacing = FLOWER_SPACING
+    emotions = list(garden.flower_types)
+    for n in SIZES:
+        memories = [{"id": i, "title": f"Memory {i}", "emotion": emotions[i % len(emotions)]} for i in range(n)]
+        layout_ms, (flowers, buds) = timed_ms(lambda: garden.generate_garden_layout(memories))
+        obstacles = np.array([(f["x"], f["y"]) for f in flowers], dtype=float).reshape(-1, 2)
+        zones = list(garden.clusters.values())
+        bounds = (10, 10, garden.garden_width - 10, garden.garden_height - 10)
+        cell = garden_spatial.FREE_CELL_SIZE * garden.layout_scale
+        raster_ms, cells = timed_ms(lambda: garden_spatial.free_cells(
+            bounds, obstacles, garden.flower_spacing, zones, cell))
+        count = max(20, n // 2)
+        sample_ms, _ = timed_ms(lambda: garden_spatial.poisson_disk_sample(
+            cells, count, garden.bud_spacing, np.random.default_rng(count), cell))
+        print(f"{n:>6} memories: {len(buds):>4}/{count:<6} buds, free cells {raster_ms:7.1f} ms, "
+              f"sampling {sample_ms:7.1f} ms, whole layout {layout_ms:8.1f} ms")
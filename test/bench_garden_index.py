@@ -0,0 +1,56 @@
+# test/bench_garden_index.py
+# "Nearby objects" radius queries and click-id resolution over a garden of
+# flowers and buds: a scan of every object (what each rerun used to do)
+# versus GardenIndex, plus the one-off cost of building the index.
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from garden_spatial import GardenIndex
+
+OBJECTS = int(os.getenv("BENCH_OBJECTS", "10000"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "1000"))
+RADIUS = float(os.getenv("BENCH_RADIUS", "15"))
+
+
+def per_call_us(fn, args):
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+
+def scan_nearby(flowers, buds, x, y):
+    nearby_flowers = [(f, math.sqrt((f["x"] - x) ** 2 + (f["y"] - y) ** 2)) for f in flowers]
+    nearby_buds = [(b, math.sqrt((b["x"] - x) ** 2 + (b["y"] - y) ** 2)) for b in buds]
+    return ([(f, d) for f, d in nearby_flowers if d <= RADIUS], [(b, d) for b, d in nearby_buds if d <= RADIUS])
+
+
+def scan_click(flowers, buds, clicked_id):
+    for obj in flowers + buds:
+        if obj["id"] == clicked_id:
+            return obj
+
+
+if __name__ == "__main__":
+    rng = random.Random(11)
+    flowers = [{"id": f"flower_{i}", "x": rng.uniform(10, 90), "y": rng.uniform(10, 70), "has_memory": True}
+               for i in range(OBJECTS * 2 // 3)]
+    buds = [{"id": f"empty_bud_{i}", "x": rng.uniform(10, 90), "y": rng.uniform(10, 70), "has_memory": False}
+            for i in range(OBJECTS - len(flowers))]
+    spots = [(rng.uniform(5, 95), rng.uniform(5, 75)) for _ in range(QUERIES)]
+    clicks = [(rng.choice(flowers + buds)["id"],) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    index = GardenIndex(flowers, buds)
+    build_ms = (time.perf_counter() - start) * 1000
+    hits = sum(len(index.within(x, y, RADIUS)) for x, y in spots) / QUERIES
+
+    print(f"{OBJECTS} objects, radius {RADIUS:g} (~{hits:.0f} hits per query), index built in {build_ms:.1f} ms")
+    print(f"{'nearby, full scan':>22}: {per_call_us(lambda x, y: scan_nearby(flowers, buds, x, y), spots):10.1f} us")
+    print(f"{'nearby, GardenIndex':>22}: {per_call_us(index.within, [(x, y, RADIUS) for x, y in spots]):10.1f} us")
+    print(f"{'click, full scan':>22}: {per_call_us(lambda i: scan_click(flowers, buds, i), clicks):10.1f} us")
+    print(f"{'click, GardenIndex':>22}: {per_call_us(index.get, clicks):10.3f} us")
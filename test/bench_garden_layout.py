@@ -0,0 +1,58 @@
+# test/bench_garden_layout.py
+# Garden layout time per Streamlit rerun: placing every flower afresh (what
+# each rerun used to do) versus load_garden_layout's first load, a new
+# session reading stored positions, and a rerun served from session state.
+import os
+import sys
+import tempfile
+import time
+
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from garden_hybrid import GardenHybrid
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000,10000").split(",")]
+# Anything that places empty buds takes minutes beyond this
+BUDS_MAX = int(os.getenv("BENCH_BUDS_MAX", "2000"))
+EMOTIONS = ["happy", "sad", "calm", "proud", "romantic", "mystery"]
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    garden = GardenHybrid()
+    for n in SIZES:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+            db.init_db()
+            db.insert_memories(1, [{"title": f"Memory {i}", "emotion": EMOTIONS[i % len(EMOTIONS)]} for i in range(n)])
+            memories = db.list_memories(1)
+            st.session_state.pop("garden_layout", None)
+
+            if n > BUDS_MAX:
+                print(f"{n:>6} memories: recompute, first load and new session skipped (BENCH_BUDS_MAX={BUDS_MAX})")
+                # Seed the table and the session cache without placing buds
+                garden._place_empty_buds, place_empty_buds = (lambda flowers, count: []), garden._place_empty_buds
+                flowers, _ = garden.generate_garden_layout(memories)
+                garden._place_empty_buds = place_empty_buds
+                db.put_garden_positions(1, [(f["memory_id"], f["emotion"], f["slot"], f["x"], f["y"]) for f in flowers])
+                st.session_state.garden_layout = ((1, db.get_memory_version(1)), flowers, [], garden._geometry())
+            else:
+                recompute = timed_ms(lambda: garden.generate_garden_layout(memories))
+                first = timed_ms(lambda: garden.load_garden_layout(1, memories))
+                st.session_state.pop("garden_layout")
+                session = timed_ms(lambda: garden.load_garden_layout(1, memories))
+                print(f"{n:>6} memories: recompute {recompute:9.1f} ms, first load {first:9.1f} ms, "
+                      f"new session {session:9.1f} ms")
+
+            reruns = 100
+            rerun = timed_ms(lambda: [garden.load_garden_layout(1, memories) for _ in range(reruns)]) / reruns
+            print(f"{n:>6} memories: rerun {rerun:9.3f} ms")
+            st.session_state.pop("garden_layout", None)
+            db.close_pool()
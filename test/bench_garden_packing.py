@@ -0,0 +1,45 @@
+# test/bench_garden_packing.py
+# Layout generation as emotion clusters grow: sunflower slots, cluster
+# tiling and flower dicts, then empty buds, for an even mix of emotions and
+# for a garden that is mostly "happy". Also reports how far the garden was
+# spread (layout_scale) and the closest pair of flowers in a sample.
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from garden_hybrid import GardenHybrid
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000,10000,100000").split(",")]
+SAMPLE = int(os.getenv("BENCH_SAMPLE", "2000"))
+
+
+def closest_pair(flowers):
+    points = np.array([(f["x"], f["y"]) for f in flowers])
+    sample = points[np.random.default_rng(0).choice(len(points), min(SAMPLE, len(points)), replace=False)]
+    distance = np.linalg.norm(sample[:, None] - sample[None], axis=2)
+    distance[np.eye(len(sample), dtype=bool)] = np.inf
+    return distance.min()
+
+
+if __name__ == "__main__":
+    garden = GardenHybrid()
+    even = list(garden.flower_types)
+    mixes = {"even": even, "mostly happy": ["happy"] * 9 + even}
+    for n in SIZES:
+        for label, emotions in mixes.items():
+            memories = [{"id": i, "title": f"Memory {i}", "emotion": emotions[i % len(emotions)]} for i in range(n)]
+            place_empty_buds = garden._place_empty_buds
+            garden._place_empty_buds = lambda flowers, count: []
+            start = time.perf_counter()
+            flowers, _ = garden.generate_garden_layout(memories)
+            flowers_ms = (time.perf_counter() - start) * 1000
+            garden._place_empty_buds = place_empty_buds
+            start = time.perf_counter()
+            buds = garden._place_empty_buds(flowers, max(20, n // 2))
+            buds_ms = (time.perf_counter() - start) * 1000
+            print(f"{n:>7} memories {label:>12}: flowers {flowers_ms:8.1f} ms, buds {buds_ms:7.1f} ms "
+                  f"({len(buds)}), scale {garden.layout_scale:6.2f} -> {garden.garden_width:.0f}x"
+                  f"{garden.garden_height:.0f}, closest pair {closest_pair(flowers):.2f}")
@@ -0,0 +1,49 @@
+# test/bench_list.py
+# Latency of listing one user's memories in a large table: the full slice
+# without the (user_id, created_at) index versus keyset pages with it.
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+USERS = int(os.getenv("BENCH_USERS", "20"))
+PER_USER = int(os.getenv("BENCH_PER_USER", "20000"))
+PAGE = int(os.getenv("BENCH_PAGE", "50"))
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR = tmp
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        with db.get_conn() as conn:
+            conn.executemany(
+                "INSERT INTO memories(user_id,title,description,emotion,created_at) VALUES(?,?,?,?,?)",
+                ((i % USERS, f"m{i}", "", "happy", f"2025-01-01T00:00:{i:09d}") for i in range(USERS * PER_USER)),
+            )
+
+        with db.get_conn() as conn:
+            conn.execute("DROP INDEX idx_memories_user_created")
+        print(f"no index, full list : {timed(lambda: db.list_memories(1)):8.1f} ms")
+        print(f"no index, one page  : {timed(lambda: db.list_memories(1, limit=PAGE)):8.1f} ms")
+
+        with db.get_conn() as conn:
+            conn.execute("PRAGMA user_version=0")
+            db.apply_migrations(conn)
+        print(f"index, full list    : {timed(lambda: db.list_memories(1)):8.1f} ms")
+        print(f"index, one page     : {timed(lambda: db.list_memories(1, limit=PAGE)):8.1f} ms")
+        last = db.list_memories(1, limit=PAGE * 100)[-1]
+        print(f"index, deep page    : {timed(lambda: db.list_memories(1, limit=PAGE, before_created_at=last['created_at'], before_id=last['id'])):8.1f} ms")
+        db.close_pool()
@@ -0,0 +1,67 @@
+# test/bench_media_cache.py
+# Bytes and requests re-served per Streamlit rerun for a garden of media,
+# with a client that caches like a browser: it skips requests while the copy
+# is fresh per Cache-Control and revalidates with If-None-Match otherwise.
+# Compares plain StaticFiles with MediaFiles.
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+from media import MediaFiles
+
+RERUNS = int(os.getenv("BENCH_RERUNS", "10"))
+SOURCE_DIR = os.path.join(ROOT, "uploads", "user_1")
+
+
+class BrowserCache:
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}
+        self.requests = self.bytes = 0
+
+    def fetch(self, url):
+        cached = self.entries.get(url)
+        if cached and "immutable" in cached.get("cache-control", ""):
+            return
+        headers = {"If-None-Match": cached["etag"]} if cached and "etag" in cached else {}
+        r = self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += len(r.content)
+        if r.status_code == 200:
+            self.entries[url] = r.headers
+
+
+def run(label, files_app, urls):
+    app = FastAPI()
+    app.mount("/media", files_app, name="media")
+    browser = BrowserCache(TestClient(app))
+    for url in urls:
+        browser.fetch(url)
+    first = browser.bytes
+    browser.requests = browser.bytes = 0
+    for _ in range(RERUNS):
+        for url in urls:
+            browser.fetch(url)
+    print(f"{label:>12}: first load {first / 2**20:6.2f} MiB; per rerun {browser.requests / RERUNS:5.1f} requests, {browser.bytes / RERUNS / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        urls = []
+        for name in sorted(os.listdir(SOURCE_DIR)):
+            with open(os.path.join(SOURCE_DIR, name), "rb") as f:
+                sha = hashlib.sha256(f.read()).hexdigest()
+            rel = os.path.join("user_1", sha[:2], sha + os.path.splitext(name)[1].lower())
+            os.makedirs(os.path.join(tmp, os.path.dirname(rel)), exist_ok=True)
+            shutil.copy(os.path.join(SOURCE_DIR, name), os.path.join(tmp, rel))
+            urls.append(f"/media/{rel}")
+
+        run("StaticFiles", StaticFiles(directory=tmp), urls)
+        run("MediaFiles", MediaFiles(directory=tmp), urls)
@@ -0,0 +1,76 @@
+# test/bench_metrics.py
+# Cost of the /metrics instrumentation per call: a raw histogram observe, a
+# counter increment, the @timed wrapper around a no-op and around a real
+# db.py read, and MetricsMiddleware around a trivial ASGI app.
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import metrics
+
+CALLS = int(os.getenv("BENCH_CALLS", "1000000"))
+
+
+def per_call_us(fn, calls=CALLS):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def report(label, instrumented, bare, calls=CALLS):
+    bare_us = per_call_us(bare, calls)
+    instrumented_us = per_call_us(instrumented, calls)
+    print(f"{label:>22}: {bare_us:7.3f} us bare, {instrumented_us:7.3f} us instrumented, "
+          f"+{instrumented_us - bare_us:.3f} us per call")
+
+
+def noop():
+    pass
+
+
+async def asgi_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def asgi_runner(app, calls):
+    scope = {"type": "http", "method": "GET", "path": "/", "root_path": ""}
+
+    async def send(message):
+        pass
+
+    async def run():
+        for _ in range(calls):
+            await app(scope, None, send)
+
+    return lambda: asyncio.run(run())
+
+
+if __name__ == "__main__":
+    hist = metrics.Histogram("bench_seconds", "bench")
+    child = hist.labels()
+    counter = metrics.Counter("bench_total", "bench").labels()
+    print(f"{'observe':>22}: {per_call_us(lambda: child.observe(0.003)):7.3f} us")
+    print(f"{'counter inc':>22}: {per_call_us(lambda: counter.inc()):7.3f} us")
+    report("@timed no-op", metrics.timed(metrics.Histogram("bench_call_seconds", "bench", ("function",)))(noop), noop)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+        db.init_db()
+        db.insert_memory(1, "m", "", "calm", None, None, None, None)
+        calls = CALLS // 10
+        report("db.get_memory_version", lambda: db.get_memory_version(1),
+               lambda: db.get_memory_version.__wrapped__(1), calls)
+        db.close_pool()
+
+    calls = CALLS // 10
+    bare, wrapped = asgi_runner(asgi_app, calls), asgi_runner(metrics.MetricsMiddleware(asgi_app), calls)
+    start = time.perf_counter(); bare(); bare_us = (time.perf_counter() - start) / calls * 1e6
+    start = time.perf_counter(); wrapped(); wrapped_us = (time.perf_counter() - start) / calls * 1e6
+    print(f"{'MetricsMiddleware':>22}: {bare_us:7.3f} us bare, {wrapped_us:7.3f} us instrumented, "
+          f"+{wrapped_us - bare_us:.3f} us per request")
@@ -0,0 +1,64 @@
+# test/bench_serialize.py
+# Cost of turning a listing into JSON bytes, for 10k and 100k rows:
+#   pydantic+json : what FastAPI does with response_model (validate every row
+#                   through MemoryResponse, dump, json.dumps)
+#   orjson        : the trusted-rows path GET /api/memories now takes
+#   orjson+fields : the same with ?fields=id,title,emotion,unlock_at
+# plus the end-to-end GET through the app.
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "10000,100000").split(",")]
+GALAXY_FIELDS = ["id", "title", "emotion", "unlock_at"]
+
+
+def seed(user_id, count):
+    with db.get_conn() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM memories WHERE user_id=?", (user_id,)).fetchone()[0]
+        conn.executemany(
+            "INSERT INTO memories(user_id,title,description,emotion,created_at,media_path,media_type) VALUES(?,?,?,?,?,?,?)",
+            ((user_id, f"memory {i}", "a day at the beach with friends", "calm", f"2024-01-01T{i:012d}",
+              f"user_{user_id}/ab/{i:064x}.jpg", "image") for i in range(existing, count)),
+        )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return (time.perf_counter() - start) * 1000, out
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_DIR, db.DB_PATH = tmp, os.path.join(tmp, "bench.db")
+        os.environ["MEDIA_ROOT"] = os.path.join(tmp, "media")
+
+        from fastapi.testclient import TestClient
+        from pydantic import TypeAdapter
+        import orjson
+        import server
+
+        adapter = TypeAdapter(List[server.MemoryResponse])
+        with TestClient(server.app) as client:
+            for size in SIZES:
+                seed(1, size)
+                rows = [server.to_out(r, None) for r in db.list_memories(1)]
+                projected = db.list_memories(1, fields=GALAXY_FIELDS)
+
+                legacy_ms, legacy = timed(lambda: json.dumps(adapter.dump_python(adapter.validate_python(rows), mode="json")).encode())
+                fast_ms, fast = timed(lambda: orjson.dumps(rows))
+                proj_ms, proj = timed(lambda: orjson.dumps(projected))
+                print(f"{size:>7} rows encode: pydantic+json {legacy_ms:7.1f} ms ({len(legacy) / 2**20:5.1f} MiB)  "
+                      f"orjson {fast_ms:6.1f} ms  orjson+fields {proj_ms:6.1f} ms ({len(proj) / 2**20:5.1f} MiB)")
+
+                full_ms, _ = timed(lambda: client.get("/api/memories", params={"user_id": 1}))
+                galaxy_ms, _ = timed(lambda: client.get("/api/memories", params={"user_id": 1, "fields": ",".join(GALAXY_FIELDS)}))
+                print(f"{size:>7} rows GET:    full {full_ms:7.1f} ms  fields={','.join(GALAXY_FIELDS)} {galaxy_ms:7.1f} ms")
+        db.close_pool()
@@ -0,0 +1,67 @@
+# test/bench_upload.py
+# Peak RSS while N uploads are ingested concurrently: the old path (read the
+# whole upload into bytes, then write it) versus streaming straight from the
+# file with stage_upload. Each variant runs in its own process so one run's
+# high-water mark can't hide another's.
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage
+
+UPLOAD_MB = int(os.getenv("BENCH_UPLOAD_MB", "100"))
+CONCURRENCY = [int(n) for n in os.getenv("BENCH_CONCURRENCY", "1,4,8").split(",")]
+# ru_maxrss is in KiB on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def buffered(user_id, path):
+    with open(path, "rb") as source:
+        content = source.read()
+    storage.discard_staged(storage.stage_upload(user_id, io.BytesIO(content), "clip.mp4"))
+
+
+def streamed(user_id, path):
+    with open(path, "rb") as source:
+        storage.discard_staged(storage.stage_upload(user_id, source, "clip.mp4"))
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+def run(label, path, n):
+    """Runs one variant in this process and prints its peak RSS over the post-import baseline."""
+    fn = {"buffered": buffered, "streamed": streamed}[label]
+    baseline = peak_rss()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=fn, args=(i, path)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    peak = peak_rss() - baseline
+    print(f"{label:>8} x{n}: peak RSS +{peak / 2**20:8.1f} MiB ({peak / n / 2**20:7.1f} MiB/upload)  "
+          f"{n * UPLOAD_MB / elapsed:7.0f} MB/s", flush=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        run(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+        sys.exit()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "MEDIA_ROOT": os.path.join(tmp, "uploads")}
+        source = os.path.join(tmp, "source.mp4")
+        with open(source, "wb") as f:
+            for _ in range(UPLOAD_MB):
+                f.write(os.urandom(1024 * 1024))
+        for n in CONCURRENCY:
+            for label in ("buffered", "streamed"):
+                subprocess.run([sys.executable, os.path.abspath(__file__), label, source, str(n)], env=env, check=True)
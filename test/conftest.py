@@ -0,0 +1,30 @@
+# test/conftest.py
+# Shared fixtures: each test gets its own SQLite database and media dir
+# under tmp_path, and app_client runs the FastAPI app against them.
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    """Points db.py at a fresh database and MEDIA_ROOT at tmp_path/media; yields the media dir."""
+    monkeypatch.setattr(db, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setenv("MEDIA_ROOT", str(tmp_path / "media"))
+    db.init_db()
+    yield tmp_path / "media"
+    db.close_pool()
+
+
+@pytest.fixture
+def app_client(tmp_db):
+    """TestClient for server.app, lifespan included, on the tmp_db database."""
+    import server
+    with TestClient(server.app) as client:
+        yield client
@@ -0,0 +1,105 @@
+# test/test_bulk.py
+# POST /api/memories/bulk: NDJSON in, media from an optional zip, per-line failures out.
+import io
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import db
+
+SAMPLE_IMAGE = os.path.join(ROOT, "uploads", "user_1", sorted(
+    n for n in os.listdir(os.path.join(ROOT, "uploads", "user_1")) if n.lower().endswith((".jpg", ".jpeg", ".png")))[0])
+
+
+@pytest.fixture
+def rule_backend(monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "rule")
+
+
+@pytest.fixture
+def client(rule_backend, app_client, tmp_db):
+    db.create_user("bulk@example.com", "Bulk", b"x")
+    return app_client, db.get_user_by_email("bulk@example.com")[0], tmp_db
+
+
+def ndjson(*items):
+    return "\n".join(i if isinstance(i, str) else json.dumps(i) for i in items).encode()
+
+
+def test_bulk_import_reports_failures_per_line(client):
+    c, user_id, _ = client
+    body = ndjson(
+        {"title": "So happy", "desc": "first"},
+        "{not json",
+        {"desc": "no title"},
+        "",
+        {"title": "Quiet beach", "emotion": "calm", "created_at": "2020-01-01T00:00:00"},
+    )
+    r = c.post("/api/memories/bulk", data={"user_id": user_id}, files={"items": ("items.ndjson", body)})
+    assert r.status_code == 200
+    result = r.json()
+    assert result["inserted"] == 2
+    assert result["failed"] == 2
+    assert [f["line"] for f in result["failures"]] == [2, 3]
+
+    memories = c.get("/api/memories", params={"user_id": user_id}).json()
+    assert [(m["title"], m["emotion"]) for m in memories] == [("So happy", "happy"), ("Quiet beach", "calm")]
+
+
+def test_bulk_import_normalizes_and_rejects_timestamps(client):
+    c, user_id, _ = client
+    body = ndjson(
+        {"title": "Old", "emotion": "calm", "created_at": "2020-01-01"},
+        {"title": "Vague", "emotion": "calm", "created_at": "last tuesday"},
+        {"title": "Zoned", "emotion": "calm", "created_at": "2021-06-01T12:00:00+02:00",
+         "unlock_at": "2030-01-01T00:00:00Z"},
+        {"title": "Bad unlock", "emotion": "calm", "unlock_at": "someday"},
+        {"title": "Now", "emotion": "calm"},
+    )
+    result = c.post("/api/memories/bulk", data={"user_id": user_id}, files={"items": ("items.ndjson", body)}).json()
+    assert result["inserted"] == 3
+    assert [(f["line"], f["error"]) for f in result["failures"]] == [
+        (2, "'created_at' must be an ISO 8601 timestamp."),
+        (4, "'unlock_at' must be an ISO 8601 timestamp."),
+    ]
+
+    memories = c.get("/api/memories", params={"user_id": user_id}).json()
+    assert [m["title"] for m in memories] == ["Now", "Zoned", "Old"]
+    assert [m["created_at"] for m in memories[1:]] == ["2021-06-01T10:00:00", "2020-01-01T00:00:00"]
+    assert memories[1]["unlock_at"] == "2030-01-01T00:00:00"
+
+
+def test_bulk_import_with_media_zip(client):
+    c, user_id, media_root = client
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.write(SAMPLE_IMAGE, "photos/a.jpg")
+        zf.write(SAMPLE_IMAGE, "photos/b.jpg")  # same bytes: stored once
+    body = ndjson(
+        {"title": "A", "media": "photos/a.jpg"},
+        {"title": "B", "media": "photos/b.jpg"},
+        {"title": "Missing", "media": "photos/nope.jpg"},
+    )
+    r = c.post("/api/memories/bulk", data={"user_id": user_id},
+               files={"items": ("items.ndjson", body), "media": ("media.zip", archive.getvalue())})
+    result = r.json()
+    assert result["inserted"] == 2
+    assert result["failures"][0]["line"] == 3
+
+    memories = c.get("/api/memories", params={"user_id": user_id}).json()
+    paths = {m["media_path"] for m in memories}
+    assert len(paths) == 1
+    assert os.path.isfile(media_root / paths.pop()[len("/media/"):])
+    assert not os.listdir(media_root / ".staging")
+
+
+def test_bulk_import_rejects_bad_zip(client):
+    c, user_id, _ = client
+    r = c.post("/api/memories/bulk", data={"user_id": user_id},
+               files={"items": ("items.ndjson", ndjson({"title": "x"})), "media": ("media.zip", b"not a zip")})
+    assert r.status_code == 400
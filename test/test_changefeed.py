@@ -0,0 +1,164 @@
+# test/test_changefeed.py
+# The memory change feed: fan-out, resume from a version, resync for slow
+# consumers and unseen writes, unlock events, and the SSE endpoint itself.
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import changefeed
+import db
+from changefeed import ChangeWatcher, LocalBroker
+
+
+@pytest.fixture
+def broker(tmp_db, monkeypatch):
+    broker = LocalBroker(history=4)
+    monkeypatch.setattr(changefeed, "_broker", broker)
+    return broker
+
+
+def drain(sub):
+    events = []
+    while sub.pending():
+        events.append(sub._queue.popleft())
+    return [(e.type, e.version) for e in events]
+
+
+def test_publish_fans_out_and_resumes(broker):
+    async def scenario():
+        a = broker.subscribe(1, current_version=0)
+        other_user = broker.subscribe(2, current_version=0)
+        for v in (1, 2, 3):
+            broker.publish(1, "insert", {"memory": {"id": v}}, v)
+        await asyncio.sleep(0)
+        assert drain(a) == [("insert", 1), ("insert", 2), ("insert", 3)]
+        assert drain(other_user) == []
+
+        # Reconnect after seeing version 1: versions 2 and 3 are replayed
+        resumed = broker.subscribe(1, current_version=3, since=1)
+        assert drain(resumed) == [("insert", 2), ("insert", 3)]
+        # Up to date: nothing to replay
+        assert drain(broker.subscribe(1, current_version=3, since=3)) == []
+
+        # History holds 4 events; resuming from before that means a resync
+        for v in (4, 5, 6):
+            broker.publish(1, "delete", {"ids": [v]}, v)
+        assert drain(broker.subscribe(1, current_version=6, since=1)) == [("resync", 6)]
+        assert drain(broker.subscribe(1, current_version=6, since=2)) == [("insert", 3), ("delete", 4), ("delete", 5), ("delete", 6)]
+    asyncio.run(scenario())
+
+
+def test_unpublished_writes_trigger_resync(broker):
+    async def scenario():
+        sub = broker.subscribe(1, current_version=0)
+        broker.publish(1, "insert", {}, 1)
+        # Version 2 was written somewhere else; the event for 3 can't be trusted on its own
+        broker.publish(1, "insert", {}, 3)
+        await asyncio.sleep(0)
+        assert drain(sub) == [("insert", 1), ("resync", 3)]
+
+        broker.observe(1, 3)
+        broker.observe(1, 5)
+        await asyncio.sleep(0)
+        assert drain(sub) == [("resync", 5)]
+        # A multi-row write covers its own range
+        broker.publish(1, "delete", {"ids": [1, 2]}, 7, changes=2)
+        await asyncio.sleep(0)
+        assert drain(sub) == [("delete", 7)]
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_gets_one_resync(broker, monkeypatch):
+    async def scenario():
+        sub = changefeed.Subscription(1, 0, maxsize=10)
+        broker._feed(1, 0).subscribers.add(sub)
+        for v in range(1, 26):
+            broker.publish(1, "insert", {}, v)
+        await asyncio.sleep(0)
+        # Bounded: the backlog collapsed into a resync at the version it had reached
+        assert sub.pending() <= 10
+        assert drain(sub) == [("resync", 21)] + [("insert", v) for v in range(22, 26)]
+        broker.unsubscribe(sub)
+        assert broker.stats()["subscribers"] == 0
+    asyncio.run(scenario())
+
+
+def test_watcher_publishes_unlocks_and_outside_writes(broker):
+    now = datetime.now(timezone.utc)
+    soon = (now + timedelta(seconds=30)).isoformat()
+    later = (now + timedelta(days=1)).isoformat()
+    first = db.insert_memory(1, "soon", "", "calm", soon, None, None, None)
+    db.insert_memory(1, "later", "", "calm", later, None, None, None)
+    watcher = ChangeWatcher()
+
+    async def scenario():
+        sub = broker.subscribe(1, current_version=db.get_memory_version(1))
+        assert watcher.run_once(now.timestamp()) == 0
+        assert watcher.run_once((now + timedelta(seconds=31)).timestamp()) == 1
+        await asyncio.sleep(0)
+        event = sub._queue.popleft()
+        assert (event.type, event.version, event.data) == ("unlock", None, {"ids": [first]})
+        assert watcher.run_once((now + timedelta(seconds=32)).timestamp()) == 0
+
+        # A write this process never published (e.g. from a Streamlit page)
+        db.insert_memory(1, "elsewhere", "", "calm", None, None, None, None)
+        watcher.run_once((now + timedelta(seconds=33)).timestamp())
+        await asyncio.sleep(0)
+        assert drain(sub) == [("resync", 3)]
+    asyncio.run(scenario())
+
+
+async def read_sse(app, query, headers=(), frames=2):
+    """Drives the ASGI app until `frames` SSE frames arrived, then disconnects."""
+    received = []
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received.append(dict(message["headers"]))
+        elif message.get("body"):
+            received.extend(f for f in message["body"].decode().split("\n\n") if f)
+            if len(received) > frames:
+                done.set()
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": "/api/memories/stream", "raw_path": b"/api/memories/stream",
+             "query_string": query.encode(), "root_path": "", "client": ("test", 1), "server": ("testserver", 80),
+             "headers": [(b"host", b"testserver")] + [(k.encode(), v.encode()) for k, v in headers]}
+    task = asyncio.create_task(app(scope, receive, send))
+    while len(received) <= frames:
+        await asyncio.sleep(0.01)
+    done.set()
+    await asyncio.wait_for(task, 5)
+    return received[0], received[1:]
+
+
+def test_stream_endpoint_resumes_from_last_event_id(broker, monkeypatch):
+    import async_db
+    import server
+    monkeypatch.setenv("MEDIA_ROOT", os.path.join(db.DB_DIR, "media"))
+
+    async def scenario():
+        for i in range(3):
+            await async_db.insert_memory(user_id=1, title=f"m{i}", desc="", emotion="calm", unlock_at_iso=None,
+                                         media_path=None, media_type=None, model_path=None)
+            broker.publish(1, "insert", {"memory": {"title": f"m{i}"}}, await async_db.get_memory_version(1))
+
+        headers, frames = await read_sse(server.app, "user_id=1", [("last-event-id", "1")], frames=3)
+        assert headers[b"content-type"].startswith(b"text/event-stream")
+        assert b"content-encoding" not in headers
+        assert frames[0].startswith("id: 3\nevent: ready")
+        assert [f.split("\n")[:2] for f in frames[1:]] == [["id: 2", "event: insert"], ["id: 3", "event: insert"]]
+        assert broker.stats()["subscribers"] == 0
+    try:
+        asyncio.run(scenario())
+    finally:
+        async_db.shutdown()
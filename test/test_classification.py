@@ -0,0 +1,136 @@
+# test/test_classification.py
+# Model-backed classification runs off the upload path: POST /api/memories
+# returns with a provisional label while a slow stub backend is still working.
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import emotions
+
+STUB_DELAY = 1.0
+
+
+class SlowStubModel:
+    def predict_many(self, texts):
+        time.sleep(STUB_DELAY)
+        return ["proud"] * len(texts)
+
+
+@pytest.fixture
+def slow_backend(tmp_db, monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "slow-stub")
+    emotions.register_backend("slow-stub", SlowStubModel, lambda m, t: m.predict_many([t])[0],
+                              lambda m, texts: m.predict_many(texts))
+    from classification import worker
+    monkeypatch.setattr(worker, "poll_seconds", 0.05)
+    yield
+    emotions._BACKENDS.pop("slow-stub", None)
+    emotions._models.pop("slow-stub", None)
+
+
+@pytest.fixture
+def client(slow_backend, app_client):
+    return app_client
+
+
+def test_post_returns_before_slow_classification_finishes(client):
+    ok, _ = db.create_user("stub@example.com", "Stub", b"x")
+    assert ok
+    user_id = db.get_user_by_email("stub@example.com")[0]
+
+    start = time.perf_counter()
+    r = client.post("/api/memories", data={"user_id": user_id, "title": "So happy today"})
+    elapsed = time.perf_counter() - start
+    assert r.status_code == 201
+    assert elapsed < STUB_DELAY / 2
+    created = r.json()
+    assert created["classification_status"] == "pending"
+    assert created["emotion"] == "happy"  # provisional rule-based label
+
+    deadline = time.time() + 10 * STUB_DELAY
+    while time.time() < deadline:
+        memory = client.get("/api/memories", params={"user_id": user_id}).json()[0]
+        if memory["classification_status"] == "done":
+            break
+        time.sleep(0.05)
+    assert memory["classification_status"] == "done"
+    assert memory["emotion"] == "proud"
+
+
+def test_explicit_emotion_skips_the_queue(client):
+    db.create_user("stub2@example.com", "Stub", b"x")
+    user_id = db.get_user_by_email("stub2@example.com")[0]
+    r = client.post("/api/memories", data={"user_id": user_id, "title": "x", "emotion": "calm"})
+    assert r.status_code == 201
+    assert r.json()["classification_status"] == "done"
+    assert db.list_pending_classifications(10) == []
+
+
+class FlakyModel:
+    """Fails every batch until `healthy` is set."""
+    healthy = False
+
+    def predict_many(self, texts):
+        if not FlakyModel.healthy:
+            raise RuntimeError("backend down")
+        return ["proud"] * len(texts)
+
+
+@pytest.fixture
+def flaky_backend(tmp_db, monkeypatch):
+    FlakyModel.healthy = False
+    monkeypatch.setenv("EMOTION_BACKEND", "flaky-stub")
+    emotions.register_backend("flaky-stub", FlakyModel, lambda m, t: m.predict_many([t])[0],
+                              lambda m, texts: m.predict_many(texts))
+    emotions.result_cache.clear()
+    yield
+    emotions._BACKENDS.pop("flaky-stub", None)
+    emotions._models.pop("flaky-stub", None)
+
+
+def statuses():
+    with db.get_conn() as conn:
+        return conn.execute("SELECT title, emotion, classification_status FROM memories ORDER BY id").fetchall()
+
+
+def test_failed_batches_stay_pending_and_retry_with_backoff(flaky_backend, monkeypatch):
+    from classification import ClassificationWorker
+    for title in ("So happy today", "A quiet beach"):
+        db.insert_memory(1, title, "", emotions.classify_rule_based(title), None, None, None, None,
+                         classification_status="pending")
+    worker = ClassificationWorker(batch_size=10)
+
+    assert worker.run_once() == 2
+    assert statuses() == [("So happy today", "happy", "pending"), ("A quiet beach", "calm", "pending")]
+    assert worker.run_once() == 0  # backing off, not due yet
+
+    FlakyModel.healthy = True
+    monkeypatch.setattr(db.time, "time", lambda: 1e12)
+    assert worker.run_once() == 2
+    assert statuses() == [("So happy today", "proud", "done"), ("A quiet beach", "proud", "done")]
+    with db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM classification_retries").fetchone()[0] == 0
+
+
+def test_backend_that_never_loads_ends_in_fallback(flaky_backend, monkeypatch):
+    from classification import ClassificationWorker
+    def broken_loader():
+        raise RuntimeError("no weights")
+    emotions.register_backend("flaky-stub", broken_loader, lambda m, t: t)
+    monkeypatch.setattr(db, "CLASSIFY_MAX_ATTEMPTS", 3)
+    db.insert_memory(1, "So happy today", "", "happy", None, None, None, None, classification_status="pending")
+    worker = ClassificationWorker(batch_size=10)
+
+    clock = [1e9]
+    monkeypatch.setattr(db.time, "time", lambda: clock[0])
+    for _ in range(2):
+        assert worker.run_once() == 1
+        assert statuses() == [("So happy today", "happy", "pending")]
+        clock[0] += 1e6
+    assert worker.run_once() == 1
+    assert statuses() == [("So happy today", "happy", "fallback")]
+    assert db.list_pending_classifications(10) == []
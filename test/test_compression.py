@@ -0,0 +1,82 @@
+# test/test_compression.py
+# Negotiated compression: encodings, size threshold, media pass-through, streaming.
+import gzip
+import json
+import os
+import sys
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import compression
+from compression import CompressionMiddleware, negotiate
+
+ROWS = [{"id": i, "title": f"memory {i}", "emotion": "calm", "media_path": f"/media/user_1/{i}.jpg"} for i in range(500)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/rows")
+    def rows():
+        return JSONResponse(ROWS, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"ok": True})
+
+    @app.get("/image")
+    def image():
+        return Response(b"\xff\xd8" + b"x" * 5000, media_type="image/jpeg")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((json.dumps(r).encode() + b"\n" for r in ROWS), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_negotiate_prefers_best_available():
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("gzip, deflate, br, zstd") == next(iter(compression.ENCODERS))
+    assert negotiate("gzip;q=1, br;q=0.5, zstd;q=0") == "gzip"
+    assert negotiate("identity") is None
+    assert negotiate("*;q=0") is None
+    assert negotiate("") is None
+
+
+@pytest.mark.parametrize("encoding", list(compression.ENCODERS))
+def test_json_is_compressed(client, encoding):
+    r = client.get("/rows", headers={"Accept-Encoding": encoding})
+    assert r.headers["content-encoding"] == encoding
+    assert int(r.headers["content-length"]) < len(json.dumps(ROWS)) / 4
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.headers["etag"] == 'W/"v1"'
+    assert r.json() == ROWS
+
+
+def test_small_and_media_bodies_pass_through(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert "Accept-Encoding" in small.headers["vary"]
+    image = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in image.headers
+    assert "vary" not in image.headers
+
+
+def test_streaming_is_compressed_per_chunk(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        assert "content-length" not in r.headers
+        raw = b"".join(r.iter_raw())
+    assert gzip.decompress(raw).decode().splitlines()[-1] == json.dumps(ROWS[-1])
+
+    # Every chunk is flushed, so a prefix of the stream already decodes to whole rows
+    first = zlib.decompressobj(31).decompress(raw[: len(raw) // 2])
+    assert first.startswith(json.dumps(ROWS[0]).encode())
@@ -0,0 +1,35 @@
+# test/test_db_pool.py
+# A pool with no connection to spare raises PoolExhausted after the busy
+# timeout, and the API answers it with a 503 rather than an opaque 500.
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+
+def test_exhausted_pool_raises_named_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_BUSY_TIMEOUT_MS", 50)
+    pool = db.ConnectionPool(str(tmp_path / "pool.db"), size=1)
+    held = pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(db.PoolExhausted, match="pool exhausted"):
+        pool.acquire()
+    assert time.monotonic() - start < 1
+    pool.release(held)
+    pool.release(pool.acquire())
+    pool.close()
+
+
+def test_api_answers_503_when_pool_is_exhausted(app_client, monkeypatch):
+    def exhausted(self):
+        raise db.PoolExhausted("database connection pool exhausted")
+    acquire = db.ConnectionPool.acquire
+    monkeypatch.setattr(db.ConnectionPool, "acquire", exhausted)
+    response = app_client.get("/api/memories", params={"user_id": 1})
+    monkeypatch.setattr(db.ConnectionPool, "acquire", acquire)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
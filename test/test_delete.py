@@ -0,0 +1,158 @@
+# test/test_delete.py
+# Chunked deletes tombstone unreferenced media; the reaper removes the files later.
+import io
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import db
+import storage
+from reaper import MediaReaper
+
+
+@pytest.fixture
+def media_root(tmp_db, monkeypatch):
+    monkeypatch.setattr(db, "DELETE_CHUNK_SIZE", 3)
+    return tmp_db
+
+
+def add_memory(title, content=None):
+    saved = storage.stage_upload(1, io.BytesIO(content), "clip.mp4") if content else None
+    return db.insert_memory(1, title, "", "calm", None,
+                            saved.path if saved else None, saved.media_type if saved else None, None,
+                            media_sha256=saved.sha256 if saved else None, media_size=saved.size if saved else None,
+                            staged_path=saved.staged_path if saved else None)
+
+
+def media_file(media_root, memory_id):
+    return media_root / db.get_memory_media(memory_id)[0]
+
+
+def test_delete_spans_chunks_and_defers_file_removal(media_root):
+    ids = [add_memory(f"m{i}", f"clip {i}".encode()) for i in range(10)]
+    files = [media_file(media_root, i) for i in ids]
+
+    assert sorted(db.delete_memories(1, ids[:8] + [999])) == ids[:8]
+    assert len(db.list_memories(1)) == 2
+    assert all(f.exists() for f in files)  # only tombstoned so far
+    assert db.count_tombstones() == 8
+
+    assert MediaReaper().run_once() == 8
+    assert [f.exists() for f in files] == [False] * 8 + [True] * 2
+    assert db.count_tombstones() == 0
+
+
+def test_shared_file_survives_until_last_reference(media_root):
+    first, second = add_memory("a", b"same"), add_memory("b", b"same")
+    path = media_file(media_root, first)
+    db.delete_memories(1, [first])
+    assert db.count_tombstones() == 0
+    db.delete_memories(1, [second])
+    MediaReaper().run_once()
+    assert not path.exists()
+
+
+def test_refcount_follows_references_and_tombstones_at_zero(media_root):
+    def refcounts():
+        with db.get_conn() as conn:
+            return dict(conn.execute("SELECT path, refcount FROM media_blobs").fetchall())
+
+    first, second = add_memory("a", b"counted"), add_memory("b", b"counted")
+    path = db.get_memory_media(first)[0]
+    assert db.get_memory_media(second)[0] == path
+    assert refcounts() == {path: 2}
+    assert os.listdir(media_root / ".staging") == []  # the duplicate upload was dropped
+
+    db.delete_memories(1, [first])
+    assert refcounts() == {path: 1} and db.count_tombstones() == 0
+    db.delete_memories(1, [second])
+    assert refcounts() == {} and db.count_tombstones() == 1
+
+
+def test_reupload_before_reap_keeps_file(media_root):
+    memory_id = add_memory("a", b"comes back")
+    path = media_file(media_root, memory_id)
+    db.delete_memories(1, [memory_id])
+    add_memory("again", b"comes back")
+    assert db.count_tombstones() == 0
+    MediaReaper().run_once()
+    assert path.exists()
+
+
+def test_failed_claim_is_retried_later(media_root, monkeypatch):
+    memory_id = add_memory("a", b"stubborn")
+    path = media_file(media_root, memory_id)
+    db.delete_memories(1, [memory_id])
+
+    real_replace = os.replace
+    def failing_replace(src, dst):
+        raise PermissionError("locked")
+    monkeypatch.setattr(os, "replace", failing_replace)
+    assert MediaReaper().run_once() == 0
+    assert db.count_tombstones() == 1
+    assert MediaReaper().run_once() == 0  # backing off, not due yet
+
+    monkeypatch.setattr(os, "replace", real_replace)
+    monkeypatch.setattr(db.time, "time", lambda: 1e12)
+    assert MediaReaper().run_once() == 1
+    assert not path.exists()
+
+
+def test_files_are_unlinked_outside_the_write_lock(media_root, monkeypatch):
+    memory_id = add_memory("a", b"big file")
+    db.delete_memories(1, [memory_id])
+
+    writable, real_remove = [], os.remove
+    def remove_while_writing(p):
+        # Another writer can take the lock while the reaper is unlinking
+        with db.get_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            writable.append(True)
+        if not writable[1:]:
+            raise PermissionError("locked")  # first try fails: the file waits in the trash
+        real_remove(p)
+    monkeypatch.setattr(os, "remove", remove_while_writing)
+    monkeypatch.setattr(db, "DB_BUSY_TIMEOUT_MS", 100)
+
+    assert MediaReaper().run_once() == 1
+    assert db.count_tombstones() == 0 and len(os.listdir(media_root / ".trash")) == 1
+    assert MediaReaper().run_once() == 0
+    assert writable == [True, True] and os.listdir(media_root / ".trash") == []
+
+
+def test_insert_retried_after_the_staged_move(media_root, monkeypatch):
+    retain, calls = db._retain_media, []
+    def busy_once(*args):
+        retain(*args)
+        calls.append(args)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(db, "_retain_media", busy_once)
+    monkeypatch.setattr(db, "DB_RETRY_BACKOFF", 0)
+
+    memory_id = add_memory("a", b"moved once")
+    assert len(calls) == 2 and media_file(media_root, memory_id).exists()
+    with db.get_conn() as conn:
+        assert conn.execute("SELECT refcount FROM media_blobs").fetchall() == [(1,)]
+
+
+def test_delete_route_publishes_only_the_deleted_ids(app_client, monkeypatch):
+    import changefeed
+    published = []
+    broker = changefeed.get_broker()
+    monkeypatch.setattr(broker, "publish", lambda user_id, event_type, data, version=None, changes=1:
+                        published.append((user_id, event_type, data, changes)))
+    mine = add_memory("mine")
+    theirs = db.insert_memory(2, "theirs", "", "calm", None, None, None, None)
+
+    r = app_client.post("/api/memories/delete", json={"user_id": 1, "memory_ids": [mine, theirs, 999999]})
+    assert r.status_code == 204
+    assert published == [(1, "delete", {"ids": [mine]}, 1)]
+    assert db.get_memory(theirs, 2) is not None
+
+    app_client.post("/api/memories/delete", json={"user_id": 1, "memory_ids": [theirs]})
+    assert len(published) == 1
@@ -0,0 +1,122 @@
+# test/test_derivatives.py
+# Thumbnail and medium copies of image uploads: generation, concurrent jobs
+# for the same blob, Accept-based lookup, and GET /media/{id}/{size}.
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import storage
+
+
+def stored_image(user_id=1, size=(1600, 900)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buf, format="JPEG")
+    saved = storage.stage_upload(user_id, io.BytesIO(buf.getvalue()), "photo.jpg")
+    memory_id = db.insert_memory(user_id, "photo", "", "happy", None, saved.path, saved.media_type, None,
+                                 media_sha256=saved.sha256, media_size=saved.size, staged_path=saved.staged_path)
+    return memory_id, saved.path
+
+
+def leftover_parts(media_root):
+    return [name for _, _, names in os.walk(media_root) for name in names if name.endswith(".part")]
+
+
+def test_generate_writes_every_size_and_format_once(tmp_db):
+    _, path = stored_image()
+    created = storage.generate_derivatives(path)
+    assert sorted(created) == sorted(storage.derivative_paths(path))
+    for rel in created:
+        with Image.open(tmp_db / rel) as img:
+            edge = storage.DERIVATIVE_SIZES[rel.split(".")[-2]]
+            assert max(img.size) == edge
+            assert img.format.lower() == rel.rsplit(".", 1)[1]
+    assert storage.generate_derivatives(path) == []
+    assert leftover_parts(tmp_db) == []
+
+
+def test_concurrent_jobs_for_one_blob_do_not_collide(tmp_db):
+    _, path = stored_image()
+    start = threading.Barrier(8)
+
+    def generate():
+        start.wait()
+        return storage.generate_derivatives(path)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = [f.result() for f in [pool.submit(generate) for _ in range(8)]]
+    assert {rel for created in results for rel in created} == set(storage.derivative_paths(path))
+    for rel in storage.derivative_paths(path):
+        with Image.open(tmp_db / rel) as img:
+            img.verify()
+    assert leftover_parts(tmp_db) == []
+
+
+def test_schedule_shares_the_job_of_a_path_in_flight(tmp_db, monkeypatch):
+    release, calls = threading.Event(), []
+    monkeypatch.setattr(storage, "generate_derivatives", lambda path: calls.append(path) or release.wait(5))
+    try:
+        first = storage.schedule_derivatives("user_1/ab/a.jpg", "image")
+        assert storage.schedule_derivatives("user_1/ab/a.jpg", "image") is first
+        other = storage.schedule_derivatives("user_1/cd/c.jpg", "image")
+        assert other is not first
+        assert storage.schedule_derivatives("user_1/ab/a.jpg", "video") is None
+    finally:
+        release.set()
+    first.result(5)
+    other.result(5)
+    again = storage.schedule_derivatives("user_1/ab/a.jpg", "image")
+    again.result(5)
+    assert again is not first
+    assert sorted(calls) == ["user_1/ab/a.jpg", "user_1/ab/a.jpg", "user_1/cd/c.jpg"]
+
+
+def test_find_derivative_follows_accept(tmp_db):
+    _, path = stored_image()
+    assert storage.find_derivative(path, "thumb", "image/avif,image/webp") is None
+    storage.generate_derivatives(path)
+    webp = storage.derivative_path(path, "thumb", "webp")
+    assert storage.find_derivative(path, "thumb", "") == webp
+    assert storage.find_derivative(path, "thumb", "image/webp,*/*") == webp
+    if "avif" in storage.DERIVATIVE_FORMATS:
+        assert storage.find_derivative(path, "thumb", "image/avif,image/webp") == \
+            storage.derivative_path(path, "thumb", "avif")
+    assert storage.find_derivative(path, "huge", "") is None
+
+
+@pytest.fixture
+def media_client(app_client, tmp_db, monkeypatch):
+    import server
+    monkeypatch.setattr(server, "MEDIA_ROOT", str(tmp_db))
+    return app_client
+
+
+def test_media_route_serves_original_until_thumbnail_exists(media_client, tmp_db):
+    memory_id, path = stored_image()
+    r = media_client.get(f"/media/{memory_id}/thumb")
+    assert r.status_code == 200
+    assert r.content == (tmp_db / path).read_bytes()
+    assert r.headers["vary"] == "Accept"
+
+    storage.generate_derivatives(path)
+    r = media_client.get(f"/media/{memory_id}/thumb", headers={"Accept": "image/webp"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert r.content == (tmp_db / storage.derivative_path(path, "thumb", "webp")).read_bytes()
+
+    r = media_client.get(f"/media/{memory_id}/original", headers={"Accept": "image/webp"})
+    assert r.content == (tmp_db / path).read_bytes()
+
+
+def test_media_route_404s(media_client):
+    memory_id, _ = stored_image()
+    bare_id = db.insert_memory(1, "no media", "", "calm", None, None, None, None)
+    assert media_client.get(f"/media/{memory_id}/huge").status_code == 404
+    assert media_client.get(f"/media/{bare_id}/thumb").status_code == 404
+    assert media_client.get("/media/999999/thumb").status_code == 404
@@ -0,0 +1,56 @@
+# test/test_emotion_rules.py
+# The precompiled rule engine: per-label keyword counts, whole-word and
+# phrase matching, and the label chosen when several rules hit.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from emotions import DEFAULT_EMOTION, RULES, classify_rule_based, score_rule_based
+
+
+@pytest.mark.parametrize("text, scores", [
+    ("", {}),
+    ("we walked home", {}),
+    ("So happy, HAPPY day", {"happy": 2}),
+    ("joy and delight", {"happy": 2}),
+    ("I love the beach", {"romantic": 1, "calm": 1}),
+    ("love, beach and calm", {"romantic": 1, "calm": 2}),
+    # Whole words only, as the old \b...\b patterns matched
+    ("smiled while kissing, unhappy", {}),
+    ("school-trip_photo", {"nostalgic": 1}),
+    # Phrases, including the curly apostrophe in "can’t wait"
+    ("good old times at school", {"nostalgic": 2}),
+    ("old  times", {}),
+    ("can’t wait to win", {"excited": 2}),
+    ("can't wait", {}),
+    ("proud award, happy joy", {"proud": 2, "happy": 2}),
+    ("mad mad sad sad", {"angry": 2, "sad": 2}),
+])
+def test_scores_count_hits_per_label(text, scores):
+    assert score_rule_based(text) == scores
+
+
+@pytest.mark.parametrize("text, label", [
+    ("", DEFAULT_EMOTION),
+    ("we walked home", DEFAULT_EMOTION),
+    ("quiet beach", "calm"),
+    # Most hits wins...
+    ("love, beach and calm", "calm"),
+    ("one award, and so proud to rank", "proud"),
+    # ...and ties go to the rule listed first in RULES
+    ("I love the beach", "romantic"),
+    ("proud award, happy joy", "happy"),
+    ("mad mad sad sad", "sad"),
+    ("win the award", "excited"),
+    ("remember the rage", "angry"),
+])
+def test_label_is_most_hits_then_rule_order(text, label):
+    assert classify_rule_based(text) == label
+
+
+@pytest.mark.parametrize("label, keywords", RULES)
+def test_every_keyword_selects_its_label(label, keywords):
+    for keyword in keywords:
+        assert classify_rule_based(f"That was {keyword.upper()}!") == label
@@ -0,0 +1,166 @@
+# test/test_emotions.py
+# Emotion backends are loaded once per process, using a local stub model.
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import emotions
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_db):
+    # Cached labels would otherwise leak between tests (and runs) through the shared database
+    emotions.result_cache.clear()
+    yield
+    emotions.result_cache.clear()
+
+
+class StubModel:
+    constructed = 0
+
+    def __init__(self):
+        StubModel.constructed += 1
+        time.sleep(0.05)  # a slow load widens the window for a double construction
+
+    def predict(self, text):
+        return "proud" if "award" in text else "calm"
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    StubModel.constructed = 0
+    emotions.register_backend("stub", StubModel, lambda model, text: model.predict(text))
+    monkeypatch.setenv("EMOTION_BACKEND", "stub")
+    yield
+    emotions._BACKENDS.pop("stub", None)
+    emotions._models.pop("stub", None)
+
+
+def test_model_constructed_once_across_calls(stub_backend):
+    for _ in range(50):
+        assert emotions.classify("won an award") == ("proud", emotions.PLANT_BY_EMOTION["proud"])
+    assert StubModel.constructed == 1
+
+
+def test_model_constructed_once_across_threads(stub_backend):
+    start = threading.Barrier(16)
+
+    def call(_):
+        start.wait()
+        return emotions.classify("a quiet day")[0]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        labels = list(pool.map(call, range(16)))
+    assert labels == ["calm"] * 16
+    assert StubModel.constructed == 1
+
+
+def test_warm_up_loads_configured_backend(stub_backend):
+    emotions.warm_up()
+    assert StubModel.constructed == 1
+    emotions.classify("anything")
+    assert StubModel.constructed == 1
+
+
+def test_failed_load_falls_back_to_rules_without_retrying(monkeypatch):
+    attempts = []
+
+    def broken_loader():
+        attempts.append(1)
+        raise RuntimeError("no model here")
+
+    emotions.register_backend("broken", broken_loader, lambda model, text: "angry")
+    monkeypatch.setenv("EMOTION_BACKEND", "broken")
+    try:
+        for _ in range(5):
+            assert emotions.classify("so happy today")[0] == "happy"
+        assert len(attempts) == 1
+    finally:
+        emotions._BACKENDS.pop("broken", None)
+        emotions._models.pop("broken", None)
+
+
+class StubBatchModel:
+    def __init__(self):
+        self.calls = []
+
+    def predict_many(self, texts):
+        self.calls.append(len(texts))
+        return ["proud" if "award" in t else "calm" for t in texts]
+
+
+def test_classify_many_batches_model_calls(monkeypatch):
+    model = StubBatchModel()
+    emotions.register_backend("stub-batch", lambda: model, lambda m, t: m.predict_many([t])[0],
+                              lambda m, texts: m.predict_many(texts))
+    monkeypatch.setenv("EMOTION_BACKEND", "stub-batch")
+    try:
+        texts = [f"award {i}" for i in range(5)] + [f"walk {i}" for i in range(5)]
+        results = emotions.classify_many(texts, batch_size=4)
+        assert [label for label, _ in results] == ["proud"] * 5 + ["calm"] * 5
+        assert model.calls == [4, 4, 2]
+    finally:
+        emotions._BACKENDS.pop("stub-batch", None)
+        emotions._models.pop("stub-batch", None)
+
+
+def test_classify_many_rule_based_matches_classify(monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "rule")
+    texts = ["so happy", "missing home, lonely", None, "remember old times at school"]
+    assert emotions.classify_many(texts) == [emotions.classify(t) for t in texts]
+
+
+class CountingModel:
+    def __init__(self, label):
+        self.label = label
+        self.seen = []
+
+    def predict_many(self, texts):
+        self.seen.extend(texts)
+        return [self.label] * len(texts)
+
+
+@pytest.fixture
+def counting_backends(monkeypatch):
+    models = {"count-a": CountingModel("proud"), "count-b": CountingModel("sad")}
+    for name, model in models.items():
+        emotions.register_backend(name, lambda model=model: model, lambda m, t: m.predict_many([t])[0],
+                                  lambda m, texts: m.predict_many(texts))
+    yield models
+    for name in models:
+        emotions._BACKENDS.pop(name, None)
+        emotions._models.pop(name, None)
+
+
+def test_duplicate_texts_are_classified_once(counting_backends, monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "count-a")
+    texts = ["Beach day!", "beach   DAY!", "Beach day!", "new job"]
+    assert [label for label, _ in emotions.classify_many(texts)] == ["proud"] * 4
+    assert counting_backends["count-a"].seen == ["Beach day!", "new job"]
+
+    emotions.classify("BEACH DAY!")
+    assert counting_backends["count-a"].seen == ["Beach day!", "new job"]
+    stats = emotions.result_cache.stats()
+    assert stats["misses"] == 2 and stats["memory_hits"] == 1
+
+
+def test_cache_is_namespaced_by_backend(counting_backends, monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "count-a")
+    assert emotions.classify("a quiet day")[0] == "proud"
+    monkeypatch.setenv("EMOTION_BACKEND", "count-b")
+    assert emotions.classify("a quiet day")[0] == "sad"
+    assert counting_backends["count-b"].seen == ["a quiet day"]
+
+
+def test_labels_persist_across_processes(counting_backends, monkeypatch):
+    monkeypatch.setenv("EMOTION_BACKEND", "count-a")
+    emotions.classify("graduation")
+    emotions.result_cache.clear()  # as if the process restarted
+    assert emotions.classify("graduation")[0] == "proud"
+    assert counting_backends["count-a"].seen == ["graduation"]
+    assert emotions.result_cache.stats()["db_hits"] == 1
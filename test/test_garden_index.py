@@ -0,0 +1,40 @@
+# test/test_garden_index.py
+# GardenIndex radius queries agree with a scan of every object, and the
+# index is built once per layout.
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from garden_hybrid import GardenHybrid
+from garden_spatial import GardenIndex
+
+
+def test_radius_queries_and_lookups_match_a_full_scan():
+    rng = random.Random(3)
+    flowers = [{"id": f"flower_{i}", "x": rng.uniform(0, 100), "y": rng.uniform(0, 80), "has_memory": True}
+               for i in range(2000)]
+    buds = [{"id": f"empty_bud_{i}", "x": rng.uniform(0, 100), "y": rng.uniform(0, 80), "has_memory": False}
+            for i in range(500)]
+    index = GardenIndex(flowers, buds)
+
+    for _ in range(200):
+        x, y, radius = rng.uniform(-20, 120), rng.uniform(-20, 100), rng.choice([0.5, 5, 15, 40])
+        expected = sorted((math.hypot(o["x"] - x, o["y"] - y), o["id"]) for o in flowers + buds
+                          if math.hypot(o["x"] - x, o["y"] - y) <= radius)
+        found = index.within(x, y, radius)
+        assert [obj["id"] for obj, _ in found] == [obj_id for _, obj_id in expected]
+        assert all(abs(d - e) < 1e-9 for (_, d), (e, _) in zip(found, expected))
+
+    assert index.get("empty_bud_7") is buds[7] and index.get("flower_1999") is flowers[1999]
+    assert index.get("flower_missing") is None
+    assert GardenIndex([], []).within(50, 40, 15) == []
+
+
+def test_index_is_built_once_per_layout():
+    garden = GardenHybrid()
+    flowers, buds = garden.generate_garden_layout([{"id": i, "emotion": "calm"} for i in range(50)])
+    index = garden.layout_index(flowers, buds)
+    assert garden.layout_index(flowers, buds) is index
+    assert garden.layout_index(list(flowers), buds) is not index
@@ -0,0 +1,37 @@
+# test/test_garden_layers.py
+# The batched garden figure draws the same points as the per-flower one,
+# in one trace per layer, and every flower and bud stays clickable by id.
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from garden_hybrid import GardenHybrid
+
+
+def clickable_ids(fig):
+    return sorted(str(row[0]) for trace in fig.data if trace.customdata is not None for row in trace.customdata)
+
+
+def point_count(fig):
+    return sum(int(np.sum(~np.isnan(np.asarray(trace.x, dtype=float)))) for trace in fig.data)
+
+
+def test_batched_figure_matches_per_flower_figure():
+    garden = GardenHybrid()
+    memories = [{"id": i, "title": f"m{i}", "emotion": emotion}
+                for i, emotion in enumerate(["happy", "sad", "calm", "proud", "mystery"] * 6)]
+    flowers, buds = garden.generate_garden_layout(memories)
+    flowers[0]["bloomed"] = True
+
+    per_flower = garden.create_hybrid_garden_visualization(flowers, buds, batched=False)
+    batched = garden.create_hybrid_garden_visualization(flowers, buds)
+
+    assert len(batched.data) < 25 < len(per_flower.data)
+    assert clickable_ids(batched) == clickable_ids(per_flower)
+    assert clickable_ids(batched) == sorted(f["id"] for f in flowers + buds)
+    assert point_count(batched) == point_count(per_flower)
+    # Hover text survives batching
+    hover = [t for t in batched.data if t.name == "Memories"][0]
+    assert flowers[1]["title"] + "</b>" in hover.hovertext[list(hover.customdata[:, 0]).index(flowers[1]["id"])]
@@ -0,0 +1,111 @@
+# test/test_garden_layout.py
+# Flower slots are stored in garden_layout and reused: reruns read them back
+# instead of re-placing every flower. Clusters grow and spread apart without
+# overlapping, and empty buds keep clear of flowers, clusters and each other.
+import os
+import sys
+
+import numpy as np
+import pytest
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+from garden_hybrid import GardenHybrid
+
+
+@pytest.fixture
+def garden(tmp_db, monkeypatch):
+    st.session_state.pop("garden_layout", None)
+    placed = []
+    put_garden_positions = db.put_garden_positions
+    monkeypatch.setattr(db, "put_garden_positions",
+                        lambda user_id, rows: placed.extend(r[0] for r in rows) or put_garden_positions(user_id, rows))
+    garden = GardenHybrid()
+    garden.placed = placed
+    yield garden
+    st.session_state.pop("garden_layout", None)
+
+
+def positions(flowers):
+    return {f["memory_id"]: (f["x"], f["y"]) for f in flowers}
+
+
+def test_positions_are_placed_once_and_survive_changes(garden):
+    emotions = ["happy", "sad", "calm", "proud", "romantic"]
+    db.insert_memories(1, [{"title": f"m{i}", "emotion": emotions[i % 5]} for i in range(30)])
+    flowers, _ = garden.load_garden_layout(1, db.list_memories(1))
+    first = positions(flowers)
+    assert len(garden.placed) == 30 and len(db.get_garden_positions(1)) == 30
+
+    # Same memory version: served from session state without touching the table
+    garden.placed.clear()
+    assert garden.load_garden_layout(1, db.list_memories(1))[0] is flowers
+
+    # A new page session reads the stored positions back
+    st.session_state.pop("garden_layout")
+    assert positions(garden.load_garden_layout(1, db.list_memories(1))[0]) == first
+    assert garden.placed == []
+
+    # Adding and deleting memories only touches those memories
+    gone = next(f for f in flowers if f["emotion"] == "sad")
+    gone_id = gone["memory_id"]
+    db.delete_memories(1, [gone_id])
+    new_id = db.insert_memory(1, "new", "", "sad", None, None, None, None)
+    after = positions(garden.load_garden_layout(1, db.list_memories(1))[0])
+    assert garden.placed == [new_id]
+    assert gone_id not in after and gone_id not in db.get_garden_positions(1)
+    assert all(after[mid] == xy for mid, xy in first.items() if mid != gone_id)
+
+    # The new flower fills the slot the deleted one left in the sad cluster
+    assert db.get_garden_positions(1)[new_id][1] == gone["slot"]
+    assert after[new_id] == (gone["x"], gone["y"])
+
+
+def test_empty_buds_keep_their_distance():
+    garden = GardenHybrid()
+    garden.flower_spacing = 4  # leave room for buds between the clusters
+    emotions = list(garden.flower_types)
+    memories = [{"id": i, "emotion": emotions[i % len(emotions)]} for i in range(400)]
+    flowers, buds = garden.generate_garden_layout(memories)
+    assert 10 <= len(buds) <= 200
+    assert garden.generate_garden_layout(memories)[1] == buds
+
+    spots = np.array([(b["x"], b["y"]) for b in buds])
+    petals = np.array([(f["x"], f["y"]) for f in flowers])
+    assert np.all((spots >= 10) & (spots <= [garden.garden_width - 10, garden.garden_height - 10]))
+    assert np.linalg.norm(spots[:, None] - petals[None], axis=2).min() >= garden.flower_spacing
+    for cx, cy, radius in garden.clusters.values():
+        assert np.linalg.norm(spots - (cx, cy), axis=1).min() >= radius
+    between = np.linalg.norm(spots[:, None] - spots[None], axis=2) + np.eye(len(spots)) * 1e9
+    assert between.min() >= garden.bud_spacing
+
+
+def test_large_clusters_grow_and_spread_apart():
+    garden = GardenHybrid()
+    emotions = ["happy"] * 6 + ["sad", "calm", "proud", "romantic"]
+    memories = [{"id": i, "emotion": emotions[i % len(emotions)]} for i in range(20000)]
+    flowers, _ = garden.generate_garden_layout(memories)
+    assert garden.layout_scale > 1 and garden.garden_width == 100 * garden.layout_scale
+
+    points = np.array([(f["x"], f["y"]) for f in flowers])
+    assert np.all((points > 0) & (points < [garden.garden_width, garden.garden_height]))
+    by_cluster = {}
+    for f, point in zip(flowers, points):
+        by_cluster.setdefault(f["cluster"], []).append(point)
+    spans = {name: (np.mean(p, axis=0), np.linalg.norm(p - np.mean(p, axis=0), axis=1).max())
+             for name, p in by_cluster.items()}
+    for a in spans:
+        for b in spans:
+            if a < b:  # no two grown clusters overlap
+                assert np.linalg.norm(spans[a][0] - spans[b][0]) > spans[a][1] + spans[b][1]
+    happy = np.array(by_cluster["happy"])
+    sample = happy[:: len(happy) // 500]
+    distance = np.linalg.norm(sample[:, None] - happy[None], axis=2)
+    distance[distance == 0] = np.inf
+    assert distance.min() >= garden.flower_pitch
+
+    # A few more memories don't re-tile the garden
+    scale = garden.layout_scale
+    garden.generate_garden_layout(memories + [{"id": 20000 + i, "emotion": "happy"} for i in range(100)])
+    assert garden.layout_scale == scale
@@ -0,0 +1,45 @@
+# test/test_get_memory.py
+# Fetching one memory, in db.get_memory and GET /api/memories/{id}: scoped to
+# its owner, so another user's memory looks the same as a missing one.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+
+@pytest.fixture
+def memories(tmp_db):
+    mine = db.insert_memory(1, "Beach day", "so calm", "calm", "2030-01-01T00:00:00", "user_1/ab/x.jpg", "image", None)
+    theirs = db.insert_memory(2, "Not yours", "", "sad", None, None, None, None)
+    return mine, theirs
+
+
+def test_db_get_memory_is_scoped_to_its_owner(memories):
+    mine, theirs = memories
+    memory = db.get_memory(mine, 1)
+    assert memory == db.list_memories(1)[0]
+    assert (memory["id"], memory["title"], memory["media_path"]) == (mine, "Beach day", "user_1/ab/x.jpg")
+    assert db.get_memory(theirs, 1) is None
+    assert db.get_memory(999999, 1) is None
+
+
+def test_route_returns_the_memory(memories, app_client):
+    mine, _ = memories
+    r = app_client.get(f"/api/memories/{mine}", params={"user_id": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["id"], body["title"], body["emotion"]) == (mine, "Beach day", "calm")
+    assert body["media_path"] == "/media/user_1/ab/x.jpg"
+    assert body == app_client.get("/api/memories", params={"user_id": 1}).json()[0]
+
+
+def test_route_404s_for_missing_and_other_users_memories(memories, app_client):
+    _, theirs = memories
+    missing = app_client.get("/api/memories/999999", params={"user_id": 1})
+    other = app_client.get(f"/api/memories/{theirs}", params={"user_id": 1})
+    assert missing.status_code == other.status_code == 404
+    assert missing.json() == other.json() == {"detail": "Memory not found."}
+    assert app_client.get(f"/api/memories/{theirs}", params={"user_id": 2}).status_code == 200
@@ -0,0 +1,42 @@
+# test/test_listing.py
+# GET /api/memories: column projection with ?fields= and the direct JSON encoding path.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+
+@pytest.fixture
+def client(app_client):
+    for i in range(5):
+        db.insert_memory(1, f"m{i}", "desc", "calm", None, f"user_1/{i}.jpg" if i % 2 else None, "image", None)
+    return app_client
+
+
+def test_full_rows_match_memory_response(client):
+    import server
+    rows = client.get("/api/memories", params={"user_id": 1}).json()
+    assert len(rows) == 5
+    for row in rows:
+        assert server.MemoryResponse(**row).model_dump() == row
+    assert {r["media_path"] for r in rows} == {None, "/media/user_1/1.jpg", "/media/user_1/3.jpg"}
+
+
+def test_fields_projects_columns(client):
+    rows = client.get("/api/memories", params={"user_id": 1, "fields": "title,emotion,unlock_at"}).json()
+    assert [set(r) for r in rows] == [{"id", "title", "emotion", "unlock_at"}] * 5
+    assert rows[0]["title"] == "m4"
+
+
+def test_fields_with_paging_keeps_cursor(client):
+    r = client.get("/api/memories", params={"user_id": 1, "fields": "title", "limit": 2})
+    assert set(r.json()[0]) == {"id", "title", "created_at"}
+    assert r.headers["X-Next-Before-Id"] == str(r.json()[-1]["id"])
+
+
+def test_unknown_field_is_rejected(client):
+    r = client.get("/api/memories", params={"user_id": 1, "fields": "title,password_hash"})
+    assert r.status_code == 400
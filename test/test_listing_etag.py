@@ -0,0 +1,69 @@
+# test/test_listing_etag.py
+# Streamlit reruns revalidate the memory list with If-None-Match; an
+# unchanged garden is answered with a 304 without reading the memories table.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import api_client
+
+API_BASE = "http://testserver"
+
+
+@pytest.fixture
+def client(app_client, monkeypatch):
+    monkeypatch.setattr(api_client.requests, "get", lambda url, **kwargs: app_client.get(url, **kwargs))
+    api_client._listing_cache.clear()
+    return app_client
+
+
+@pytest.fixture
+def memory_queries(monkeypatch):
+    """Counts statements that read the memories table, across every pooled connection."""
+    statements = []
+    open_connection = db._open_connection
+
+    def traced(path):
+        conn = open_connection(path)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    db.close_pool()
+    monkeypatch.setattr(db, "_open_connection", traced)
+    return lambda: sum(1 for s in statements if "FROM memories" in s)
+
+
+def test_reruns_are_answered_without_querying_memories(client, memory_queries):
+    for i in range(3):
+        db.insert_memory(1, f"m{i}", "", "calm", None, None, None, None)
+
+    first = api_client.fetch_memories_from_api(1, API_BASE)
+    assert [m["title"] for m in first] == ["m2", "m1", "m0"]
+    after_first = memory_queries()
+    assert after_first >= 1
+
+    for _ in range(5):  # theme toggles, view switches...
+        assert api_client.fetch_memories_from_api(1, API_BASE) == first
+    assert memory_queries() == after_first
+
+    db.insert_memory(1, "m3", "", "happy", None, None, None, None)
+    assert api_client.fetch_memories_from_api(1, API_BASE)[0]["title"] == "m3"
+    assert memory_queries() > after_first
+
+
+def test_etag_changes_on_delete_and_differs_per_query(client):
+    memory_id = db.insert_memory(1, "m", "", "calm", None, None, None, None)
+    full = client.get("/api/memories", params={"user_id": 1})
+    projected = client.get("/api/memories", params={"user_id": 1, "fields": "title"})
+    assert full.headers["etag"] != projected.headers["etag"]
+
+    etag = full.headers["etag"]
+    assert client.get("/api/memories", params={"user_id": 1}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/memories", params={"user_id": 1}, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    db.delete_memories(1, [memory_id])
+    r = client.get("/api/memories", params={"user_id": 1}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json() == []
@@ -0,0 +1,87 @@
+# test/test_media.py
+# Caching behaviour of the /media file server, using the sample files in test/.
+import hashlib
+import os
+import shutil
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TEST_DIR))
+from media import MediaFiles, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+
+
+def sha256_of(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def media(tmp_path):
+    video = os.path.join(TEST_DIR, "test_video.mp4")
+    sha = sha256_of(video)
+    os.makedirs(tmp_path / "user_1" / sha[:2])
+    shutil.copy(video, tmp_path / "user_1" / sha[:2] / f"{sha}.mp4")
+    shutil.copy(video, tmp_path / "user_1" / "legacy_test_video.mp4")
+    shutil.copy(os.path.join(TEST_DIR, "test_image.jpg"), tmp_path / "user_1" / "test_image.jpg")
+    os.makedirs(tmp_path / ".staging")
+    shutil.copy(video, tmp_path / ".staging" / "upload.part")
+
+    app = FastAPI()
+    app.mount("/media", MediaFiles(directory=str(tmp_path)), name="media")
+    with open(video, "rb") as f:
+        content = f.read()
+    return TestClient(app), sha, content
+
+
+def test_content_addressed_file_is_immutable_with_hash_etag(media):
+    client, sha, content = media
+    r = client.get(f"/media/user_1/{sha[:2]}/{sha}.mp4")
+    assert r.status_code == 200
+    assert r.content == content
+    assert r.headers["etag"] == f'"{sha}.mp4"'
+    assert r.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_derivative_is_revalidated_not_immutable(media, tmp_path):
+    client, sha, _ = media
+    shutil.copy(os.path.join(TEST_DIR, "test_image.jpg"), tmp_path / "user_1" / sha[:2] / f"{sha}.thumb.webp")
+    r = client.get(f"/media/user_1/{sha[:2]}/{sha}.thumb.webp")
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"{sha256_of(os.path.join(TEST_DIR, "test_image.jpg"))}"'
+    assert r.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_legacy_file_gets_strong_content_etag(media):
+    client, sha, _ = media
+    r = client.get("/media/user_1/legacy_test_video.mp4")
+    assert r.status_code == 200
+    assert r.headers["etag"] == f'"{sha}"'
+    assert r.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_conditional_get_returns_304(media):
+    client, _, _ = media
+    etag = client.get("/media/user_1/test_image.jpg").headers["etag"]
+    r = client.get("/media/user_1/test_image.jpg", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    r = client.get("/media/user_1/test_image.jpg", headers={"If-None-Match": '"something-else"'})
+    assert r.status_code == 200
+
+
+def test_range_request_returns_partial_content(media):
+    client, sha, content = media
+    r = client.get(f"/media/user_1/{sha[:2]}/{sha}.mp4", headers={"Range": "bytes=5-14"})
+    assert r.status_code == 206
+    assert r.content == content[5:15]
+    assert r.headers["content-range"] == f"bytes 5-14/{len(content)}"
+    assert r.headers["etag"] == f'"{sha}.mp4"'
+
+
+def test_staging_files_are_not_served(media):
+    client, _, _ = media
+    assert client.get("/media/.staging/upload.part").status_code == 404
@@ -0,0 +1,76 @@
+# test/test_metrics.py
+# GET /metrics exposes Prometheus histograms for routes, db.py calls,
+# uploads and the classifier, plus executor queue depths.
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+
+
+@pytest.fixture
+def client(app_client):
+    return app_client
+
+
+def sample(text, name, **labels):
+    """Value of one sample line, or None."""
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    match = re.search(rf"^{re.escape(name)}{re.escape('{' + wanted + '}') if wanted else ''} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_cover_routes_db_uploads_and_classifier(client):
+    before = client.get("/metrics").text
+    route_count = sample(before, "memoryscape_http_request_duration_seconds_count",
+                         method="GET", route="/api/memories", status="200") or 0
+    upload_bytes = sample(before, "memoryscape_upload_size_bytes_sum") or 0
+    insert_count = sample(before, "memoryscape_db_call_duration_seconds_count", function="insert_memory") or 0
+
+    created = client.post("/api/memories", data={"user_id": 1, "title": "Beach day", "desc": "so calm"},
+                          files={"file": ("note.txt", b"x" * 5000, "text/plain")})
+    assert created.status_code == 201, created.text
+    client.get("/api/memories", params={"user_id": 1})
+    client.get("/api/memories/12345/nope")
+
+    text = client.get("/metrics").text
+    assert sample(text, "memoryscape_http_request_duration_seconds_count",
+                  method="GET", route="/api/memories", status="200") == route_count + 1
+    assert sample(text, "memoryscape_http_request_duration_seconds_count",
+                  method="GET", route="unmatched", status="404") >= 1
+    assert sample(text, "memoryscape_db_call_duration_seconds_count", function="insert_memory") == insert_count + 1
+    assert sample(text, "memoryscape_db_call_duration_seconds_count", function="list_memories") >= 1
+    assert sample(text, "memoryscape_upload_size_bytes_sum") == upload_bytes + 5000
+    assert sample(text, "memoryscape_classifier_texts_total", backend="rule") >= 1
+    assert sample(text, "memoryscape_executor_queue_depth", executor="uploads") == 0
+    assert sample(text, "memoryscape_executor_queue_depth", executor="db-write") == 0
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = metrics.HTTP_REQUEST_SECONDS.labels("GET", "/test/buckets", "200")
+    for value in (0.00005, 0.003, 0.003, 100):
+        hist.observe(value)
+    text = metrics.render()
+    labels = dict(method="GET", route="/test/buckets", status="200")
+    bucket = "memoryscape_http_request_duration_seconds_bucket"
+    assert sample(text, bucket, **labels, le="0.0001") == 1
+    assert sample(text, bucket, **labels, le="0.0025") == 1
+    assert sample(text, bucket, **labels, le="0.005") == 3
+    assert sample(text, bucket, **labels, le="30.0") == 3
+    assert sample(text, bucket, **labels, le="+Inf") == 4
+    assert sample(text, "memoryscape_http_request_duration_seconds_count", **labels) == 4
+
+
+def test_metric_types_must_define_children_and_samples():
+    with pytest.raises(TypeError):
+        metrics._Metric("test_base", "abstract")
+
+    class NoSamples(metrics._Metric):
+        def _new_child(self):
+            return object()
+
+    with pytest.raises(TypeError, match="samples"):
+        NoSamples("test_no_samples", "missing samples")
@@ -0,0 +1,90 @@
+# test/test_migrate.py
+# migrate.dedup_media: legacy uuid-named uploads move into the
+# content-addressed store, shared and duplicate files end up as one blob
+# with the right refcount, and a dry run only reports.
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import migrate
+
+
+@pytest.fixture(autouse=True)
+def user_dedup_scope(monkeypatch):
+    monkeypatch.setattr("storage.MEDIA_DEDUP_SCOPE", "user")
+
+
+def legacy_memory(media_root, name, content, stored_path=None):
+    """A memory pointing at a legacy upload, stored as `stored_path` (defaults to user_1/<name>)."""
+    path = media_root / "user_1" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if content is not None:
+        path.write_bytes(content)
+    return db.insert_memory(1, name, "", "calm", None, stored_path or f"user_1/{name}", "image", None)
+
+
+def media_paths():
+    with db.get_conn() as conn:
+        return dict(conn.execute("SELECT id, media_path FROM memories").fetchall())
+
+
+def refcounts():
+    with db.get_conn() as conn:
+        return dict(conn.execute("SELECT path, refcount FROM media_blobs").fetchall())
+
+
+def content_rel(content, name="x.jpg"):
+    sha = hashlib.sha256(content).hexdigest()
+    return f"user_1/{sha[:2]}/{sha}{os.path.splitext(name)[1]}"
+
+
+def test_memories_sharing_one_legacy_file_are_all_repointed(tmp_db):
+    first = legacy_memory(tmp_db, "a_photo.jpg", b"shared photo")
+    second = db.insert_memory(1, "again", "", "calm", None, "user_1/a_photo.jpg", "image", None)
+
+    assert migrate.dedup_media() == 0
+    rel = content_rel(b"shared photo")
+    assert media_paths() == {first: rel, second: rel}
+    assert refcounts() == {rel: 2}
+    assert (tmp_db / rel).read_bytes() == b"shared photo"
+    assert not (tmp_db / "user_1" / "a_photo.jpg").exists()
+
+
+def test_duplicate_legacy_files_collapse_into_one_blob(tmp_db, capsys):
+    first = legacy_memory(tmp_db, "1111_photo.jpg", b"same bytes")
+    second = legacy_memory(tmp_db, "2222_photo.jpg", b"same bytes")
+    other = legacy_memory(tmp_db, "3333_other.jpg", b"different")
+
+    assert migrate.dedup_media() == len(b"same bytes")
+    rel = content_rel(b"same bytes")
+    assert media_paths() == {first: rel, second: rel, other: content_rel(b"different")}
+    assert refcounts() == {rel: 2, content_rel(b"different"): 1}
+    assert not any(p.is_file() for p in (tmp_db / "user_1").iterdir())  # legacy copies removed
+    assert "Scanned 3 files: 1 duplicates, 0 missing on disk." in capsys.readouterr().out
+
+
+def test_windows_style_paths_are_resolved(tmp_db):
+    memory_id = legacy_memory(tmp_db, "4444_shot.png", b"from windows", stored_path="user_1\\4444_shot.png")
+    migrate.dedup_media()
+    assert media_paths() == {memory_id: content_rel(b"from windows", "x.png")}
+
+
+def test_dry_run_reports_without_changing_anything(tmp_db, capsys):
+    legacy_memory(tmp_db, "1111_photo.jpg", b"same bytes")
+    legacy_memory(tmp_db, "2222_photo.jpg", b"same bytes")
+    missing = legacy_memory(tmp_db, "5555_gone.jpg", None)
+    before = media_paths()
+
+    assert migrate.dedup_media(dry_run=True) == len(b"same bytes")
+    out = capsys.readouterr().out
+    assert "Scanned 2 files: 1 duplicates, 1 missing on disk." in out
+    assert "Would reclaim 10 bytes" in out
+    assert media_paths() == before and refcounts() == {}
+    assert sorted(p.name for p in (tmp_db / "user_1").iterdir()) == ["1111_photo.jpg", "2222_photo.jpg"]
+
+    migrate.dedup_media()
+    assert media_paths()[missing] == "user_1/5555_gone.jpg"
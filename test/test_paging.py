@@ -0,0 +1,93 @@
+# test/test_paging.py
+# Keyset paging of memory listings: the (user_id, created_at, id) index and
+# its migration, pages that split ties on created_at, the X-Next-Before-*
+# headers, and api_client following them.
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import api_client
+import db
+
+# Three rows per timestamp, so page boundaries fall inside runs of equal created_at
+TIMESTAMPS = [f"2024-01-0{day}T09:00:00" for day in (1, 2, 3, 4)]
+
+
+@pytest.fixture
+def tied_rows(tmp_db):
+    db.insert_memories(1, [{"title": f"{ts} #{n}", "emotion": "calm", "created_at": ts}
+                           for n in range(3) for ts in TIMESTAMPS])
+    db.insert_memories(2, [{"title": "someone else", "emotion": "calm", "created_at": TIMESTAMPS[1]}])
+    with db.get_conn() as conn:
+        rows = conn.execute("SELECT id, created_at FROM memories WHERE user_id=1").fetchall()
+    return [memory_id for memory_id, _ in sorted(rows, key=lambda r: (r[1], r[0]), reverse=True)]
+
+
+def test_migration_creates_the_listing_index(tmp_path, monkeypatch):
+    # A database from before the migrations: tables only, user_version 0
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE memories (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+                     "title TEXT NOT NULL, description TEXT, emotion TEXT NOT NULL, unlock_at TEXT, "
+                     "created_at TEXT NOT NULL, media_path TEXT, media_type TEXT, model_path TEXT)")
+    monkeypatch.setattr(db, "DB_DIR", str(tmp_path))
+    monkeypatch.setattr(db, "DB_PATH", str(path))
+    db.init_db()
+    try:
+        with db.get_conn() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == db.MIGRATIONS[-1][0]
+            columns = [row[2] for row in conn.execute("PRAGMA index_info(idx_memories_user_created)")]
+            assert columns == ["user_id", "created_at", "id"]
+            plan = " ".join(row[-1] for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM memories WHERE user_id=? AND (created_at, id) < (?, ?) "
+                "ORDER BY created_at DESC, id DESC LIMIT 5", (1, TIMESTAMPS[2], 10)))
+            assert "idx_memories_user_created" in plan
+            assert "TEMP B-TREE" not in plan
+    finally:
+        db.close_pool()
+
+
+def test_keyset_pages_split_ties_without_gaps_or_repeats(tied_rows):
+    seen, cursor = [], {}
+    while True:
+        page = db.list_memories(1, limit=5, **cursor)
+        seen += [row["id"] for row in page]
+        if len(page) < 5:
+            break
+        cursor = {"before_created_at": page[-1]["created_at"], "before_id": page[-1]["id"]}
+    assert seen == tied_rows
+    assert [row["id"] for row in db.list_memories(1)] == tied_rows
+
+
+def test_api_pages_follow_the_next_headers(tied_rows, app_client):
+    seen, params = [], {"user_id": 1, "limit": 4}
+    while True:
+        r = app_client.get("/api/memories", params=params)
+        seen += [row["id"] for row in r.json()]
+        if "X-Next-Before-Id" not in r.headers:
+            break
+        params.update(before_created_at=r.headers["X-Next-Before-Created-At"],
+                      before_id=r.headers["X-Next-Before-Id"])
+    assert seen == tied_rows
+    # 12 rows in pages of 4: the third page is full, so a fourth (empty, without headers) ends the listing
+    assert r.json() == []
+
+
+def test_api_client_follows_the_cursor(tied_rows, app_client, monkeypatch):
+    requests_made = []
+
+    def get(url, params=None, **kwargs):
+        requests_made.append(dict(params))
+        return app_client.get(url, params=params, **kwargs)
+
+    monkeypatch.setattr(api_client.requests, "get", get)
+    api_client._listing_cache.clear()
+    rows = list(api_client.iter_memories_from_api(1, "http://testserver", page_size=5))
+    assert [row["id"] for row in rows] == tied_rows
+    assert len(requests_made) == 3
+    assert "before_id" not in requests_made[0]
+    assert [p["before_id"] for p in requests_made[1:]] == [str(rows[4]["id"]), str(rows[9]["id"])]
+    assert api_client.fetch_memories_from_api(1, "http://testserver", limit=7) == rows[:7]
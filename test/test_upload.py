@@ -0,0 +1,67 @@
+# test/test_upload.py
+# Uploads are streamed into staging in chunks: the hash is taken on the way
+# through, oversized or invalid files are refused with nothing left behind,
+# and POST /api/memories answers an oversized file with a 413.
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import storage
+
+CONTENT = os.urandom(100_000)
+
+
+def staged_files(media_root):
+    staging = media_root / ".staging"
+    return sorted(os.listdir(staging)) if staging.exists() else []
+
+
+def test_streamed_hash_and_size_match_the_content(tmp_db):
+    saved = storage.stage_upload(1, io.BytesIO(CONTENT), "clip.mp4", chunk_size=4096)
+    sha = hashlib.sha256(CONTENT).hexdigest()
+    assert (saved.sha256, saved.size, saved.media_type) == (sha, len(CONTENT), "video")
+    assert saved.path == storage.content_path(1, sha, "clip.mp4")
+    with open(saved.staged_path, "rb") as f:
+        assert f.read() == CONTENT
+    storage.discard_staged(saved)
+    assert staged_files(tmp_db) == []
+
+
+def test_oversized_upload_is_refused_and_cleaned_up(tmp_db):
+    with pytest.raises(storage.UploadTooLarge):
+        storage.stage_upload(1, io.BytesIO(CONTENT), "clip.mp4", chunk_size=4096, max_bytes=len(CONTENT) - 1)
+    assert staged_files(tmp_db) == []
+    # Exactly at the limit is fine
+    storage.discard_staged(storage.stage_upload(1, io.BytesIO(CONTENT), "clip.mp4", max_bytes=len(CONTENT)))
+
+
+def test_invalid_image_is_refused_and_cleaned_up(tmp_db):
+    with pytest.raises(ValueError, match="Invalid image"):
+        storage.stage_upload(1, io.BytesIO(b"not really a jpeg"), "photo.jpg")
+    assert staged_files(tmp_db) == []
+
+
+def test_api_answers_413_for_an_oversized_upload(app_client, tmp_db, monkeypatch):
+    monkeypatch.setattr(storage, "MAX_UPLOAD_BYTES", 1000)
+    r = app_client.post("/api/memories", data={"user_id": 1, "title": "big", "emotion": "calm"},
+                        files={"file": ("clip.mp4", CONTENT, "video/mp4")})
+    assert r.status_code == 413
+    assert "1000 byte upload limit" in r.json()["detail"]
+    assert staged_files(tmp_db) == []
+    assert db.list_memories(1) == []
+
+
+def test_api_upload_is_stored_under_its_content_hash(app_client, tmp_db):
+    r = app_client.post("/api/memories", data={"user_id": 1, "title": "clip", "emotion": "calm"},
+                        files={"file": ("clip.mp4", CONTENT, "video/mp4")})
+    assert r.status_code == 201
+    media_path, _ = db.get_memory_media(r.json()["id"])
+    sha = hashlib.sha256(CONTENT).hexdigest()
+    assert media_path == storage.content_path(1, sha, "clip.mp4")
+    assert (tmp_db / media_path).read_bytes() == CONTENT
+    assert staged_files(tmp_db) == []
@@ -27,7 +27,8 @@ def counters(memories: List[Dict]):
     c2.metric("Blooms", blooms)
     c3.metric("Fruits", fruits)
 
-def memory_card(m, api_base):
+def memory_card(m, api_base, image_size: str = "medium"):
+    """Renders one memory. Images load the `image_size` derivative ("thumb", "medium" or "original")."""
     lock = is_locked(m.get("unlock_at"))
     state = get_memory_state(m)
 
@@ -50,8 +51,8 @@ def memory_card(m, api_base):
         full_url = f"{api_base.rstrip('/')}{media_path}"
         # full_url = f"{api_base}{media_path}" if not api_base.endswith('/') else f"{api_base[:-1]}{media_path}"
         if "image" in mt:
-            
-            st.image(full_url, use_container_width=True)
+            # Request the smallest derivative that fills the card, not the full-resolution upload
+            st.image(f"{api_base.rstrip('/')}/media/{m.get('id')}/{image_size}", use_container_width=True)
         elif "audio" in mt:
             st.audio(full_url)
         elif "video" in mt:
@@ -109,7 +110,7 @@ def garden_grid(memories: List[Dict], user_id: int, api_base: str, show_header:
                         if st.checkbox(f"Select #{m.get('id')}", key=f"checkbox_{m.get('id')}"):
                             selected_memories_in_form.append(m.get('id'))
                         with st.expander(f"{PLANT_EMOJIS.get(m.get('emotion'), '🌼')} {m.get('title', 'Untitled')}", expanded=False):
-                            memory_card(m, api_base)
+                            memory_card(m, api_base, image_size="thumb")
         
         # Submit button for the form
         delete_button_pressed = st.form_submit_button("Delete Selected Memories")